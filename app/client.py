@@ -0,0 +1,236 @@
+"""
+Asynchronous client of the middleware service, batching the submitted records.
+
+Usage:
+    async with MiddlewareClient("http://localhost:8000") as client:
+        ack = await client.submit_vendor(company="A", vendorName="Vendor A", ...)
+        acks = await asyncio.gather(*(client.submit_invoice(invoice) for invoice in invoices))
+
+The records submitted concurrently are posted together to `/records/batch`, once
+`batch_size` records are pending or `batch_delay` seconds after the first one, over a
+pooled connection (HTTP/2 when the `h2` package is installed). At most `max_in_flight`
+batches are posted at once, submitting more records waiting for one of them to complete.
+Batches rejected as a whole with a 429 or 5xx error, or that fail to be sent, are retried
+with a jittered exponential backoff, or after the delay asked by their `Retry-After`.
+"""
+
+import asyncio
+import importlib.util
+import json
+import random
+from typing import Optional
+
+import httpx
+
+from app.models.invoice import InvoiceInputBody
+from app.models.vendor import VendorInputBody
+from app.utils.media_types import NDJSON_MEDIA_TYPES
+from app.utils.retry_after import retry_after_seconds
+
+# Records posted per batch, and seconds a record waits for more records to batch with
+CLIENT_BATCH_SIZE = 500
+CLIENT_BATCH_DELAY = 0.05
+# Batches posted at once
+CLIENT_MAX_IN_FLIGHT = 4
+# Retries of a batch, and base and maximum seconds of the backoff between them
+CLIENT_MAX_RETRIES = 5
+CLIENT_BACKOFF_BASE = 0.1
+CLIENT_BACKOFF_MAX = 10.0
+
+# Batch status codes worth retrying
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+
+class MiddlewareClientError(Exception):
+    """Batch that couldn't be processed by the service"""
+
+    def __init__(self, status_code: Optional[int], detail):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class RecordRejectedError(MiddlewareClientError):
+    """Record rejected by the service, with its acknowledgement"""
+
+    def __init__(self, ack: dict):
+        super().__init__(ack["status_code"], ack["detail"])
+        self.ack = ack
+
+
+class MiddlewareClient:
+    """Asynchronous client batching the vendor and invoice records, see the module"""
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        batch_size: int = CLIENT_BATCH_SIZE,
+        batch_delay: float = CLIENT_BATCH_DELAY,
+        max_in_flight: int = CLIENT_MAX_IN_FLIGHT,
+        max_retries: int = CLIENT_MAX_RETRIES,
+        backoff_base: float = CLIENT_BACKOFF_BASE,
+        backoff_max: float = CLIENT_BACKOFF_MAX,
+        timeout: float = 30.0,
+        http2: Optional[bool] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        if http2 is None:
+            http2 = importlib.util.find_spec("h2") is not None
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            http2=http2,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=max_in_flight, max_keepalive_connections=max_in_flight
+            ),
+        )
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._flush_timer: Optional[asyncio.Task] = None
+        self._batches: set[asyncio.Task] = set()
+        self._seq = 0
+
+    async def __aenter__(self) -> "MiddlewareClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def submit_vendor(
+        self, vendor: Optional[VendorInputBody | dict] = None, **fields
+    ) -> dict:
+        """
+        Submit a vendor record (`VendorInputBody`, or its fields), returning its
+        acknowledgement once processed. Raises `RecordRejectedError` if it's rejected.
+        """
+        vendor = VendorInputBody.model_validate(
+            vendor if vendor is not None else fields
+        )
+        return await self._submit("vendor", vendor.model_dump(exclude_none=True))
+
+    async def submit_invoice(
+        self, invoice: Optional[InvoiceInputBody | dict] = None, **fields
+    ) -> dict:
+        """
+        Submit an invoice record (`InvoiceInputBody`, or its fields), returning its
+        acknowledgement once processed. Raises `RecordRejectedError` if it's rejected.
+        """
+        invoice = InvoiceInputBody.model_validate(
+            invoice if invoice is not None else fields
+        )
+        return await self._submit("invoice", invoice.model_dump(exclude_none=True))
+
+    async def flush(self) -> None:
+        """Post the pending records and wait for all the batches to complete"""
+        await self._flush()
+        if self._batches:
+            await asyncio.wait(set(self._batches))
+
+    async def close(self) -> None:
+        await self.flush()
+        await self._http.aclose()
+
+    async def _submit(self, record_type: str, data: dict) -> dict:
+        self._seq += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(
+            ({"seq": self._seq, "record_type": record_type, "data": data}, future)
+        )
+        if len(self._pending) >= self.batch_size:
+            await self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(self._flush_later())
+
+        ack = await future
+        if ack["status"] != "ok":
+            raise RecordRejectedError(ack)
+        return ack
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.batch_delay)
+        self._flush_timer = None
+        await self._flush()
+
+    async def _flush(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        # Wait for a batch slot, so that submitting records slows down with the service
+        await self._in_flight.acquire()
+        task = asyncio.create_task(self._send(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _send(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        try:
+            acks = await self._post([message for message, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), ack in zip(batch, acks):
+                if not future.done():
+                    future.set_result(ack)
+        finally:
+            self._in_flight.release()
+
+    async def _post(self, messages: list[dict]) -> list[dict]:
+        """Post a batch, retrying it on the transient errors"""
+        body = "".join(json.dumps(message) + "\n" for message in messages).encode()
+        attempt = 0
+        while True:
+            try:
+                response = await self._http.post(
+                    "/records/batch",
+                    content=body,
+                    headers={"Content-Type": NDJSON_MEDIA_TYPES[0]},
+                )
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise MiddlewareClientError(None, str(e)) from e
+                response = None
+
+            if response is not None:
+                if response.is_success:
+                    return response.json()["acks"]
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    raise MiddlewareClientError(
+                        response.status_code, _response_detail(response)
+                    )
+
+            await asyncio.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """
+        Seconds to wait before a retry: the `Retry-After` delay of the response, or an
+        exponential backoff, with a random jitter so clients don't retry all at once
+        """
+        retry_after = retry_after_seconds(
+            response.headers.get("retry-after") if response is not None else None
+        )
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+def _response_detail(response: httpx.Response):
+    try:
+        return response.json()["detail"]
+    except (ValueError, KeyError, TypeError):
+        return response.text
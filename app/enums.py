@@ -7,6 +7,25 @@ class AppEnum(str, Enum):
     ROOT_ENDPOINT_MSSG = "Middleware service is running."
     MISSING_REQUIRED_FIELDS_MSSG = "Missing required fields"
     UNKNOWN_COMPANY_MSSG = "Unknown company"
+    UNKNOWN_RECORD_TYPE_MSSG = "Unknown record type"
+    INVALID_MESSAGE_MSSG = "Message must be a JSON object"
+    INVALID_BODY_MSSG = "Request body must be a valid JSON object"
+    INVALID_BATCH_MSSG = "Request body must be an array of messages"
+    INVALID_COMPRESSED_BODY_MSSG = "Request body can't be decompressed"
+    UNSUPPORTED_CONTENT_ENCODING_MSSG = "Unsupported content encoding"
+    BODY_TOO_LARGE_MSSG = "Request body exceeds the maximum size"
+    BATCH_LINE_TOO_LONG_MSSG = "Batch line exceeds the maximum size"
+    DECOMPRESSED_BODY_TOO_LARGE_MSSG = (
+        "Decompressed request body exceeds the maximum size or compression ratio"
+    )
+    MEMORY_PROFILING_DISABLED_MSSG = "Memory profiling is disabled"
+    MEMORY_SNAPSHOT_NOT_FOUND_MSSG = "Memory snapshot not found"
+    RATE_LIMITED_MSSG = "Company quota exceeded, retry later"
+    CREDIT_EXCEEDED_MSSG = "Credit window exceeded"
+    STREAM_OFFSET_INVALID_MSSG = "Offset must be the start of a record in the output"
+    STREAM_BUFFER_OVERFLOW_MSSG = (
+        "Consumer fell behind the records stream, resume from the last offset"
+    )
 
 
 class VendorEnum(str, Enum):
@@ -31,3 +50,6 @@ class InvoiceEnum(str, Enum):
         "Invoice record processed successfully for company: "
     )
     INVOICE_LINES_EMPTY_MSSG = "Invoice must have at least one line"
+    INVOICE_BODY_TOO_LARGE_MSSG = "Invoice body exceeds the maximum size"
+    INVOICE_TOO_MANY_LINES_MSSG = "Invoice exceeds the maximum number of lines"
+    INVOICE_DATE_INVALID_MSSG = "Invoice date must be a valid ISO date (YYYY-MM-DD)"
@@ -2,136 +2,759 @@
 Entrypoint for the middleware service API.
 """
 
-from collections import defaultdict
+import asyncio
+import json
+import math
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
 
-from fastapi import FastAPI, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
+import msgpack
+from pydantic import TypeAdapter
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.models.vendor import VendorInputBody
-from app.services.vendor import VendorStrategyA, VendorStrategyB
-
 from app.models.invoice import InvoiceInputBody
-from app.services.invoice import InvoiceStrategyA, InvoiceStrategyB
+from app.services.invoice import INVOICE_STRATEGIES
+from app.services.records import (
+    RecordProcessingError,
+    RecordService,
+    error_ack,
+    reformat_validation_errors,
+)
+from app.services.vendor import VENDOR_STRATEGIES
 
-from app.utils.file_writer import append_output_to_jsonl
+from app.utils.content_negotiation import (
+    MSGPACK_MEDIA_TYPES,
+    NDJSON_MEDIA_TYPES,
+    NegotiatedRoute,
+    is_msgpack,
+    is_ndjson,
+    negotiated_http_exception_handler,
+    negotiated_response,
+)
+from app.utils.decompression import LineTooLongError, iter_lines
+from app.utils.export import ExportTable, iter_csv_chunks
+from app.utils.fair_scheduler import FairScheduler, QuotaExceededError
+from app.utils.memory_profile import MemoryProfiler, MemoryProfilingMiddleware
+from app.utils.micro_batcher import MicroBatcher
+from app.utils.output_reader import is_line_start
+from app.utils.request_log import (
+    RequestLog,
+    RequestLogMiddleware,
+    describe_record,
+    log_stage,
+)
+from app.utils.dates import normalize_invoice_date
+from app.settings import Settings
 from app.enums import AppEnum, InvoiceEnum, VendorEnum
 
-app = FastAPI(
-    title="Vendor and Invoice Record Processing Middleware Service",
-    description="A service that processes and normalizes vendor and invoice records according to their company-specific requirements",
-)
+# Record endpoints accept and return MessagePack as well as JSON
+router = APIRouter(route_class=NegotiatedRoute)
+
+
+def get_record_service(request: Request) -> RecordService:
+    """Dependency returning the record service of the app handling the request"""
+    return request.app.state.records
+
+
+def get_memory_profiler(request: Request) -> MemoryProfiler:
+    """Dependency returning the memory profiler of the app, if memory profiling is enabled"""
+    if request.app.state.memory_profiler is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=AppEnum.MEMORY_PROFILING_DISABLED_MSSG,
+        )
+    return request.app.state.memory_profiler
+
+
+def quota_exceeded_exception(e: QuotaExceededError) -> HTTPException:
+    """429 error of a request over the quota of its company, with when to retry"""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=AppEnum.RATE_LIMITED_MSSG,
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
+
+
+def normalize_date_range(
+    date_from: Optional[str], date_to: Optional[str]
+) -> tuple[Optional[str], Optional[str]]:
+    """Normalize the dates of a range query, rejecting invalid ones with a 422 error"""
+    try:
+        return (
+            None if date_from is None else normalize_invoice_date(date_from),
+            None if date_to is None else normalize_invoice_date(date_to),
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
+
+
+def message_company(message) -> Optional[str]:
+    """Company of a `{"seq", "record_type", "data"}` message, if any"""
+    data = message.get("data") if isinstance(message, dict) else None
+    return data.get("company") if isinstance(data, dict) else None
+
+
+def quota_exceeded_ack(message, retry_after: float) -> dict:
+    """Acknowledgement of a message over the quota of its company"""
+    return error_ack(
+        message.get("seq") if isinstance(message, dict) else None,
+        status.HTTP_429_TOO_MANY_REQUESTS,
+        AppEnum.RATE_LIMITED_MSSG,
+        retry_after=round(retry_after, 3),
+    )
+
+
+def failed_ack(message, error: Exception) -> dict:
+    """Acknowledgement of a message whose processing raised"""
+    return error_ack(
+        message.get("seq") if isinstance(message, dict) else None,
+        status.HTTP_500_INTERNAL_SERVER_ERROR,
+        str(error),
+    )
+
+
+def create_record_batchers(
+    records: RecordService, scheduler: FairScheduler, settings: Settings
+) -> tuple[MicroBatcher, MicroBatcher]:
+    """
+    Micro-batchers of the vendor and invoice records of concurrent single-record
+    requests, each batch being processed and written at once, scheduled per company
+    """
+
+    def limited(company: Optional[str], retry_after: float) -> QuotaExceededError:
+        return QuotaExceededError(scheduler.tenant(company), retry_after)
+
+    def failed(item, error: Exception) -> Exception:
+        # Raised to the request of the item by the micro-batcher
+        return error
+
+    async def process_vendors(vendor_inputs: list[VendorInputBody]) -> list:
+        return await scheduler.run_batch(
+            records.process_vendors,
+            vendor_inputs,
+            lambda vendor_input: vendor_input.company,
+            lambda vendor_input, retry_after: limited(
+                vendor_input.company, retry_after
+            ),
+            failed,
+        )
+
+    async def write_invoices(invoices: list[tuple[str, dict, Optional[str]]]) -> list:
+        return await scheduler.run_batch(
+            records.write_invoices,
+            invoices,
+            lambda invoice: invoice[0],
+            lambda invoice, retry_after: limited(invoice[0], retry_after),
+            failed,
+        )
+
+    return tuple(
+        MicroBatcher(
+            process, settings.micro_batch_max_size, settings.micro_batch_max_window
+        )
+        for process in (process_vendors, write_invoices)
+    )
+
+
+def request_body_openapi(
+    schema: dict, media_types: tuple[str, ...] = ("application/json",)
+) -> dict:
+    """OpenAPI request body of an endpoint reading its body itself"""
+    definitions = schema.pop("$defs", {})
+
+    def inline_refs(value):
+        if isinstance(value, dict):
+            if "$ref" in value:
+                return inline_refs(definitions[value["$ref"].split("/")[-1]])
+            return {key: inline_refs(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [inline_refs(item) for item in value]
+        return value
+
+    schema = inline_refs(schema)
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {media_type: {"schema": schema} for media_type in media_types},
+        }
+    }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up the service in the background, so it starts accepting connections right
+    away and reports ready on `/ready` once the warm-up is done.
+    """
+
+    def warm_up():
+        app.state.records.warm_up()
+        app.state.ready = True
+
+    if app.state.memory_profiler is not None:
+        app.state.memory_profiler.start()
+    if app.state.request_log is not None:
+        app.state.request_log.start()
+    warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    await warm_up_task
+    app.state.records.close()
+    if app.state.memory_profiler is not None:
+        app.state.memory_profiler.stop()
+    if app.state.request_log is not None:
+        app.state.request_log.stop()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build a service instance, configured from the environment by default"""
+    settings = settings or Settings.from_env()
+
+    app = FastAPI(
+        title="Vendor and Invoice Record Processing Middleware Service",
+        description="A service that processes and normalizes vendor and invoice records according to their company-specific requirements",
+        lifespan=lifespan,
+    )
+    app.state.settings = settings
+    app.state.records = RecordService(settings)
+    app.state.scheduler = FairScheduler(
+        set(VENDOR_STRATEGIES) | set(INVOICE_STRATEGIES),
+        weights=settings.company_weights,
+        quotas=settings.company_quotas,
+        concurrency=settings.scheduler_concurrency,
+        company_concurrency=settings.scheduler_company_concurrency,
+        max_queued=settings.scheduler_max_queued,
+        slice_size=settings.scheduler_slice_size,
+    )
+    app.state.vendor_batcher, app.state.invoice_batcher = create_record_batchers(
+        app.state.records, app.state.scheduler, settings
+    )
+    app.state.ready = False
+    app.state.memory_profiler = None
+    app.state.request_log = None
+    if settings.request_log:
+        app.state.request_log = RequestLog.from_file(
+            settings.log_file or None,
+            sample_rate=settings.log_sample_rate,
+            queue_size=settings.log_queue_size,
+        )
+        app.add_middleware(RequestLogMiddleware, request_log=app.state.request_log)
+    # The memory instrumentation is opt-in, no middleware is added otherwise
+    if settings.memory_profiling:
+        app.state.memory_profiler = MemoryProfiler(
+            settings.memory_sample_rate,
+            settings.memory_traceback_frames,
+            settings.memory_max_snapshots,
+        )
+        app.add_middleware(
+            MemoryProfilingMiddleware, profiler=app.state.memory_profiler
+        )
+
+    app.add_exception_handler(RequestValidationError, custom_form_validation_error)
+    app.add_exception_handler(StarletteHTTPException, negotiated_http_exception_handler)
+    app.include_router(router)
+
+    return app
 
 
 # From https://stackoverflow.com/questions/58642528/displaying-of-fastapi-validation-errors-to-end-users @Dariosky
-@app.exception_handler(RequestValidationError)
 async def custom_form_validation_error(request, exc):
     """Override validation exceptions reformatting the response to be more user-friendly"""
-    reformatted_message = defaultdict(list)
-    for pydantic_error in exc.errors():
-        loc, msg = pydantic_error["loc"], pydantic_error["msg"]
-        filtered_loc = loc[1:] if loc[0] in ("body", "query", "path") else loc
-        field_string = ".".join(filtered_loc)  # nested fields with dot-notation
-        reformatted_message[field_string].append(msg)
-
-    return JSONResponse(
+    return negotiated_response(
+        request,
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content=jsonable_encoder(
             {
                 "detail": AppEnum.MISSING_REQUIRED_FIELDS_MSSG,
-                "errors": reformatted_message,
+                "errors": reformat_validation_errors(exc.errors()),
             }
         ),
     )
 
 
-@app.get("/")
+@router.get("/")
 def root():
     return {"message": AppEnum.ROOT_ENDPOINT_MSSG}
 
 
-@app.post("/vendor-record")
-def process_vendor_record(vendor_input: VendorInputBody):
-    """Endpoint to process vendor records"""
+@router.get("/ready")
+def ready(request: Request):
+    """Readiness check, successful once the service is warmed up"""
+    if not request.app.state.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"ready": False}
+        )
+    return {"ready": True}
+
+
+@router.post("/vendor-record")
+async def process_vendor_record(
+    request: Request,
+    vendor_input: VendorInputBody,
+    records: RecordService = Depends(get_record_service),
+):
+    """Endpoint to process vendor records, flagging the likely duplicate vendors"""
+    vendor_batcher: MicroBatcher = request.app.state.vendor_batcher
+    describe_record(request, vendor_input.company, "vendor", vendor_input.vendorName)
     try:
-        # Process the vendor record depending on the company
-        if vendor_input.company == "A":
-            vendor_output = VendorStrategyA.process_vendor(vendor_input)
-        elif vendor_input.company == "B":
-            vendor_output = VendorStrategyB.process_vendor(vendor_input)
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=AppEnum.UNKNOWN_COMPANY_MSSG,
+        with log_stage(request, "process"):
+            vendor_data = await vendor_batcher.submit(vendor_input)
+        with log_stage(request, "duplicates"):
+            duplicates = await run_in_threadpool(
+                records.vendor_duplicates.find,
+                vendor_input.company,
+                vendor_data["vendorName"],
             )
 
-        append_output_to_jsonl(
-            vendor_input.company, "vendor", vendor_output.model_dump()
-        )
-
-        return JSONResponse(
+        return negotiated_response(
+            request,
             status_code=status.HTTP_201_CREATED,
             content={
                 "message": (
                     f"{VendorEnum.VENDOR_RECORD_PROCESSED_MSSG.value} '{vendor_input.company}'"
                 ),
-                "data": vendor_output.model_dump(),
+                "data": vendor_data,
+                "duplicates": duplicates,
             },
         )
 
-    except HTTPException as e:
-        # Continue with the raised exception as is
-        raise e
+    except RecordProcessingError as e:
+        # Report the processing error with its status code
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    except QuotaExceededError as e:
+        raise quota_exceeded_exception(e)
 
     except Exception as e:
-        # If an exception is raised that is not an HTTPException, raise a 500 error
+        # If an unexpected exception is raised, raise a 500 error
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
 
 
-@app.post("/invoice-record")
-def process_invoice_record(invoice_input: InvoiceInputBody):
-    """Endpoint to process invoice records"""
+@router.post(
+    "/invoice-record",
+    openapi_extra=request_body_openapi(
+        InvoiceInputBody.model_json_schema(),
+        ("application/json", MSGPACK_MEDIA_TYPES[0]),
+    ),
+)
+async def process_invoice_record(
+    request: Request,
+    records: RecordService = Depends(get_record_service),
+):
+    """
+    Endpoint to process invoice records. The body is streamed, so the lines of very large
+    invoices are validated and classified as they are received.
+    """
+    invoice_batcher: MicroBatcher = request.app.state.invoice_batcher
+    invoice_stream = records.invoice_stream(msgpack=is_msgpack(request))
     try:
-        if len(invoice_input.lines) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=InvoiceEnum.INVOICE_LINES_EMPTY_MSSG,
+        content_length = request.headers.get("content-length")
+        if content_length and int(content_length) > invoice_stream.max_body_size:
+            raise RecordProcessingError(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                InvoiceEnum.INVOICE_BODY_TOO_LARGE_MSSG,
             )
 
-        # Process the invoice record depending on the company
-        if invoice_input.company == "A":
-            invoice_output = InvoiceStrategyA.process_invoice(invoice_input)
-        elif invoice_input.company == "B":
-            invoice_output = InvoiceStrategyB.process_invoice(invoice_input)
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=AppEnum.UNKNOWN_COMPANY_MSSG,
+        with log_stage(request, "receive"):
+            async for chunk in request.stream():
+                if chunk:
+                    await run_in_threadpool(invoice_stream.feed, chunk)
+        with log_stage(request, "validate"):
+            company, invoice_data, vendor_name = await run_in_threadpool(
+                invoice_stream.finish
+            )
+        describe_record(request, company, "invoice", invoice_data["invoiceId"])
+        with log_stage(request, "write"):
+            invoice_data = await invoice_batcher.submit(
+                (company, invoice_data, vendor_name)
             )
 
-        append_output_to_jsonl(
-            invoice_input.company, "invoice", invoice_output.model_dump()
-        )
-
-        return JSONResponse(
+        return negotiated_response(
+            request,
             status_code=status.HTTP_201_CREATED,
             content={
                 "message": (
-                    f"{InvoiceEnum.INVOICE_RECORD_PROCESSED_MSSG.value} '{invoice_input.company}'"
+                    f"{InvoiceEnum.INVOICE_RECORD_PROCESSED_MSSG.value} '{company}'"
                 ),
-                "data": invoice_output.model_dump(),
+                "data": invoice_data,
             },
         )
 
-    except HTTPException as e:
-        # Continue with the raised exception as is
-        raise e
+    except RecordProcessingError as e:
+        # Report the validation errors like the ones of the endpoints parsing a model
+        if e.errors is not None:
+            return negotiated_response(
+                request,
+                status_code=e.status_code,
+                content=jsonable_encoder({"detail": e.detail, "errors": e.errors}),
+            )
+        # Report the processing error with its status code
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    except QuotaExceededError as e:
+        raise quota_exceeded_exception(e)
+
+    except StarletteHTTPException:
+        # Errors reading the body, e.g. a body that can't be decompressed
+        raise
 
     except Exception as e:
-        # If an exception is raised that is not an HTTPException, raise a 500 error
+        # If an unexpected exception is raised, raise a 500 error
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
+
+
+@router.post(
+    "/records/batch",
+    openapi_extra=request_body_openapi(
+        TypeAdapter(list[dict]).json_schema(),
+        ("application/json", MSGPACK_MEDIA_TYPES[0], NDJSON_MEDIA_TYPES[0]),
+    ),
+)
+async def process_records_batch(
+    request: Request,
+    records: RecordService = Depends(get_record_service),
+):
+    """
+    Endpoint to process a batch of vendor and invoice records, in the same message format
+    as the records stream, returning the acknowledgement of each record in order.
+
+    The batch is a JSON (or MessagePack) array of messages, or NDJSON with one message per
+    line, in which case the records are processed in chunks while the rest of the body is
+    still being received (and decompressed). The records over the quota of their company
+    are acknowledged with a 429 error and the seconds to retry after. A body or an NDJSON
+    line exceeding the maximum size is rejected with a 413 error.
+    """
+    request_log: Optional[RequestLog] = request.app.state.request_log
+    scheduler: FairScheduler = request.app.state.scheduler
+
+    async def process(messages: list) -> list[dict]:
+        with log_stage(request, "process"):
+            acks = await scheduler.run_batch(
+                records.process_messages,
+                messages,
+                message_company,
+                quota_exceeded_ack,
+                failed_ack,
+            )
+        if request_log is not None:
+            request_log.audit_messages(messages, acks)
+        return acks
+
+    if is_ndjson(request):
+        acks = []
+        messages = []
+        lines = iter_lines(request.stream(), records.settings.batch_max_line_size)
+        try:
+            async for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    messages.append(None)
+                if len(messages) >= records.settings.batch_chunk_size:
+                    acks += await process(messages)
+                    messages = []
+        except LineTooLongError:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=AppEnum.BATCH_LINE_TOO_LONG_MSSG,
+            )
+        acks += await process(messages)
+
+    else:
+        body = await request.body()
+        try:
+            messages = (
+                msgpack.unpackb(body) if is_msgpack(request) else json.loads(body)
+            )
+        except Exception:
+            messages = None
+        if not isinstance(messages, list):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=AppEnum.INVALID_BATCH_MSSG,
+            )
+        acks = await process(messages)
+
+    return negotiated_response(request, {"acks": jsonable_encoder(acks)})
+
+
+@router.websocket("/ws/records")
+async def records_stream(websocket: WebSocket):
+    """
+    Stream endpoint to process vendor and invoice records over a long-lived connection.
+
+    Each message `{"seq": 1, "record_type": "vendor", "data": {...}}` consumes one credit.
+    Acknowledgements are sent in batches `{"type": "ack", "acks": [...], "credit": n}`,
+    granting back one credit per acknowledged message, and the connection is closed when
+    a client sends more messages than its credit allows. Messages can be sent in text or
+    binary (UTF-8 JSON) frames.
+    """
+    records: RecordService = websocket.app.state.records
+    settings: Settings = websocket.app.state.settings
+    scheduler: FairScheduler = websocket.app.state.scheduler
+
+    await websocket.accept()
+    credit = settings.ws_credit_window
+    acks = []
+    await websocket.send_json({"type": "credit", "credit": credit})
+
+    try:
+        while True:
+            try:
+                # Wait a little for more messages before flushing a partial batch
+                frame = await asyncio.wait_for(
+                    websocket.receive(),
+                    timeout=settings.ws_ack_flush_interval if acks else None,
+                )
+            except asyncio.TimeoutError:
+                raw_message = None
+            else:
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+                raw_message = frame.get("text")
+                if raw_message is None:
+                    raw_message = frame["bytes"]
+
+            if raw_message is not None:
+                if credit == 0:
+                    await websocket.close(
+                        code=1008, reason=AppEnum.CREDIT_EXCEEDED_MSSG.value
+                    )
+                    return
+                credit -= 1
+
+                try:
+                    message = json.loads(raw_message)
+                    if not isinstance(message, dict):
+                        raise ValueError
+                except ValueError:
+                    acks.append(
+                        error_ack(
+                            None,
+                            status.HTTP_400_BAD_REQUEST,
+                            AppEnum.INVALID_MESSAGE_MSSG,
+                        )
+                    )
+                else:
+                    acks += await scheduler.run_batch(
+                        records.process_messages,
+                        [message],
+                        message_company,
+                        quota_exceeded_ack,
+                        failed_ack,
+                    )
+
+            if acks and (
+                raw_message is None or len(acks) >= settings.ws_ack_batch_size
+            ):
+                credit += len(acks)
+                await websocket.send_json(
+                    {"type": "ack", "acks": jsonable_encoder(acks), "credit": len(acks)}
+                )
+                acks = []
+
+    except WebSocketDisconnect:
+        pass
+
+
+@router.get("/records/stream")
+async def stream_records(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    records: RecordService = Depends(get_record_service),
+):
+    """
+    Endpoint to follow the processed records as a change feed.
+
+    The records written from the `since` byte offset of the output (the end of the
+    output by default) are replayed, then the new ones are streamed as they are written.
+    Each event carries the offset to resume from after it. Records are streamed as NDJSON
+    `{"offset": n, "record": {...}}` lines, or as Server-Sent Events when requested with
+    `Accept: text/event-stream`, in which case `Last-Event-ID` can be used to resume.
+    """
+    await run_in_threadpool(records.refresh)
+
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    if since is None and sse and "last-event-id" in request.headers:
+        since = request.headers["last-event-id"]
+    try:
+        since = records.record_feed.offset if since is None else int(since)
+        if not is_line_start(records.settings.output_file, since):
+            raise ValueError
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=AppEnum.STREAM_OFFSET_INVALID_MSSG,
+        )
+
+    stream_format = "sse" if sse else "ndjson"
+    return StreamingResponse(
+        records.record_feed.stream(since, stream_format),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.get("/invoice-records")
+def get_invoice_records(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    company: Optional[str] = None,
+    records: RecordService = Depends(get_record_service),
+):
+    """Endpoint to stream the processed invoices dated within a range as NDJSON"""
+    date_from, date_to = normalize_date_range(date_from, date_to)
+    records.refresh()
+    return StreamingResponse(
+        records.invoice_date_index.iter_records(date_from, date_to, company),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/export/{table}")
+def export_table(
+    request: Request,
+    table: ExportTable,
+    company: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    row_group_size: Optional[int] = Query(None, gt=0),
+):
+    """Endpoint to stream the processed records as a chunked CSV table"""
+    settings: Settings = request.app.state.settings
+    date_from, date_to = normalize_date_range(date_from, date_to)
+    return StreamingResponse(
+        iter_csv_chunks(
+            table,
+            output_file=settings.output_file,
+            company=company,
+            date_from=date_from,
+            date_to=date_to,
+            row_group_size=min(
+                row_group_size or settings.export_row_group_size,
+                settings.export_row_group_size,
+            ),
+        ),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{table}.csv"'},
+    )
+
+
+@router.get("/stats/vendor-cache")
+def vendor_cache_stats(records: RecordService = Depends(get_record_service)):
+    """Endpoint to inspect the hit rate and memory footprint of the vendor cache"""
+    return records.vendor_cache.stats()
+
+
+@router.get("/stats/forwarding")
+def forwarding_stats(records: RecordService = Depends(get_record_service)):
+    """Endpoint to monitor the delivery backlog and latency of the forwarded records"""
+    if records.forwarding is None:
+        return {"destinations": []}
+    return records.forwarding.stats()
+
+
+@router.get("/stats/company-config")
+def company_config_stats(records: RecordService = Depends(get_record_service)):
+    """Endpoint to check the version of the company configuration in use and its reloads"""
+    return records.company_config.stats()
+
+
+@router.get("/stats/scheduler")
+def scheduler_stats(request: Request):
+    """Endpoint to monitor the queues, waits and quota rejections of each company"""
+    return request.app.state.scheduler.stats()
+
+
+@router.get("/stats/micro-batching")
+def micro_batching_stats(request: Request):
+    """Endpoint to monitor the batching of the concurrent single-record requests"""
+    return {
+        "vendor": request.app.state.vendor_batcher.stats(),
+        "invoice": request.app.state.invoice_batcher.stats(),
+    }
+
+
+@router.get("/stats/invoices")
+def invoice_stats(
+    company: Optional[str] = None,
+    account: Optional[str] = None,
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    records: RecordService = Depends(get_record_service),
+):
+    """
+    Endpoint to get the invoice count and amounts per company, account and month, and
+    the count of the invoices skipped as their date couldn't be parsed
+    """
+    records.refresh()
+    aggregates = records.invoice_aggregates
+    return {
+        "aggregates": aggregates.query(company=company, account=account, month=month),
+        "skipped": aggregates.skipped,
+    }
+
+
+@router.post("/admin/memory/snapshots", status_code=status.HTTP_201_CREATED)
+def take_memory_snapshot(profiler: MemoryProfiler = Depends(get_memory_profiler)):
+    """Endpoint to take a snapshot of the traced allocations, to be diffed later"""
+    return profiler.take_snapshot()
+
+
+@router.get("/admin/memory/snapshots/{snapshot_id}/diff")
+def diff_memory_snapshot(
+    snapshot_id: int,
+    base: Optional[int] = None,
+    group_by: Literal["module", "line"] = "module",
+    limit: int = Query(20, gt=0),
+    profiler: MemoryProfiler = Depends(get_memory_profiler),
+):
+    """
+    Endpoint to get the top allocation sites grown between a base snapshot (the previous
+    one by default) and a snapshot, grouped by module or by line of the `app/` modules
+    """
+    try:
+        return profiler.diff(snapshot_id, base, group_by, limit)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=AppEnum.MEMORY_SNAPSHOT_NOT_FOUND_MSSG,
+        )
+
+
+@router.get("/admin/memory/requests")
+def memory_request_stats(profiler: MemoryProfiler = Depends(get_memory_profiler)):
+    """Endpoint to get the allocations of the sampled requests per endpoint and company"""
+    return profiler.request_stats()
+
+
+@router.put("/admin/memory/sampling")
+def set_memory_sample_rate(
+    rate: float = Query(ge=0, le=1),
+    profiler: MemoryProfiler = Depends(get_memory_profiler),
+):
+    """Endpoint to tune the share of the requests whose allocations are measured"""
+    profiler.sample_rate = rate
+    return {"sample_rate": rate}
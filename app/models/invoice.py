@@ -1,7 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Literal, LiteralString, Optional
 
 from app.enums import VendorEnum
+from app.utils.dates import normalize_invoice_date
 
 
 class InvoiceLine(BaseModel):
@@ -19,6 +20,12 @@ class InvoiceInputBody(BaseModel):
     lines: list[InvoiceLine]
     other_details: Optional[dict] = None
 
+    @field_validator("invoiceDate")
+    @classmethod
+    def validate_invoice_date(cls, value: str) -> str:
+        """Parse the invoice date and normalize it to the ISO format"""
+        return normalize_invoice_date(value)
+
 
 class InvoiceOutput(BaseModel):
     """Generic parent model for processed invoice outputs from the corresponding endpoint."""
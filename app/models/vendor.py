@@ -1,8 +1,6 @@
 from pydantic import BaseModel
 from typing import Literal, LiteralString, Optional
 
-from app.enums import VendorEnum
-
 
 class VendorInputBody(BaseModel):
     """Model for the /vendor-record endpoint body"""
@@ -27,17 +25,14 @@ class _VendorOutput(BaseModel):
 class VendorOutputA(_VendorOutput):
     """Model for processed vendor output records for Company A."""
 
-    internationalBank: Optional[Literal[VendorEnum.CONFIRM_INTERNATIONAL_BANK_MSSG]] = (
-        None
-    )
+    # Message of the company configuration, `VendorEnum.CONFIRM_INTERNATIONAL_BANK_MSSG`
+    # by default
+    internationalBank: Optional[str] = None
 
 
 class VendorOutputB(_VendorOutput):
     """Model for processed vendor output records for Company B."""
 
-    vendorStatus: Optional[
-        Literal[
-            VendorEnum.STATUS_INCOMPLETE,
-            VendorEnum.STATUS_VERIFIED,
-        ]
-    ]
+    # Status message of the company configuration, `VendorEnum.STATUS_VERIFIED` or
+    # `VendorEnum.STATUS_INCOMPLETE` by default
+    vendorStatus: Optional[str]
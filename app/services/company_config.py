@@ -0,0 +1,286 @@
+"""Company-specific configuration of the strategies, reloaded while the service runs."""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from itertools import combinations
+from typing import Iterable, Iterator, Optional
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+from watchfiles import watch
+
+from app.enums import InvoiceEnum, VendorEnum
+from app.settings import COMPANY_CONFIG_MAX_KEYWORDS, COMPANY_CONFIG_RELOAD_DEBOUNCE
+
+logger = logging.getLogger(__name__)
+
+
+def compile_accounts(
+    keywords: tuple[str, ...], rules: dict[str, str]
+) -> dict[frozenset[str], str]:
+    """
+    Account of every combination of found keywords, from rules mapping `+`-joined
+    keywords (e.g. `alcohol+tobacco`, `""` for none of them) to an account. The most
+    specific rule whose keywords were all found applies, the first listed on a tie.
+    """
+    parsed = []
+    for key, account in rules.items():
+        rule_keywords = frozenset(
+            k.strip().lower() for k in key.split("+") if k.strip()
+        )
+        unknown = rule_keywords.difference(keywords)
+        if unknown:
+            raise ValueError(f"Account rule {key!r} uses unknown keywords {unknown}")
+        parsed.append((rule_keywords, account))
+    if frozenset() not in (rule_keywords for rule_keywords, _ in parsed):
+        raise ValueError('Account rules must have a default "" rule')
+
+    table = {}
+    for size in range(len(keywords) + 1):
+        for found in map(frozenset, combinations(keywords, size)):
+            _, _, table[found] = max(
+                (len(rule_keywords), -position, account)
+                for position, (rule_keywords, account) in enumerate(parsed)
+                if rule_keywords <= found
+            )
+    return table
+
+
+@dataclass(frozen=True)
+class CompanyConfig:
+    """
+    Configuration of the strategies of a company, with its accounts precompiled. Never
+    modified once built (plain dicts, so that it can be sent to the shard workers).
+    """
+
+    # Country of the company, whose vendors aren't international
+    local_country: str
+    international_bank_message: str
+    status_verified: str
+    status_incomplete: str
+    # Keywords looked for in the invoice lines (lowercase), and the account rules
+    keywords: tuple[str, ...]
+    account_rules: dict[str, str]
+    accounts: dict[frozenset[str], str] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self, "accounts", compile_accounts(self.keywords, self.account_rules)
+        )
+
+    def account(self, found_keywords: Iterable[str]) -> str:
+        """Account of an invoice whose lines contain the found keywords"""
+        return self.accounts[frozenset(found_keywords).intersection(self.keywords)]
+
+
+_VENDOR_MESSAGES = {
+    "local_country": "US",
+    "international_bank_message": VendorEnum.CONFIRM_INTERNATIONAL_BANK_MSSG.value,
+    "status_verified": VendorEnum.STATUS_VERIFIED.value,
+    "status_incomplete": VendorEnum.STATUS_INCOMPLETE.value,
+}
+
+# Built-in configuration of each company, overridden by the configuration file
+DEFAULT_COMPANIES: dict[str, CompanyConfig] = {
+    "A": CompanyConfig(
+        **_VENDOR_MESSAGES,
+        keywords=("alcohol",),
+        account_rules={
+            "alcohol": InvoiceEnum.ACCOUNT_ALC_001.value,
+            "": InvoiceEnum.ACCOUNT_STD_001.value,
+        },
+    ),
+    "B": CompanyConfig(
+        **_VENDOR_MESSAGES,
+        keywords=("alcohol", "tobacco"),
+        account_rules={
+            "alcohol+tobacco": InvoiceEnum.ACCOUNT_MULTI_B.value,
+            "alcohol": InvoiceEnum.ACCOUNT_ALC_B.value,
+            "tobacco": InvoiceEnum.ACCOUNT_TOB_B.value,
+            "": InvoiceEnum.ACCOUNT_STD_B.value,
+        },
+    ),
+}
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Immutable configuration of all the companies. A reload builds a new snapshot, so a
+    request holding one always sees a consistent configuration.
+    """
+
+    companies: dict[str, CompanyConfig]
+    version: int = 0
+    source: Optional[str] = None
+    loaded_at: float = field(default_factory=time.time)
+    # Keywords of all the companies, to classify lines received before their company
+    keywords: tuple[str, ...] = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self,
+            "keywords",
+            tuple(
+                dict.fromkeys(
+                    keyword
+                    for company in self.companies.values()
+                    for keyword in company.keywords
+                )
+            ),
+        )
+
+
+DEFAULT_CONFIG = ConfigSnapshot(DEFAULT_COMPANIES)
+
+# Snapshot applied by the strategies in the current context (request, batch or worker)
+_active_config: ContextVar[ConfigSnapshot] = ContextVar(
+    "company_config", default=DEFAULT_CONFIG
+)
+
+
+def active_config() -> ConfigSnapshot:
+    """Configuration snapshot of the current context, the built-in one by default"""
+    return _active_config.get()
+
+
+@contextmanager
+def using_config(snapshot: ConfigSnapshot) -> Iterator[ConfigSnapshot]:
+    """Apply a configuration snapshot to the strategies run in the block"""
+    token = _active_config.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _active_config.reset(token)
+
+
+class _CompanyOverrides(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    local_country: Optional[str] = None
+    international_bank_message: Optional[str] = None
+    status_verified: Optional[str] = None
+    status_incomplete: Optional[str] = None
+    keywords: Optional[list[str]] = None
+    accounts: Optional[dict[str, str]] = None
+
+
+class _ConfigFile(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    companies: dict[str, _CompanyOverrides] = {}
+
+
+def parse_config(raw, version: int = 0, source: Optional[str] = None) -> ConfigSnapshot:
+    """
+    Validate and compile a `{"companies": {"A": {...}}}` configuration, each company
+    overriding its built-in configuration. Raises `ValueError` if it's invalid.
+    """
+    try:
+        config_file = _ConfigFile.model_validate(raw)
+    except ValidationError as e:
+        raise ValueError(f"Invalid company configuration: {e}") from e
+
+    companies = dict(DEFAULT_COMPANIES)
+    for code, overrides in config_file.companies.items():
+        if code not in DEFAULT_COMPANIES:
+            raise ValueError(f"Unknown company: {code!r}")
+        values = overrides.model_dump(exclude_none=True)
+        if "keywords" in values:
+            keywords = tuple(
+                dict.fromkeys(keyword.strip().lower() for keyword in values["keywords"])
+            )
+            if "" in keywords or len(keywords) > COMPANY_CONFIG_MAX_KEYWORDS:
+                raise ValueError(
+                    f"Company {code!r} must have up to {COMPANY_CONFIG_MAX_KEYWORDS}"
+                    " non-empty keywords"
+                )
+            values["keywords"] = keywords
+        if "accounts" in values:
+            values["account_rules"] = values.pop("accounts")
+        companies[code] = replace(companies[code], **values)
+
+    return ConfigSnapshot(companies, version, source)
+
+
+def load_config(path: str, version: int = 0) -> ConfigSnapshot:
+    """Load and compile a JSON configuration file"""
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return parse_config(raw, version, path)
+
+
+class CompanyConfigStore:
+    """
+    Current configuration snapshot of the companies, loaded from `path` (the built-in
+    configuration without one) and reloaded in the background when the file changes.
+
+    A reload validates and compiles a new snapshot, then swaps the reference to it, so
+    readers never wait on a lock: each request takes `snapshot` once and uses it all
+    along. An invalid file is reported and the previous snapshot kept.
+    """
+
+    def __init__(self, path: str = ""):
+        self.path = os.path.abspath(path) if path else ""
+        self.snapshot = load_config(self.path) if self.path else DEFAULT_CONFIG
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def reload(self) -> bool:
+        """Reload the configuration file, returning whether the new snapshot is in use"""
+        try:
+            snapshot = load_config(self.path, self.snapshot.version + 1)
+        except (OSError, ValueError) as e:
+            self.failed_reloads += 1
+            self.last_error = str(e)
+            logger.warning("Company configuration not reloaded: %s", e)
+            return False
+
+        self.snapshot = snapshot
+        self.reloads += 1
+        self.last_error = None
+        logger.info("Company configuration reloaded, version %s", snapshot.version)
+        return True
+
+    def start(self) -> None:
+        """Watch the configuration file for changes in a background thread"""
+        if not self.path:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self) -> None:
+        # The directory is watched, as editors often replace the file by a new one
+        for _ in watch(
+            os.path.dirname(self.path),
+            watch_filter=lambda change, path: path == self.path,
+            debounce=COMPANY_CONFIG_RELOAD_DEBOUNCE,
+            recursive=False,
+            stop_event=self._stop_event,
+        ):
+            self.reload()
+
+    def stats(self) -> dict:
+        return {
+            "source": self.snapshot.source,
+            "version": self.snapshot.version,
+            "loaded_at": self.snapshot.loaded_at,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+        }
@@ -1,77 +1,110 @@
 """Invoice service that implements the company-specific rules through a strategy pattern."""
 
-from abc import ABC, abstractmethod
+from abc import ABC
+from typing import Iterable, Optional
 
 from app.models.invoice import (
     InvoiceInputBody,
     InvoiceOutput,
 )
-from app.enums import InvoiceEnum
+from app.models.outputs import trusted_output
+from app.services.company_config import CompanyConfig, active_config
 
 
 class InvoiceAbstractStrategy(ABC):
-    """Abstract base class for invoice service strategies"""
+    """
+    Abstract base class for invoice service strategies.
 
-    @classmethod
-    @abstractmethod
-    def process_invoice(cls, invoice: InvoiceInputBody) -> InvoiceOutput:
-        """Check specific fields according to company rules"""
-        pass  # pragma: no cover (skip coverage in tests)
+    The account of an invoice only depends on which keywords appear in the descriptions
+    of its lines, so the lines can be classified one by one as they are received. The
+    keywords and account rules are the ones of the company in the active configuration
+    snapshot, unless a strategy overrides `keywords` or `account`.
+    """
 
-
-class InvoiceStrategyA(InvoiceAbstractStrategy):
-    """Strategy for company A"""
+    # Company code of the strategy
+    company: str
+    # Keywords looked for in the line descriptions (lowercase), instead of the configured ones
+    keywords: Optional[tuple[str, ...]] = None
 
     @classmethod
-    def process_invoice(cls, invoice: InvoiceInputBody) -> InvoiceOutput:
-        """Check specific fields according to company A rules"""
+    def config(cls) -> CompanyConfig:
+        return active_config().companies[cls.company]
 
-        lines = invoice.lines
+    @classmethod
+    def account(cls, found_keywords: set[str]) -> str:
+        """Account of an invoice whose lines contain the found keywords"""
+        return cls.config().account(found_keywords)
 
-        invoice_account = InvoiceEnum.ACCOUNT_STD_001
+    @classmethod
+    def classifier(cls) -> "InvoiceLineClassifier":
+        keywords = cls.keywords if cls.keywords is not None else cls.config().keywords
+        return InvoiceLineClassifier(keywords)
 
-        for line in lines:
-            if "alcohol" in line.description.lower():
-                invoice_account = InvoiceEnum.ACCOUNT_ALC_001
+    @classmethod
+    def process_invoice(cls, invoice: InvoiceInputBody) -> InvoiceOutput:
+        """Check specific fields according to company rules"""
+        classifier = cls.classifier()
+        classifier.add_lines(line.description for line in invoice.lines)
 
-        return InvoiceOutput(
+        # The lines are the validated ones of the input, reused as they are
+        return trusted_output(
+            InvoiceOutput,
             invoiceId=invoice.invoiceId,
             invoiceDate=invoice.invoiceDate,
-            account=invoice_account,
+            account=cls.account(classifier.found_keywords),
             lines=invoice.lines,
         )
 
 
-class InvoiceStrategyB(InvoiceAbstractStrategy):
-    """Strategy for company B"""
+class InvoiceLineClassifier:
+    """
+    Keywords found in the lines of an invoice, added one by one. Once all the keywords
+    have been found the account can't change anymore, and the next lines are skipped.
+    """
 
-    @classmethod
-    def process_invoice(cls, invoice: InvoiceInputBody) -> InvoiceOutput:
-        """Check specific fields according to company B rules"""
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(keywords)
+        self.found_keywords: set[str] = set()
 
-        lines = invoice.lines
+    @property
+    def decided(self) -> bool:
+        return len(self.found_keywords) == len(self.keywords)
 
-        alcohol_account = False
-        tobacco_account = False
+    def add_line(self, description: str) -> None:
+        if self.decided:
+            return
+        description = description.lower()
+        for keyword in self.keywords:
+            if keyword in description:
+                self.found_keywords.add(keyword)
 
-        for line in lines:
-            if "alcohol" in line.description.lower():
-                alcohol_account = True
-            if "tobacco" in line.description.lower():
-                tobacco_account = True
+    def add_lines(self, descriptions: Iterable[str]) -> None:
+        for description in descriptions:
+            self.add_line(description)
+            if self.decided:
+                return
 
-        if alcohol_account and tobacco_account:
-            account = InvoiceEnum.ACCOUNT_MULTI_B
-        elif alcohol_account:
-            account = InvoiceEnum.ACCOUNT_ALC_B
-        elif tobacco_account:
-            account = InvoiceEnum.ACCOUNT_TOB_B
-        else:
-            account = InvoiceEnum.ACCOUNT_STD_B
 
-        return InvoiceOutput(
-            invoiceId=invoice.invoiceId,
-            invoiceDate=invoice.invoiceDate,
-            account=account,
-            lines=invoice.lines,
-        )
+class InvoiceStrategyA(InvoiceAbstractStrategy):
+    """
+    Strategy for company A: alcohol invoices go to the alcohol account, others to the
+    standard one (see `DEFAULT_COMPANIES`)
+    """
+
+    company = "A"
+
+
+class InvoiceStrategyB(InvoiceAbstractStrategy):
+    """
+    Strategy for company B: alcohol, tobacco, both or neither of them each have their
+    account (see `DEFAULT_COMPANIES`)
+    """
+
+    company = "B"
+
+
+# Invoice strategy of each company code
+INVOICE_STRATEGIES: dict[str, type[InvoiceAbstractStrategy]] = {
+    "A": InvoiceStrategyA,
+    "B": InvoiceStrategyB,
+}
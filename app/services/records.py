@@ -0,0 +1,671 @@
+"""Record service that processes vendor and invoice records and feeds the components built on their outputs."""
+
+from collections import defaultdict
+from functools import partial
+from http import HTTPStatus
+from typing import Optional
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.enums import AppEnum, InvoiceEnum
+from app.models.invoice import InvoiceInputBody, InvoiceLine
+from app.models.vendor import VendorInputBody
+from app.services.company_config import (
+    CompanyConfigStore,
+    ConfigSnapshot,
+    active_config,
+    using_config,
+)
+from app.services.invoice import INVOICE_STRATEGIES, InvoiceLineClassifier
+from app.services.vendor import VENDOR_STRATEGIES
+from app.settings import Settings
+from app.utils.date_index import InvoiceDateIndex
+from app.utils.file_writer import create_output_writer
+from app.utils.invoice_stats import InvoiceAggregates
+from app.utils.invoice_stream import InvoiceBodyParser, MsgpackInvoiceParser
+from app.utils.record_feed import RecordFeed
+from app.utils.shard_pool import ShardPool
+from app.utils.vendor_cache import VendorCache
+from app.utils.vendor_duplicates import VendorDuplicateIndex
+
+# Records run through the validators and strategies on warm-up
+_WARM_UP_VENDOR = {
+    "vendorName": "Warm-up Vendor",
+    "country": "US",
+    "bank": "Warm-up Bank",
+}
+_WARM_UP_INVOICE = {
+    "invoiceId": "WARM-UP",
+    "invoiceDate": "2025-01-01",
+    "lines": [{"description": "Warm-up alcohol and tobacco", "amount": 1.0}],
+}
+
+# Validator of the lines of an invoice received in a stream
+_INVOICE_LINES = TypeAdapter(list[InvoiceLine])
+
+
+class RecordProcessingError(Exception):
+    """
+    Error processing a record, with the HTTP status code and detail to report, and the
+    errors per field of a record that failed validation
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        detail: str,
+        errors: Optional[dict[str, list[str]]] = None,
+    ):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.errors = errors
+
+
+def reformat_validation_errors(errors: list[dict]) -> dict[str, list[str]]:
+    """Group the validation error messages by field, with nested fields in dot-notation"""
+    reformatted_message = defaultdict(list)
+    for pydantic_error in errors:
+        loc, msg = pydantic_error["loc"], pydantic_error["msg"]
+        filtered_loc = loc[1:] if loc and loc[0] in ("body", "query", "path") else loc
+        # nested fields with dot-notation
+        field_string = ".".join(map(str, filtered_loc))
+        reformatted_message[field_string].append(msg)
+
+    return reformatted_message
+
+
+def error_ack(seq, status_code: int, detail: str, **extra) -> dict:
+    """Acknowledgement of a message that couldn't be processed"""
+    return {
+        "seq": seq,
+        "status": "error",
+        "status_code": status_code,
+        "detail": detail,
+        **extra,
+    }
+
+
+def transform_vendor(vendor_input: VendorInputBody) -> dict:
+    """Apply the company strategy of a vendor record, returning its output data"""
+    strategy = VENDOR_STRATEGIES.get(vendor_input.company)
+    if strategy is None:
+        raise RecordProcessingError(HTTPStatus.NOT_FOUND, AppEnum.UNKNOWN_COMPANY_MSSG)
+
+    return strategy.process_vendor(vendor_input).model_dump()
+
+
+def transform_vendors(vendor_inputs: list[VendorInputBody]) -> list:
+    """
+    Apply the company strategies to vendor records received together, with one call per
+    company, returning the output data of each record or the error that prevented it
+    """
+    results: list = [None] * len(vendor_inputs)
+    groups: dict[str, list[int]] = defaultdict(list)
+    for index, vendor_input in enumerate(vendor_inputs):
+        groups[vendor_input.company].append(index)
+
+    for company, indices in groups.items():
+        strategy = VENDOR_STRATEGIES.get(company)
+        try:
+            if strategy is None:
+                raise RecordProcessingError(
+                    HTTPStatus.NOT_FOUND, AppEnum.UNKNOWN_COMPANY_MSSG
+                )
+            outputs = [
+                output.model_dump()
+                for output in strategy.process_vendors(
+                    [vendor_inputs[index] for index in indices]
+                )
+            ]
+        except Exception as e:
+            outputs = [e] * len(indices)
+        for index, output in zip(indices, outputs):
+            results[index] = output
+    return results
+
+
+def transform_invoice(invoice_input: InvoiceInputBody) -> dict:
+    """Apply the company strategy of an invoice record, returning its output data"""
+    if len(invoice_input.lines) == 0:
+        raise RecordProcessingError(
+            HTTPStatus.UNPROCESSABLE_ENTITY, InvoiceEnum.INVOICE_LINES_EMPTY_MSSG
+        )
+
+    strategy = INVOICE_STRATEGIES.get(invoice_input.company)
+    if strategy is None:
+        raise RecordProcessingError(HTTPStatus.NOT_FOUND, AppEnum.UNKNOWN_COMPANY_MSSG)
+
+    return strategy.process_invoice(invoice_input).model_dump()
+
+
+def referenced_vendor_name(invoice_input: InvoiceInputBody) -> Optional[str]:
+    """Name of the vendor an invoice references in its details, if it's a string"""
+    vendor_name = (invoice_input.other_details or {}).get("vendorName")
+    return vendor_name if isinstance(vendor_name, str) else None
+
+
+def transform_message(message: dict) -> dict:
+    """
+    Validate a `{"seq": 1, "record_type": "vendor", "data": {...}}` message and apply
+    its company strategy, without writing it. Returns the output to write,
+    `{"seq", "status": "ok", "company", "record_type", "data", "vendorName"}`, or the
+    error acknowledgement of the message.
+
+    This is the CPU-bound part of the processing, that can run in worker processes.
+    """
+    seq = message.get("seq")
+    try:
+        record_type = message.get("record_type")
+        if record_type == "vendor":
+            vendor_input = VendorInputBody.model_validate(message.get("data"))
+            return {
+                "seq": seq,
+                "status": "ok",
+                "company": vendor_input.company,
+                "record_type": "vendor",
+                "data": transform_vendor(vendor_input),
+            }
+
+        if record_type == "invoice":
+            invoice_input = InvoiceInputBody.model_validate(message.get("data"))
+            return {
+                "seq": seq,
+                "status": "ok",
+                "company": invoice_input.company,
+                "record_type": "invoice",
+                "data": transform_invoice(invoice_input),
+                # Vendor referenced by the invoice, to enrich it with
+                "vendorName": referenced_vendor_name(invoice_input),
+            }
+
+        raise RecordProcessingError(
+            HTTPStatus.UNPROCESSABLE_ENTITY, AppEnum.UNKNOWN_RECORD_TYPE_MSSG
+        )
+
+    except ValidationError as e:
+        return error_ack(
+            seq,
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            AppEnum.MISSING_REQUIRED_FIELDS_MSSG,
+            errors=reformat_validation_errors(e.errors()),
+        )
+
+    except RecordProcessingError as e:
+        return error_ack(seq, e.status_code, e.detail)
+
+    except Exception as e:
+        return error_ack(seq, HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+
+
+def transform_chunk(
+    messages: list[dict], config: Optional[ConfigSnapshot] = None
+) -> list[dict]:
+    """
+    `transform_message` over a chunk of messages, as run by the shard workers, under
+    the company configuration snapshot of the batch
+    """
+    with using_config(config or active_config()):
+        return [transform_message(message) for message in messages]
+
+
+class InvoiceStream:
+    """
+    Invoice record processed while its body is received, for invoices with a very large
+    number of lines.
+
+    The lines of each chunk are validated and classified by the company strategy as soon
+    as they are parsed, and only kept as the plain dicts written to the output, so
+    neither the body nor a model of every line is held in memory. The size of the body
+    and the number of lines are limited. The whole invoice is processed under the company
+    configuration snapshot active when it's created.
+    """
+
+    def __init__(
+        self,
+        max_body_size: int,
+        max_lines: int,
+        parser: Optional[InvoiceBodyParser | MsgpackInvoiceParser] = None,
+        config: Optional[ConfigSnapshot] = None,
+    ):
+        self.max_body_size = max_body_size
+        self.max_lines = max_lines
+        self.config = config or active_config()
+        self.body_size = 0
+        self.lines: list[dict] = []
+        self._parser = parser or InvoiceBodyParser()
+        self._classifier: Optional[InvoiceLineClassifier] = None
+
+    def feed(self, chunk: bytes) -> None:
+        """Process a chunk of the body"""
+        self.body_size += len(chunk)
+        if self.body_size > self.max_body_size:
+            raise RecordProcessingError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                InvoiceEnum.INVOICE_BODY_TOO_LARGE_MSSG,
+            )
+        with using_config(self.config):
+            self._add_lines(self._parse(self._parser.feed, chunk))
+
+    def finish(self) -> tuple[str, dict, Optional[str]]:
+        """
+        Process the end of the body and validate the other fields of the invoice,
+        returning its company, output data and referenced vendor name.
+        """
+        with using_config(self.config):
+            return self._finish()
+
+    def _finish(self) -> tuple[str, dict, Optional[str]]:
+        self._add_lines(self._parse(self._parser.close))
+
+        fields = self._parser.fields
+        if self._parser.has_lines:
+            # The lines are already validated
+            fields = {**fields, "lines": []}
+        try:
+            invoice_input = InvoiceInputBody.model_validate(fields)
+        except ValidationError as e:
+            raise RecordProcessingError(
+                HTTPStatus.UNPROCESSABLE_ENTITY,
+                AppEnum.MISSING_REQUIRED_FIELDS_MSSG,
+                errors=reformat_validation_errors(e.errors()),
+            )
+
+        if len(self.lines) == 0:
+            raise RecordProcessingError(
+                HTTPStatus.UNPROCESSABLE_ENTITY, InvoiceEnum.INVOICE_LINES_EMPTY_MSSG
+            )
+
+        strategy = INVOICE_STRATEGIES.get(invoice_input.company)
+        if strategy is None:
+            raise RecordProcessingError(
+                HTTPStatus.NOT_FOUND, AppEnum.UNKNOWN_COMPANY_MSSG
+            )
+
+        invoice_data = {
+            "invoiceId": invoice_input.invoiceId,
+            "invoiceDate": invoice_input.invoiceDate,
+            "account": strategy.account(self._classifier.found_keywords),
+            "lines": self.lines,
+        }
+        return (
+            invoice_input.company,
+            invoice_data,
+            referenced_vendor_name(invoice_input),
+        )
+
+    def _parse(self, parse, *args) -> list:
+        try:
+            return parse(*args)
+        except ValueError:
+            raise RecordProcessingError(
+                HTTPStatus.UNPROCESSABLE_ENTITY, AppEnum.INVALID_BODY_MSSG
+            )
+
+    def _add_lines(self, lines: list) -> None:
+        if not lines:
+            return
+        if self._classifier is None:
+            # Lines received before the company are classified for every strategy
+            company = self._parser.fields.get("company")
+            strategy = INVOICE_STRATEGIES.get(
+                company if isinstance(company, str) else None
+            )
+            self._classifier = (
+                strategy.classifier()
+                if strategy is not None
+                else InvoiceLineClassifier(self.config.keywords)
+            )
+
+        if len(self.lines) + len(lines) > self.max_lines:
+            raise RecordProcessingError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                InvoiceEnum.INVOICE_TOO_MANY_LINES_MSSG,
+            )
+        try:
+            invoice_lines = _INVOICE_LINES.validate_python(lines)
+        except ValidationError as e:
+            # Locate the errors in the lines of the whole invoice
+            errors = [
+                {
+                    **error,
+                    "loc": (
+                        "lines",
+                        len(self.lines) + error["loc"][0],
+                        *error["loc"][1:],
+                    ),
+                }
+                for error in e.errors()
+            ]
+            raise RecordProcessingError(
+                HTTPStatus.UNPROCESSABLE_ENTITY,
+                AppEnum.MISSING_REQUIRED_FIELDS_MSSG,
+                errors=reformat_validation_errors(errors),
+            )
+
+        self._classifier.add_lines(line.description for line in invoice_lines)
+        self.lines.extend(_INVOICE_LINES.dump_python(invoice_lines))
+
+
+class RecordService:
+    """
+    Processes the records with their company strategy and writes them to the output.
+
+    It also owns the in-memory components fed by the outputs (vendor cache, vendor
+    duplicates index, invoice aggregates, date index and records feed), configured from
+    the service settings.
+    """
+
+    def __init__(self, settings: Settings, follow_output_file: bool = True):
+        self.settings = settings
+        self.output = create_output_writer(settings)
+        # The file-backed components only follow the output file of the jsonl backend
+        self.follows_output_file = (
+            follow_output_file and settings.output_backend == "jsonl"
+        )
+
+        self.vendor_cache = VendorCache(settings.vendor_cache_max_entries)
+        self.vendor_duplicates = VendorDuplicateIndex(
+            settings.vendor_duplicate_threshold
+        )
+        self.invoice_aggregates = InvoiceAggregates(
+            settings.output_file,
+            checkpoint_every=settings.invoice_stats_checkpoint_every,
+        )
+        self.invoice_date_index = InvoiceDateIndex(settings.output_file)
+        self.record_feed = RecordFeed(
+            settings.output_file, settings.record_stream_buffer_size
+        )
+        # Records forwarded to the downstream ingestion APIs, when configured
+        forward_urls = [
+            url.strip() for url in settings.forward_urls.split(",") if url.strip()
+        ]
+        self.forwarding = None
+        if forward_urls:
+            # Imported only when forwarding, as it loads the HTTP client
+            from app.utils.forwarding import ForwardingSink
+
+            self.forwarding = ForwardingSink(
+                forward_urls,
+                settings.forward_queue_dir,
+                settings.forward_batch_size,
+                settings.forward_batch_interval,
+                settings.forward_timeout,
+                settings.forward_backoff_base,
+                settings.forward_backoff_max,
+            )
+        # Company configuration, reloaded in the background when its file changes
+        self.company_config = CompanyConfigStore(settings.company_config_file)
+        # CPU-bound processing of the batches in worker processes, when enabled
+        self.shard_pool = (
+            ShardPool(settings.shard_workers, settings.shard_by)
+            if settings.shard_workers > 0
+            else None
+        )
+
+    def process_vendor(self, vendor_input: VendorInputBody) -> dict:
+        """Process a vendor record with its company strategy and write it to the output"""
+        with using_config(self.company_config.snapshot):
+            vendor_data = transform_vendor(vendor_input)
+        return self.write_vendor(vendor_input.company, vendor_data)
+
+    def process_invoice(self, invoice_input: InvoiceInputBody) -> dict:
+        """Process an invoice record with its company strategy and write it to the output"""
+        with using_config(self.company_config.snapshot):
+            invoice_data = transform_invoice(invoice_input)
+        return self.write_invoice(
+            invoice_input.company, invoice_data, referenced_vendor_name(invoice_input)
+        )
+
+    def invoice_stream(self, msgpack: bool = False) -> InvoiceStream:
+        """New invoice record to process while its JSON (or MessagePack) body is received"""
+        return InvoiceStream(
+            self.settings.invoice_max_body_size,
+            self.settings.invoice_max_lines,
+            MsgpackInvoiceParser() if msgpack else InvoiceBodyParser(),
+            self.company_config.snapshot,
+        )
+
+    def process_vendors(self, vendor_inputs: list[VendorInputBody]) -> list:
+        """
+        Process vendor records received together, e.g. concurrent requests batched by the
+        service, and write them to the output at once. Returns the output data of each
+        record, or the error that prevented processing it.
+        """
+        with using_config(self.company_config.snapshot):
+            results = transform_vendors(vendor_inputs)
+        written = [
+            index
+            for index, result in enumerate(results)
+            if not isinstance(result, Exception)
+        ]
+        errors = self.write_records(
+            [
+                (vendor_inputs[index].company, "vendor", results[index], None)
+                for index in written
+            ]
+        )
+        for index, error in zip(written, errors):
+            if error is not None:
+                results[index] = error
+        return results
+
+    def write_vendor(self, company: str, vendor_data: dict) -> dict:
+        """Write a processed vendor to the output and the vendor components"""
+        self._write_record((company, "vendor", vendor_data, None))
+        return vendor_data
+
+    def write_invoice(
+        self, company: str, invoice_data: dict, vendor_name: Optional[str] = None
+    ) -> dict:
+        """Write a processed invoice to the output, enriched with its vendor details"""
+        self._write_record((company, "invoice", invoice_data, vendor_name))
+        return invoice_data
+
+    def _write_record(self, record: tuple[str, str, dict, Optional[str]]) -> None:
+        [error] = self.write_records([record])
+        if error is not None:
+            raise error
+
+    def write_invoices(self, invoices: list[tuple[str, dict, Optional[str]]]) -> list:
+        """
+        Write processed `(company, invoice_data, vendor_name)` invoices at once, returning
+        the output data of each invoice or the error that prevented writing it
+        """
+        errors = self.write_records(
+            [
+                (company, "invoice", invoice_data, vendor_name)
+                for company, invoice_data, vendor_name in invoices
+            ]
+        )
+        return [
+            invoice_data if error is None else error
+            for (_, invoice_data, _), error in zip(invoices, errors)
+        ]
+
+    def write_records(
+        self, records: list[tuple[str, str, dict, Optional[str]]]
+    ) -> list[Optional[Exception]]:
+        """
+        Write processed `(company, record_type, data, vendor_name)` records to the output
+        with a single write, then feed them to the components. The invoices are enriched
+        with the details of their vendor, processed before or earlier in the records.
+
+        Returns the error of each record that couldn't be prepared for the write, and
+        was left out of it, or None, so a bad record doesn't fail the others. Errors of
+        the write itself are raised.
+        """
+        errors: list[Optional[Exception]] = []
+        prepared = []
+        # Vendors of the records, not in the vendor cache until they're written
+        vendors: dict[tuple[str, str], dict] = {}
+        for record in records:
+            company, record_type, data, vendor_name = record
+            try:
+                if record_type == "vendor":
+                    vendors[(company, data["vendorName"])] = data
+                elif vendor_name is not None:
+                    self._attach_vendor(vendors, company, data, vendor_name)
+            except Exception as e:
+                errors.append(e)
+                continue
+            errors.append(None)
+            prepared.append(record)
+        if not prepared:
+            return errors
+
+        self.output.append_many(
+            [(company, record_type, data) for company, record_type, data, _ in prepared]
+        )
+        for company, record_type, data, _ in prepared:
+            if self.forwarding is not None:
+                self.forwarding.append(company, record_type, data)
+            if record_type == "vendor":
+                self.vendor_cache.put(company, data)
+                self.vendor_duplicates.add(company, data["vendorName"])
+        self.refresh()
+        return errors
+
+    def _attach_vendor(
+        self, vendors: dict, company: str, data: dict, vendor_name: str
+    ) -> None:
+        """Attach the vendor details when the invoice references a processed vendor"""
+        vendor = vendors.get((company, vendor_name))
+        vendor = (
+            self.vendor_cache.get(company, vendor_name)
+            if vendor is None
+            else {
+                "country": vendor["country"],
+                "vendorStatus": vendor.get("vendorStatus"),
+            }
+        )
+        if vendor is not None:
+            data["vendor"] = vendor
+
+    def process_message(self, message: dict) -> dict:
+        """
+        Validate and process a `{"seq": 1, "record_type": "vendor", "data": {...}}`
+        message, returning its acknowledgement.
+        """
+        return self.process_messages([message])[0]
+
+    def process_messages(self, messages: list) -> list[dict]:
+        """
+        Process a batch of messages, returning their acknowledgements in order. Messages
+        that aren't JSON objects are acknowledged with a 400 error.
+
+        With shard workers, the messages are validated and transformed in parallel by
+        the worker processes, and their outputs are written here in the batch order. The
+        whole batch is processed under the same company configuration snapshot.
+        """
+        valid_messages = [message for message in messages if isinstance(message, dict)]
+        transform = partial(transform_chunk, config=self.company_config.snapshot)
+        if self.shard_pool is None:
+            results = transform(valid_messages)
+        else:
+            results = self.shard_pool.map(transform, valid_messages)
+        acks = iter(self.write_results(results))
+        return [
+            (
+                next(acks)
+                if isinstance(message, dict)
+                else error_ack(
+                    None, HTTPStatus.BAD_REQUEST, AppEnum.INVALID_MESSAGE_MSSG
+                )
+            )
+            for message in messages
+        ]
+
+    def write_results(self, results: list[dict]) -> list[dict]:
+        """
+        Write the outputs of transformed messages at once, returning their
+        acknowledgements. A record that can't be written is acknowledged with a 500
+        error, and all of them are if the write itself fails.
+        """
+        outputs = [result for result in results if result["status"] == "ok"]
+        try:
+            errors = self.write_records(
+                [
+                    (
+                        result["company"],
+                        result["record_type"],
+                        result["data"],
+                        result.get("vendorName"),
+                    )
+                    for result in outputs
+                ]
+            )
+        except Exception as e:
+            return [
+                (
+                    error_ack(result["seq"], HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+                    if result["status"] == "ok"
+                    else result
+                )
+                for result in results
+            ]
+
+        errors = iter(errors)
+        acks = []
+        for result in results:
+            error = next(errors) if result["status"] == "ok" else None
+            if result["status"] != "ok":
+                acks.append(result)
+            elif error is not None:
+                acks.append(
+                    error_ack(
+                        result["seq"], HTTPStatus.INTERNAL_SERVER_ERROR, str(error)
+                    )
+                )
+            else:
+                acks.append(
+                    {
+                        "seq": result["seq"],
+                        "status": "ok",
+                        "status_code": HTTPStatus.CREATED,
+                    }
+                )
+        return acks
+
+    def refresh(self) -> None:
+        """Bring the components following the output file up to date"""
+        if self.follows_output_file:
+            self.invoice_aggregates.refresh()
+            self.invoice_date_index.refresh()
+            self.record_feed.refresh()
+
+    def warm_up(self) -> None:
+        """
+        Load the components from the output file, and run the validators and strategy
+        tables once so the first requests don't pay for their lazy initialization.
+        """
+        if self.follows_output_file:
+            self.vendor_cache.warm_load(self.settings.output_file)
+            self.vendor_duplicates.warm_load(self.settings.output_file)
+            self.invoice_aggregates.load_checkpoint()
+            self.refresh()
+
+        with using_config(self.company_config.snapshot):
+            for company, strategy in VENDOR_STRATEGIES.items():
+                vendor_input = VendorInputBody(company=company, **_WARM_UP_VENDOR)
+                strategy.process_vendor(vendor_input).model_dump()
+            for company, strategy in INVOICE_STRATEGIES.items():
+                invoice_input = InvoiceInputBody(company=company, **_WARM_UP_INVOICE)
+                strategy.process_invoice(invoice_input).model_dump()
+
+        if self.shard_pool is not None:
+            self.shard_pool.start(transform_chunk)
+        if self.forwarding is not None:
+            self.forwarding.start()
+        self.company_config.start()
+
+    def close(self) -> None:
+        """End the records streams and checkpoint the state that has to survive a restart"""
+        self.record_feed.close()
+        self.company_config.stop()
+        if self.shard_pool is not None:
+            self.shard_pool.close()
+        if self.forwarding is not None:
+            self.forwarding.close()
+        if self.follows_output_file:
+            self.invoice_aggregates.checkpoint()
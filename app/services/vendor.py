@@ -2,16 +2,27 @@
 
 from abc import ABC, abstractmethod
 
+from app.models.outputs import trusted_output
 from app.models.vendor import (
     VendorInputBody,
     VendorOutputA,
     VendorOutputB,
 )
-from app.enums import VendorEnum
+from app.services.company_config import CompanyConfig, active_config
 
 
 class VendorAbstractStrategy(ABC):
-    """Abstract base class for vendor service strategies"""
+    """
+    Abstract base class for vendor service strategies, applying the configuration of
+    their company in the active snapshot (local country, status messages)
+    """
+
+    # Company code of the strategy
+    company: str
+
+    @classmethod
+    def config(cls) -> CompanyConfig:
+        return active_config().companies[cls.company]
 
     @classmethod
     @abstractmethod
@@ -19,21 +30,32 @@ class VendorAbstractStrategy(ABC):
         """Check specific fields according to company rules"""
         pass  # pragma: no cover (skip coverage in tests)
 
+    @classmethod
+    def process_vendors(
+        cls, vendors: list[VendorInputBody]
+    ) -> list[VendorOutputA | VendorOutputB]:
+        """Process vendors received together, under the same configuration snapshot"""
+        return [cls.process_vendor(vendor) for vendor in vendors]
+
 
 class VendorStrategyA(VendorAbstractStrategy):
     """Strategy for company A"""
 
+    company = "A"
+
     @classmethod
     def process_vendor(cls, vendor: VendorInputBody) -> VendorOutputA:
         """Check specific fields according to company A rules"""
-        return VendorOutputA(
+        config = cls.config()
+        return trusted_output(
+            VendorOutputA,
             vendorName=vendor.vendorName,
             country=vendor.country,
             bank=vendor.bank,
             # Only add internationalBank if country is not local (US)
             internationalBank=(
-                VendorEnum.CONFIRM_INTERNATIONAL_BANK_MSSG
-                if vendor.country != "US"
+                config.international_bank_message
+                if vendor.country != config.local_country
                 else None
             ),
         )
@@ -42,21 +64,32 @@ class VendorStrategyA(VendorAbstractStrategy):
 class VendorStrategyB(VendorAbstractStrategy):
     """Strategy for company B"""
 
+    company = "B"
+
     @classmethod
     def process_vendor(cls, vendor: VendorInputBody) -> VendorOutputB:
         """Check specific fields according to company B rules"""
-        if vendor.country == "US":
+        config = cls.config()
+        if vendor.country == config.local_country:
             if vendor.registrationNumber and vendor.taxId:
-                vendor_status = VendorEnum.STATUS_VERIFIED
+                vendor_status = config.status_verified
             else:
-                vendor_status = VendorEnum.STATUS_INCOMPLETE
+                vendor_status = config.status_incomplete
         else:
             # RE-CHECK: I'm assuming that non-US vendors don't need verification, therefore no vendor status?
             vendor_status = None
 
-        return VendorOutputB(
+        return trusted_output(
+            VendorOutputB,
             vendorName=vendor.vendorName,
             country=vendor.country,
             bank=vendor.bank,
             vendorStatus=vendor_status,
         )
+
+
+# Vendor strategy of each company code
+VENDOR_STRATEGIES: dict[str, type[VendorAbstractStrategy]] = {
+    "A": VendorStrategyA,
+    "B": VendorStrategyB,
+}
@@ -3,6 +3,189 @@ Settings for the middleware service.
 """
 
 import os
+from dataclasses import dataclass, fields
+from typing import Literal, Mapping
+
+# Prefix of the environment variables read by `Settings.from_env`
+ENV_PREFIX = "MIDDLEWARE_"
 
 MIDDLEWARE_SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 OUTPUT_FILE = os.path.join(MIDDLEWARE_SERVICE_DIR, "output.jsonl")
+
+# Maximum number of rows held in memory per row group when exporting records
+EXPORT_ROW_GROUP_SIZE = 10_000
+
+# Maximum number of vendors kept in the in-memory vendor master cache
+VENDOR_CACHE_MAX_ENTRIES = 100_000
+
+# Minimum n-gram similarity of two vendor names of a company to flag them as duplicates
+VENDOR_DUPLICATE_THRESHOLD = 0.6
+
+# Number of applied invoices after which the invoice aggregates are checkpointed
+INVOICE_STATS_CHECKPOINT_EVERY = 1_000
+
+# Largest invoice body (bytes) and number of lines accepted by `/invoice-record`
+INVOICE_MAX_BODY_SIZE = 32 * 1024 * 1024
+INVOICE_MAX_LINES = 100_000
+
+# Largest size (bytes, once decompressed) of the request bodies, and compression ratio of
+# the compressed ones
+REQUEST_MAX_DECOMPRESSED_SIZE = 256 * 1024 * 1024
+REQUEST_MAX_COMPRESSION_RATIO = 200
+
+# Records of an NDJSON batch processed together while the rest of the body is received
+BATCH_CHUNK_SIZE = 500
+# Longest line (bytes) of an NDJSON batch, buffered until its end is received
+BATCH_MAX_LINE_SIZE = 32 * 1024 * 1024
+
+# Records stream (WebSocket): messages a client may send before receiving more credit,
+# acknowledgements sent per batch, and seconds to wait for more messages before
+# flushing a partial batch of acknowledgements
+WS_CREDIT_WINDOW = 256
+WS_ACK_BATCH_SIZE = 64
+WS_ACK_FLUSH_INTERVAL = 0.05
+
+# Records buffered per consumer of the records stream before it is disconnected as too slow
+RECORD_STREAM_BUFFER_SIZE = 1_000
+
+# Worker processes validating and transforming the batches of records (0 processes them
+# in the service process), and whether records are partitioned by company or record key
+SHARD_WORKERS = 0
+SHARD_BY = "key"
+
+# Spool directory watched by the file ingestion worker, and records processed per chunk
+SPOOL_DIR = os.path.join(MIDDLEWARE_SERVICE_DIR, "spool")
+SPOOL_CHUNK_SIZE = 500
+
+# Opt-in memory instrumentation: share of the requests whose allocations are measured,
+# frames traced per allocation, and snapshots kept to be diffed
+MEMORY_PROFILING = False
+MEMORY_SAMPLE_RATE = 0.01
+MEMORY_TRACEBACK_FRAMES = 1
+MEMORY_MAX_SNAPSHOTS = 10
+
+# Opt-in structured access and audit logs: share of the successful requests and records logged
+# (errors are always logged), and records queued for the logging thread before dropping
+REQUEST_LOG = False
+LOG_SAMPLE_RATE = 0.1
+LOG_QUEUE_SIZE = 10_000
+
+# Records forwarded to the downstream ingestion APIs: records per batch, seconds between
+# the deliveries of partial batches, request timeout, directory of the disk-backed retry
+# queues, and base and maximum seconds of the backoff of a failing destination
+FORWARD_BATCH_SIZE = 500
+FORWARD_BATCH_INTERVAL = 1.0
+FORWARD_TIMEOUT = 10.0
+FORWARD_QUEUE_DIR = os.path.join(MIDDLEWARE_SERVICE_DIR, "forward_queue")
+FORWARD_BACKOFF_BASE = 0.5
+FORWARD_BACKOFF_MAX = 60.0
+
+# Fair scheduling of the record processing across companies: jobs running at once in
+# the thread pool (0 runs them right away, only applying the quotas), and per company (1
+# keeps its records in order), jobs queued per company before rejecting its requests,
+# and records per job of a batch
+SCHEDULER_CONCURRENCY = 4
+SCHEDULER_COMPANY_CONCURRENCY = 1
+SCHEDULER_MAX_QUEUED = 1_000
+SCHEDULER_SLICE_SIZE = 50
+
+# Company configuration: milliseconds of changes to the file grouped into one reload, and
+# keywords per company (their combinations are precompiled into an accounts table)
+COMPANY_CONFIG_RELOAD_DEBOUNCE = 200
+COMPANY_CONFIG_MAX_KEYWORDS = 10
+
+# Micro-batching of the concurrent single-record requests: records per batch (1 disables
+# it), and maximum seconds a record waits for others, reached as the batches grow under
+# load (at low load, the records are processed right away)
+MICRO_BATCH_MAX_SIZE = 50
+MICRO_BATCH_MAX_WINDOW = 0.002
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Configuration of a service instance, see `create_app`.
+
+    Every field can be set through a `MIDDLEWARE_<FIELD>` environment variable, e.g.
+    `MIDDLEWARE_OUTPUT_FILE=/data/output.jsonl` or `MIDDLEWARE_OUTPUT_FSYNC=true`.
+    """
+
+    # "jsonl" appends the records to `output_file`, "memory" keeps them in a list
+    # (tests and tools), in which case the components following the file stay empty
+    output_backend: Literal["jsonl", "memory"] = "jsonl"
+    output_file: str = OUTPUT_FILE
+    # Writer policy: fsync the output file after every record for durability
+    output_fsync: bool = False
+    export_row_group_size: int = EXPORT_ROW_GROUP_SIZE
+    vendor_cache_max_entries: int = VENDOR_CACHE_MAX_ENTRIES
+    vendor_duplicate_threshold: float = VENDOR_DUPLICATE_THRESHOLD
+    invoice_stats_checkpoint_every: int = INVOICE_STATS_CHECKPOINT_EVERY
+    invoice_max_body_size: int = INVOICE_MAX_BODY_SIZE
+    invoice_max_lines: int = INVOICE_MAX_LINES
+    request_max_decompressed_size: int = REQUEST_MAX_DECOMPRESSED_SIZE
+    request_max_compression_ratio: int = REQUEST_MAX_COMPRESSION_RATIO
+    batch_chunk_size: int = BATCH_CHUNK_SIZE
+    batch_max_line_size: int = BATCH_MAX_LINE_SIZE
+    ws_credit_window: int = WS_CREDIT_WINDOW
+    ws_ack_batch_size: int = WS_ACK_BATCH_SIZE
+    ws_ack_flush_interval: float = WS_ACK_FLUSH_INTERVAL
+    record_stream_buffer_size: int = RECORD_STREAM_BUFFER_SIZE
+    shard_workers: int = SHARD_WORKERS
+    shard_by: Literal["company", "key"] = SHARD_BY
+    spool_dir: str = SPOOL_DIR
+    spool_chunk_size: int = SPOOL_CHUNK_SIZE
+    # Trace the allocations with `tracemalloc`, at the cost of a slower service
+    memory_profiling: bool = MEMORY_PROFILING
+    memory_sample_rate: float = MEMORY_SAMPLE_RATE
+    memory_traceback_frames: int = MEMORY_TRACEBACK_FRAMES
+    memory_max_snapshots: int = MEMORY_MAX_SNAPSHOTS
+    # JSON access and audit logs, written to `log_file` (stderr when empty)
+    request_log: bool = REQUEST_LOG
+    log_file: str = ""
+    log_sample_rate: float = LOG_SAMPLE_RATE
+    log_queue_size: int = LOG_QUEUE_SIZE
+    # Comma-separated URLs of the ingestion APIs the written records are forwarded to
+    forward_urls: str = ""
+    forward_batch_size: int = FORWARD_BATCH_SIZE
+    forward_batch_interval: float = FORWARD_BATCH_INTERVAL
+    forward_timeout: float = FORWARD_TIMEOUT
+    forward_queue_dir: str = FORWARD_QUEUE_DIR
+    forward_backoff_base: float = FORWARD_BACKOFF_BASE
+    forward_backoff_max: float = FORWARD_BACKOFF_MAX
+    scheduler_concurrency: int = SCHEDULER_CONCURRENCY
+    scheduler_company_concurrency: int = SCHEDULER_COMPANY_CONCURRENCY
+    scheduler_max_queued: int = SCHEDULER_MAX_QUEUED
+    scheduler_slice_size: int = SCHEDULER_SLICE_SIZE
+    # Round-robin weights (`A=3,B=1`) and quotas in records per second with an optional
+    # burst (`A=500:1000,B=100`) per company code, `*` setting them for the others
+    company_weights: str = ""
+    company_quotas: str = ""
+    # JSON file overriding the built-in company configuration, reloaded when it changes
+    company_config_file: str = ""
+    micro_batch_max_size: int = MICRO_BATCH_MAX_SIZE
+    micro_batch_max_window: float = MICRO_BATCH_MAX_WINDOW
+
+    def __post_init__(self):
+        if self.output_backend not in ("jsonl", "memory"):
+            raise ValueError(f"Unknown output backend: {self.output_backend}")
+        if self.shard_by not in ("company", "key"):
+            raise ValueError(f"Unknown shard key: {self.shard_by}")
+
+    @classmethod
+    def from_env(
+        cls, environ: Mapping[str, str] = os.environ, **overrides
+    ) -> "Settings":
+        """Load the settings from the `MIDDLEWARE_*` environment variables"""
+        values = {}
+        for field in fields(cls):
+            raw_value = environ.get(f"{ENV_PREFIX}{field.name.upper()}")
+            if raw_value is None:
+                continue
+            if field.type is bool:
+                values[field.name] = raw_value.strip().lower() in ("1", "true", "yes")
+            elif field.type in (int, float):
+                values[field.name] = field.type(raw_value)
+            else:
+                values[field.name] = raw_value
+
+        return cls(**{**values, **overrides})
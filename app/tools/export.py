@@ -0,0 +1,55 @@
+"""
+Command line tool to export the processed records into columnar tables.
+
+Usage:
+    python -m app.tools.export exports/ --format parquet --company A --date-from 2025-03-01
+"""
+
+import argparse
+from typing import Optional, Sequence
+
+from app.settings import EXPORT_ROW_GROUP_SIZE, OUTPUT_FILE
+from app.utils.dates import normalize_invoice_date
+from app.utils.export import export_tables
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "destination_dir", help="Directory where the tables are written"
+    )
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument(
+        "--output-file", default=OUTPUT_FILE, help="JSONL file to export"
+    )
+    parser.add_argument("--company")
+    parser.add_argument("--record-type", choices=("vendor", "invoice"))
+    parser.add_argument(
+        "--date-from",
+        type=normalize_invoice_date,
+        help="Minimum invoiceDate (inclusive, ISO format)",
+    )
+    parser.add_argument(
+        "--date-to",
+        type=normalize_invoice_date,
+        help="Maximum invoiceDate (inclusive, ISO format)",
+    )
+    parser.add_argument("--row-group-size", type=int, default=EXPORT_ROW_GROUP_SIZE)
+    args = parser.parse_args(argv)
+
+    written = export_tables(
+        args.destination_dir,
+        file_format=args.format,
+        record_type=args.record_type,
+        row_group_size=args.row_group_size,
+        output_file=args.output_file,
+        company=args.company,
+        date_from=args.date_from,
+        date_to=args.date_to,
+    )
+    for path in written:
+        print(path)
+
+
+if __name__ == "__main__":  # pragma: no cover (skip coverage in tests)
+    main()
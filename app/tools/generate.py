@@ -0,0 +1,304 @@
+"""
+Generator of seeded synthetic vendor and invoice records for scale testing.
+
+Usage:
+    python -m app.tools.generate dataset/ --records 1000000 --records-per-file 100000 --gzip
+    python -m app.tools.generate --url http://localhost:8000 --records 100000
+
+The records are messages in the same format as the records stream,
+`{"seq": 1, "record_type": "invoice", "data": {...}}`, written to NDJSON files or posted
+as NDJSON batches to the `/records/batch` endpoint of a running service. The same seed
+and options always generate the same records, whatever their number or destination.
+
+The mix of the records is configurable: the share of each company (unknown companies
+included), of each vendor country, of the vendors missing their registration number or
+tax id, the number of invoice lines (mostly small, with a heavy tail of very large
+invoices) and the frequency of the keywords the invoice rules look for.
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from itertools import islice
+from typing import Iterator, Optional, Sequence
+
+import httpx
+
+from app.utils.media_types import NDJSON_MEDIA_TYPES
+
+# Records written per file, and posted per request to the service
+GENERATE_RECORDS_PER_FILE = 1_000_000
+GENERATE_BATCH_SIZE = 1_000
+
+# Line descriptions without any keyword of the invoice rules
+PLAIN_DESCRIPTIONS = (
+    "Office supplies",
+    "Stationery",
+    "Paper",
+    "Snacks",
+    "Cleaning services",
+    "Software license",
+    "Consulting hours",
+    "Shipping",
+)
+# Line descriptions of each keyword, in the various cases the rules must match
+KEYWORD_DESCRIPTIONS = {
+    "alcohol": ("Beverages - alcohol", "Alcohol beverages", "ALCOHOL (wine)"),
+    "tobacco": ("Tobacco products", "Cigars - tobacco", "TOBACCO"),
+}
+BANKS = ("Bank X", "Bank Y", "Local Bank Y", "Global Bank Z")
+
+
+@dataclass(frozen=True)
+class DatasetConfig:
+    """Mix of the generated records, see `generate_messages`"""
+
+    seed: int = 1
+    # Share of vendor records, the others being invoices
+    vendor_rate: float = 0.2
+    # Weight of each company, unknown companies (e.g. "C") being rejected by the service
+    companies: dict[str, float] = field(default_factory=lambda: {"A": 0.5, "B": 0.5})
+    # Weight of each vendor country
+    countries: dict[str, float] = field(
+        default_factory=lambda: {"US": 0.6, "FR": 0.15, "DE": 0.15, "CL": 0.1}
+    )
+    # Share of the vendors missing their registration number, and their tax id
+    missing_registration_rate: float = 0.1
+    missing_tax_id_rate: float = 0.1
+    # Distinct vendor names of each company referenced by the invoices
+    vendors_per_company: int = 1_000
+    # Invoice lines: mean of the usual invoices, share of the heavy tail invoices whose
+    # number of lines follows a Pareto distribution of this shape from a minimum, and
+    # upper bound
+    lines_mean: float = 5.0
+    lines_tail_rate: float = 0.01
+    lines_tail_min: int = 50
+    lines_tail_alpha: float = 1.2
+    lines_max: int = 10_000
+    # Probability of each keyword of the invoice rules in a line description
+    keywords: dict[str, float] = field(
+        default_factory=lambda: {"alcohol": 0.03, "tobacco": 0.02}
+    )
+    # Days over which the invoice dates are spread, from the first one
+    first_date: str = "2025-01-01"
+    days: int = 365
+
+
+def _weighted_choice(rnd: random.Random, weights: dict[str, float]):
+    """`random.choices` over the keys of a weights mapping"""
+    return rnd.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _line_count(rnd: random.Random, config: DatasetConfig) -> int:
+    if rnd.random() < config.lines_tail_rate:
+        lines = config.lines_tail_min * rnd.paretovariate(config.lines_tail_alpha)
+    else:
+        lines = rnd.expovariate(1 / config.lines_mean)
+    return max(1, min(config.lines_max, math.ceil(lines)))
+
+
+def _description(rnd: random.Random, config: DatasetConfig) -> str:
+    for keyword, rate in config.keywords.items():
+        if rnd.random() < rate:
+            return rnd.choice(KEYWORD_DESCRIPTIONS[keyword])
+    return rnd.choice(PLAIN_DESCRIPTIONS)
+
+
+def generate_messages(
+    count: int, config: DatasetConfig = DatasetConfig()
+) -> Iterator[dict]:
+    """Stream `count` seeded vendor and invoice messages, numbered from 1"""
+    rnd = random.Random(config.seed)
+    first_date = date.fromisoformat(config.first_date)
+
+    for seq in range(1, count + 1):
+        company = _weighted_choice(rnd, config.companies)
+        vendor_name = f"Vendor {company}{rnd.randrange(config.vendors_per_company):05d}"
+
+        if rnd.random() < config.vendor_rate:
+            data = {
+                "company": company,
+                "vendorName": vendor_name,
+                "country": _weighted_choice(rnd, config.countries),
+                "bank": rnd.choice(BANKS),
+            }
+            if rnd.random() >= config.missing_registration_rate:
+                data["registrationNumber"] = f"REG{rnd.randrange(10**8):08d}"
+            if rnd.random() >= config.missing_tax_id_rate:
+                data["taxId"] = f"TAX{rnd.randrange(10**8):08d}"
+            yield {"seq": seq, "record_type": "vendor", "data": data}
+            continue
+
+        yield {
+            "seq": seq,
+            "record_type": "invoice",
+            "data": {
+                "company": company,
+                "invoiceId": f"INV{seq:09d}",
+                "invoiceDate": (
+                    first_date + timedelta(days=rnd.randrange(config.days))
+                ).isoformat(),
+                "lines": [
+                    {
+                        "description": _description(rnd, config),
+                        "amount": round(rnd.lognormvariate(4, 1), 2),
+                    }
+                    for _ in range(_line_count(rnd, config))
+                ],
+                "other_details": {"vendorName": vendor_name},
+            },
+        }
+
+
+def _batches(messages: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while batch := list(islice(messages, size)):
+        yield batch
+
+
+def write_dataset(
+    destination_dir: str,
+    messages: Iterator[dict],
+    records_per_file: int = GENERATE_RECORDS_PER_FILE,
+    compress: bool = False,
+) -> list[str]:
+    """Write the messages to numbered NDJSON (.gz) files, returning their paths"""
+    os.makedirs(destination_dir, exist_ok=True)
+    opener = gzip.open if compress else open
+    written = []
+    f = None
+    try:
+        for position, message in enumerate(messages):
+            if position % records_per_file == 0:
+                if f is not None:
+                    f.close()
+                path = os.path.join(
+                    destination_dir,
+                    f"dataset-{len(written):05d}.ndjson{'.gz' if compress else ''}",
+                )
+                f = opener(path, "wt", encoding="utf-8")
+                written.append(path)
+            f.write(json.dumps(message) + "\n")
+    finally:
+        if f is not None:
+            f.close()
+    return written
+
+
+def post_dataset(
+    client: httpx.Client,
+    messages: Iterator[dict],
+    batch_size: int = GENERATE_BATCH_SIZE,
+) -> dict[int, int]:
+    """
+    Post the messages as NDJSON batches to the `/records/batch` endpoint of the client
+    service, returning the number of acknowledgements of each status code.
+    """
+    status_codes: dict[int, int] = {}
+    for batch in _batches(messages, batch_size):
+        response = client.post(
+            "/records/batch",
+            content="".join(json.dumps(message) + "\n" for message in batch),
+            headers={"Content-Type": NDJSON_MEDIA_TYPES[0]},
+        )
+        response.raise_for_status()
+        for ack in response.json()["acks"]:
+            status_codes[ack["status_code"]] = (
+                status_codes.get(ack["status_code"], 0) + 1
+            )
+    return status_codes
+
+
+def _weights(value: str) -> dict[str, float]:
+    """Parse `A=0.5,B=0.5` weights"""
+    weights = {}
+    for item in value.split(","):
+        key, _, weight = item.partition("=")
+        weights[key.strip()] = float(weight)
+    return weights
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "destination_dir", nargs="?", help="Directory where the files are written"
+    )
+    parser.add_argument("--url", help="Service the records are posted to instead")
+    parser.add_argument("--records", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=DatasetConfig.seed)
+    parser.add_argument("--vendor-rate", type=float, default=DatasetConfig.vendor_rate)
+    parser.add_argument("--companies", type=_weights, help="e.g. A=0.45,B=0.45,C=0.1")
+    parser.add_argument("--countries", type=_weights, help="e.g. US=0.6,FR=0.4")
+    parser.add_argument(
+        "--missing-registration-rate",
+        type=float,
+        default=DatasetConfig.missing_registration_rate,
+    )
+    parser.add_argument(
+        "--missing-tax-id-rate", type=float, default=DatasetConfig.missing_tax_id_rate
+    )
+    parser.add_argument(
+        "--vendors-per-company", type=int, default=DatasetConfig.vendors_per_company
+    )
+    parser.add_argument("--lines-mean", type=float, default=DatasetConfig.lines_mean)
+    parser.add_argument(
+        "--lines-tail-rate", type=float, default=DatasetConfig.lines_tail_rate
+    )
+    parser.add_argument(
+        "--lines-tail-min", type=int, default=DatasetConfig.lines_tail_min
+    )
+    parser.add_argument(
+        "--lines-tail-alpha", type=float, default=DatasetConfig.lines_tail_alpha
+    )
+    parser.add_argument("--lines-max", type=int, default=DatasetConfig.lines_max)
+    parser.add_argument("--keywords", type=_weights, help="e.g. alcohol=0.03,tobacco=0")
+    parser.add_argument(
+        "--records-per-file", type=int, default=GENERATE_RECORDS_PER_FILE
+    )
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=GENERATE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    if (args.destination_dir is None) == (args.url is None):
+        parser.error("Either a destination directory or --url is required")
+
+    mix = {
+        name: value
+        for name, value in (
+            ("companies", args.companies),
+            ("countries", args.countries),
+            ("keywords", args.keywords),
+        )
+        if value is not None
+    }
+    config = DatasetConfig(
+        seed=args.seed,
+        vendor_rate=args.vendor_rate,
+        missing_registration_rate=args.missing_registration_rate,
+        missing_tax_id_rate=args.missing_tax_id_rate,
+        vendors_per_company=args.vendors_per_company,
+        lines_mean=args.lines_mean,
+        lines_tail_rate=args.lines_tail_rate,
+        lines_tail_min=args.lines_tail_min,
+        lines_tail_alpha=args.lines_tail_alpha,
+        lines_max=args.lines_max,
+        **mix,
+    )
+    messages = generate_messages(args.records, config)
+
+    if args.url:
+        with httpx.Client(base_url=args.url, timeout=None) as client:
+            print(json.dumps(post_dataset(client, messages, args.batch_size)))
+        return
+
+    for path in write_dataset(
+        args.destination_dir, messages, args.records_per_file, args.gzip
+    ):
+        print(path)
+
+
+if __name__ == "__main__":  # pragma: no cover (skip coverage in tests)
+    main()
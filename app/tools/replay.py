@@ -0,0 +1,388 @@
+"""
+Replay tool reporting the outputs that a change of the company rules would change.
+
+Usage:
+    python -m app.tools.replay archive/*.ndjson.gz --candidate rules_candidate.py
+    python -m app.tools.replay archive/*.ndjson.gz --candidate-config companies_new.json
+
+The archived inputs are NDJSON files (optionally gzipped) of messages in the same
+format as the records stream, `{"record_type": "invoice", "data": {...}}`. A message can
+carry the archived `output` data it produced (outputs joined with their inputs), which
+is then compared instead of the output of the current rules.
+
+The candidate rules are a module (name or `.py` path) defining `VENDOR_STRATEGIES` and/or
+`INVOICE_STRATEGIES` like `app.services.vendor` and `app.services.invoice`, the current
+ones being used for the record types it doesn't define. Each side applies a company
+configuration (see `app.services.company_config`): `--current-config`, the deployed
+`MIDDLEWARE_COMPANY_CONFIG_FILE` by default, and `--candidate-config`, the current one by
+default, so a change of the account rules, keywords or messages can be replayed too. The
+records are replayed in chunks across a pool of worker processes, with a bounded number
+of chunks in flight.
+
+The report is streamed as NDJSON: `{"type": "sample", ...}` lines with the first changed
+records of each transition, as they are found, then a `{"type": "summary", ...}` line
+with the record counts and the count of each field transition (e.g. the `account` of the
+invoices of company B going from `STD-B` to `TOB-B`).
+"""
+
+import argparse
+import gzip
+import importlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Sequence, TextIO
+
+from pydantic import ValidationError
+
+from app.enums import AppEnum
+from app.models.invoice import InvoiceInputBody
+from app.models.vendor import VendorInputBody
+from app.services.company_config import (
+    DEFAULT_CONFIG,
+    ConfigSnapshot,
+    load_config,
+    using_config,
+)
+from app.services.invoice import INVOICE_STRATEGIES
+from app.services.vendor import VENDOR_STRATEGIES
+from app.settings import Settings
+from app.utils.shard_pool import shard_key
+
+# Archived lines replayed per worker task
+REPLAY_CHUNK_SIZE = 2_000
+# Sample records reported per transition
+REPLAY_MAX_SAMPLES = 5
+
+# Input model of each record type
+INPUT_MODELS = {"vendor": VendorInputBody, "invoice": InvoiceInputBody}
+
+# Fields added to the archived outputs when they are written, not by the strategies
+ENRICHMENT_FIELDS = ("vendor",)
+
+# Strategy tables (vendor, invoice) of the current and candidate rules in a worker
+_strategy_sets: dict[str, tuple[dict, dict]] = {}
+# Company configuration snapshots of the current and candidate rules in a worker
+_configs: dict[str, ConfigSnapshot] = {}
+
+
+def load_strategies(source: Optional[str] = None) -> tuple[dict, dict]:
+    """Vendor and invoice strategy tables of a module name or `.py` path (current rules by default)"""
+    if source is None:
+        return VENDOR_STRATEGIES, INVOICE_STRATEGIES
+
+    if source.endswith(".py"):
+        name = f"replay_rules_{os.path.splitext(os.path.basename(source))[0]}"
+        spec = importlib.util.spec_from_file_location(name, source)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(source)
+
+    return (
+        getattr(module, "VENDOR_STRATEGIES", VENDOR_STRATEGIES),
+        getattr(module, "INVOICE_STRATEGIES", INVOICE_STRATEGIES),
+    )
+
+
+def load_snapshot(path: Optional[str]) -> ConfigSnapshot:
+    """Company configuration of a JSON file, the built-in one without a path"""
+    return load_config(path) if path else DEFAULT_CONFIG
+
+
+def init_worker(
+    current: Optional[str],
+    candidate: Optional[str],
+    current_config: ConfigSnapshot = DEFAULT_CONFIG,
+    candidate_config: Optional[ConfigSnapshot] = None,
+) -> None:
+    """Load the strategy tables and configurations of the rules compared by a worker"""
+    _strategy_sets["current"] = load_strategies(current)
+    _strategy_sets["candidate"] = load_strategies(candidate)
+    _configs["current"] = current_config
+    _configs["candidate"] = candidate_config or current_config
+
+
+def apply_strategies(
+    strategies: tuple[dict, dict],
+    record_type: str,
+    record_input: VendorInputBody | InvoiceInputBody,
+) -> dict:
+    """Output data of a validated record under some rules, or `{"error": ...}`"""
+    vendor_strategies, invoice_strategies = strategies
+    try:
+        if record_type == "vendor":
+            strategy = vendor_strategies.get(record_input.company)
+            if strategy is not None:
+                return strategy.process_vendor(record_input).model_dump(mode="json")
+        else:
+            strategy = invoice_strategies.get(record_input.company)
+            if strategy is not None:
+                return strategy.process_invoice(record_input).model_dump(mode="json")
+    except Exception as e:
+        return {"error": str(e)}
+    return {"error": AppEnum.UNKNOWN_COMPANY_MSSG.value}
+
+
+def _transition_value(value):
+    """Value reported in a transition, nested values only reported as changed"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return "<changed>"
+
+
+def replay_chunk(
+    start: int, lines: list[bytes], max_samples: int = REPLAY_MAX_SAMPLES
+) -> dict:
+    """
+    Replay a chunk of archived lines under the current and candidate rules, returning
+    its partial report: counts, transitions and samples per transition.
+    """
+    report = {
+        "records": 0,
+        "invalid": 0,
+        "changed": 0,
+        "transitions": Counter(),
+        "samples": {},
+    }
+    for position, line in enumerate(lines, start=start):
+        if not line.strip():
+            continue
+        report["records"] += 1
+
+        try:
+            message = json.loads(line)
+            record_type = message["record_type"]
+            record_input = INPUT_MODELS[record_type].model_validate(message["data"])
+        except (ValueError, TypeError, KeyError, ValidationError):
+            report["invalid"] += 1
+            continue
+
+        before = message.get("output")
+        if isinstance(before, dict):
+            before = {
+                field: value
+                for field, value in before.items()
+                if field not in ENRICHMENT_FIELDS
+            }
+        else:
+            with using_config(_configs["current"]):
+                before = apply_strategies(
+                    _strategy_sets["current"], record_type, record_input
+                )
+        with using_config(_configs["candidate"]):
+            after = apply_strategies(
+                _strategy_sets["candidate"], record_type, record_input
+            )
+        if before == after:
+            continue
+
+        report["changed"] += 1
+        changes = {
+            field: [before.get(field), after.get(field)]
+            for field in sorted(before.keys() | after.keys())
+            if before.get(field) != after.get(field)
+        }
+        for field, (value_before, value_after) in changes.items():
+            transition = (
+                record_type,
+                record_input.company,
+                field,
+                _transition_value(value_before),
+                _transition_value(value_after),
+            )
+            report["transitions"][transition] += 1
+            samples = report["samples"].setdefault(transition, [])
+            if len(samples) < max_samples:
+                samples.append(
+                    {
+                        "position": position,
+                        "record_type": record_type,
+                        "company": record_input.company,
+                        "key": shard_key(message),
+                        "changes": {
+                            name: [_transition_value(v) for v in values]
+                            for name, values in changes.items()
+                        },
+                    }
+                )
+    return report
+
+
+def iter_archive_chunks(
+    paths: Iterable[str], chunk_size: int = REPLAY_CHUNK_SIZE
+) -> Iterator[tuple[str, int, list[bytes]]]:
+    """Stream the `(path, first line number, lines)` chunks of the archived files"""
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            start = 1
+            while lines := list(islice(f, chunk_size)):
+                yield path, start, lines
+                start += len(lines)
+
+
+class ReplayReport:
+    """Diff report merged from the partial reports of the chunks, streaming its samples"""
+
+    def __init__(self, output: TextIO, max_samples: int = REPLAY_MAX_SAMPLES):
+        self.output = output
+        self.max_samples = max_samples
+        self.records = self.invalid = self.changed = 0
+        self.transitions: Counter = Counter()
+        self._samples: Counter = Counter()
+
+    def merge(self, path: str, report: dict) -> None:
+        self.records += report["records"]
+        self.invalid += report["invalid"]
+        self.changed += report["changed"]
+        self.transitions.update(report["transitions"])
+
+        for transition, samples in report["samples"].items():
+            for sample in samples:
+                if self._samples[transition] >= self.max_samples:
+                    break
+                self._samples[transition] += 1
+                self._write({"type": "sample", "file": path, **sample})
+
+    def summary(self, seconds: float) -> dict:
+        summary = {
+            "type": "summary",
+            "records": self.records,
+            "invalid": self.invalid,
+            "changed": self.changed,
+            "seconds": round(seconds, 3),
+            "records_per_second": round(self.records / seconds) if seconds else None,
+            "transitions": [
+                {
+                    "record_type": record_type,
+                    "company": company,
+                    "field": field,
+                    "from": value_before,
+                    "to": value_after,
+                    "count": count,
+                }
+                for (
+                    record_type,
+                    company,
+                    field,
+                    value_before,
+                    value_after,
+                ), count in self.transitions.most_common()
+            ],
+        }
+        self._write(summary)
+        return summary
+
+    def _write(self, line: dict) -> None:
+        self.output.write(json.dumps(line, default=str) + "\n")
+        self.output.flush()
+
+
+def replay(
+    paths: Sequence[str],
+    candidate: Optional[str],
+    current: Optional[str] = None,
+    output: TextIO = sys.stdout,
+    workers: int = 0,
+    chunk_size: int = REPLAY_CHUNK_SIZE,
+    max_samples: int = REPLAY_MAX_SAMPLES,
+    current_config: Optional[str] = None,
+    candidate_config: Optional[str] = None,
+) -> dict:
+    """
+    Replay the archived records under the current and candidate rules, streaming the
+    diff report to `output` and returning its summary. The rules apply the company
+    configuration files given (the built-in configuration by default, the current one
+    for the candidate). With no workers, the records are replayed in this process.
+    """
+    start = time.perf_counter()
+    # Parsed once, an invalid configuration failing before any record is replayed
+    current_snapshot = load_snapshot(current_config)
+    candidate_snapshot = (
+        load_snapshot(candidate_config) if candidate_config else current_snapshot
+    )
+    initargs = (current, candidate, current_snapshot, candidate_snapshot)
+    report = ReplayReport(output, max_samples)
+    chunks = iter_archive_chunks(paths, chunk_size)
+
+    if workers == 0:
+        init_worker(*initargs)
+        for path, first_line, lines in chunks:
+            report.merge(path, replay_chunk(first_line, lines, max_samples))
+        return report.summary(time.perf_counter() - start)
+
+    # Spawned workers load the rules themselves, and only a few chunks per worker are
+    # in flight so the memory stays bounded however large the archive is
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=initargs,
+    ) as executor:
+        pending = deque()
+        for path, first_line, lines in chunks:
+            pending.append(
+                (path, executor.submit(replay_chunk, first_line, lines, max_samples))
+            )
+            if len(pending) >= 2 * workers:
+                path, future = pending.popleft()
+                report.merge(path, future.result())
+        while pending:
+            path, future = pending.popleft()
+            report.merge(path, future.result())
+
+    return report.summary(time.perf_counter() - start)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+", help="Archived NDJSON (.gz) input files")
+    parser.add_argument("--candidate", help="Module name or .py path of the new rules")
+    parser.add_argument(
+        "--current", help="Module name or .py path of the rules to compare with"
+    )
+    parser.add_argument(
+        "--candidate-config",
+        help="Company configuration file of the new rules (the current one)",
+    )
+    parser.add_argument(
+        "--current-config",
+        default=Settings.from_env().company_config_file,
+        help="Company configuration file of the rules to compare with"
+        " (MIDDLEWARE_COMPANY_CONFIG_FILE)",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=REPLAY_CHUNK_SIZE)
+    parser.add_argument("--max-samples", type=int, default=REPLAY_MAX_SAMPLES)
+    parser.add_argument("--report", help="File the report is written to (stdout)")
+    args = parser.parse_args(argv)
+    if args.candidate is None and args.candidate_config is None:
+        parser.error("--candidate or --candidate-config is required")
+
+    output = open(args.report, "w") if args.report else sys.stdout
+    try:
+        replay(
+            args.paths,
+            args.candidate,
+            current=args.current,
+            output=output,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            max_samples=args.max_samples,
+            current_config=args.current_config or None,
+            candidate_config=args.candidate_config,
+        )
+    finally:
+        if args.report:
+            output.close()
+
+
+if __name__ == "__main__":  # pragma: no cover (skip coverage in tests)
+    main()
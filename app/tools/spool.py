@@ -0,0 +1,282 @@
+"""
+Ingestion worker that processes the record files dropped in a spool directory.
+
+Usage:
+    python -m app.tools.spool spool/ --worker-id worker-1
+
+Partners drop `.json` (an array of messages, or a single one) or `.ndjson` (one message
+per line) files in the spool directory, where each message has the same format as in the
+records stream: `{"record_type": "vendor", "data": {...}}`. Files should be written under
+another name (e.g. `.tmp`) and renamed once complete.
+
+Each file is claimed with an atomic rename into `processing/`, so several workers can
+share a spool without processing a file twice. Its records are streamed and processed in
+chunks, then the file is moved to `done/`, or to `failed/` together with a
+`.rejects.ndjson` file when some records were rejected. A `.stats.json` file with the
+file throughput, or the error that stopped its processing, is written next to it. A file
+never replaces another one of the same name, getting a `.1`, `.2`... suffix instead.
+
+The files a worker left in `processing/`, e.g. when it was stopped, are put back in the
+spool when it starts again, and processed again from the start.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from itertools import islice
+from typing import Iterator, Optional, Sequence
+
+from watchfiles import watch
+
+from app.services.records import RecordService
+from app.settings import SPOOL_CHUNK_SIZE, Settings
+from app.utils.invoice_stream import JsonArrayParser
+
+logger = logging.getLogger(__name__)
+
+SPOOL_EXTENSIONS = (".json", ".ndjson")
+# Bytes of a `.json` file parsed at a time
+SPOOL_READ_SIZE = 64 * 1024
+
+
+def default_worker_id() -> str:
+    """
+    Id of a worker, the same after a restart so it recovers the files it left claimed.
+    Several workers of the same host need their own `--worker-id`.
+    """
+    return socket.gethostname()
+
+
+def claim_file(spool_dir: str, name: str, worker_id: str) -> Optional[str]:
+    """Move a spooled file into `processing/`, returning its new path if this worker won it"""
+    claimed_path = os.path.join(spool_dir, "processing", f"{name}.{worker_id}")
+    try:
+        os.rename(os.path.join(spool_dir, name), claimed_path)
+    except FileNotFoundError:
+        # Already claimed by another worker
+        return None
+    return claimed_path
+
+
+def iter_file_messages(path: str, name: str) -> Iterator[tuple[int, object]]:
+    """Stream the `(position, message)` pairs of a spooled file, `None` for unparsable lines"""
+    if name.endswith(".ndjson"):
+        with open(path, "rb") as f:
+            for position, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield position, json.loads(line)
+                except ValueError:
+                    yield position, None
+        return
+
+    # The messages of an array are parsed as the file is read, never held all at once
+    parser = JsonArrayParser()
+    position = 0
+    with open(path, "rb") as f:
+        try:
+            while chunk := f.read(SPOOL_READ_SIZE):
+                for message in parser.parse(chunk):
+                    position += 1
+                    yield position, message
+            for message in parser.parse(b"", final=True):
+                position += 1
+                yield position, message
+        except ValueError:
+            # The rest of the file can't be parsed
+            yield position + 1, None
+
+
+def move_file(path: str, directory: str, name: str) -> str:
+    """
+    Move a file into a directory under its name, or with a `.1`, `.2`... suffix before
+    its extension when a file of that name (or its `.stats.json`) is already there.
+    Returns the name it was moved to.
+    """
+    base, extension = os.path.splitext(name)
+    for attempt in itertools.count():
+        new_name = f"{base}.{attempt}{extension}" if attempt else name
+        new_path = os.path.join(directory, new_name)
+        if os.path.exists(f"{new_path}.stats.json"):
+            continue
+        try:
+            # Unlike a rename, a link fails instead of replacing an existing file
+            os.link(path, new_path)
+        except FileExistsError:
+            continue
+        os.unlink(path)
+        return new_name
+
+
+def store_file(spool_dir: str, path: str, name: str, subdir: str, stats: dict) -> str:
+    """Move a processed file to `done/` or `failed/` with its rejects and stats"""
+    directory = os.path.join(spool_dir, subdir)
+    new_name = move_file(path, directory, name)
+    rejects_path = f"{path}.rejects.ndjson"
+    if os.path.exists(rejects_path):
+        os.replace(rejects_path, os.path.join(directory, f"{new_name}.rejects.ndjson"))
+    with open(os.path.join(directory, f"{new_name}.stats.json"), "w") as f:
+        json.dump(stats, f)
+    return new_name
+
+
+def requeue_claimed_files(spool_dir: str, worker_id: str) -> list[str]:
+    """Put back in the spool the files the worker claimed without finishing them"""
+    processing_dir = os.path.join(spool_dir, "processing")
+    suffix = f".{worker_id}"
+    requeued = []
+    for claimed_name in sorted(os.listdir(processing_dir)):
+        claimed_path = os.path.join(processing_dir, claimed_name)
+        if claimed_name.endswith(f"{suffix}.rejects.ndjson"):
+            # Rejects of a partial run, found again when the file is processed
+            os.unlink(claimed_path)
+        elif claimed_name.endswith(suffix):
+            name = claimed_name[: -len(suffix)]
+            requeued.append(move_file(claimed_path, spool_dir, name))
+            logger.warning("Requeued %s, left in processing/", name)
+    return requeued
+
+
+def process_file(
+    records: RecordService,
+    spool_dir: str,
+    path: str,
+    name: str,
+    chunk_size: int = SPOOL_CHUNK_SIZE,
+) -> dict:
+    """Process the records of a claimed file and move it to `done/` or `failed/`"""
+    start = time.perf_counter()
+    processed = rejected = 0
+    # Written next to the claimed file, then moved with it
+    rejects_path = f"{path}.rejects.ndjson"
+    rejects_file = None
+
+    try:
+        messages = iter_file_messages(path, name)
+        while chunk := list(islice(messages, chunk_size)):
+            # The chunk is processed as a batch, in the shard workers when enabled
+            acks = records.process_messages([message for _, message in chunk])
+            for (position, _), ack in zip(chunk, acks):
+                processed += 1
+                if ack["status"] == "ok":
+                    continue
+
+                rejected += 1
+                if rejects_file is None:
+                    rejects_file = open(rejects_path, "w")
+                rejects_file.write(
+                    json.dumps({"position": position, "ack": ack}, default=str) + "\n"
+                )
+    finally:
+        if rejects_file is not None:
+            rejects_file.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "file": name,
+        "records": processed,
+        "rejected": rejected,
+        "seconds": round(elapsed, 6),
+        "records_per_second": round(processed / elapsed, 1) if elapsed else None,
+    }
+    store_file(spool_dir, path, name, "failed" if rejected else "done", stats)
+
+    logger.info(
+        "Processed %s: %d records (%d rejected) in %.3fs, %s records/s",
+        name,
+        processed,
+        rejected,
+        elapsed,
+        stats["records_per_second"],
+    )
+    return stats
+
+
+def process_pending(
+    records: RecordService,
+    spool_dir: str,
+    worker_id: str,
+    chunk_size: int = SPOOL_CHUNK_SIZE,
+) -> list[dict]:
+    """Claim and process every file currently waiting in the spool directory"""
+    for subdir in ("processing", "done", "failed"):
+        os.makedirs(os.path.join(spool_dir, subdir), exist_ok=True)
+
+    results = []
+    for name in sorted(os.listdir(spool_dir)):
+        if not name.endswith(SPOOL_EXTENSIONS):
+            continue
+        path = claim_file(spool_dir, name, worker_id)
+        if path is None:
+            # Claimed by another worker
+            continue
+        try:
+            results.append(process_file(records, spool_dir, path, name, chunk_size))
+        except Exception as e:
+            # E.g. a broken shard pool or a failed write: the file is set aside, and the
+            # worker goes on with the next ones
+            logger.exception("Failed to process %s", name)
+            stats = {"file": name, "error": f"{type(e).__name__}: {e}"}
+            store_file(spool_dir, path, name, "failed", stats)
+            results.append(stats)
+    return results
+
+
+def run(
+    records: RecordService,
+    worker_id: Optional[str] = None,
+    stop_event: Optional[threading.Event] = None,
+) -> None:
+    """Process the spooled files, then keep watching the directory for new ones"""
+    spool_dir = records.settings.spool_dir
+    chunk_size = records.settings.spool_chunk_size
+    worker_id = worker_id or default_worker_id()
+    for subdir in ("processing", "done", "failed"):
+        os.makedirs(os.path.join(spool_dir, subdir), exist_ok=True)
+    requeue_claimed_files(spool_dir, worker_id)
+    process_pending(records, spool_dir, worker_id, chunk_size)
+
+    for _ in watch(
+        spool_dir,
+        watch_filter=lambda change, path: path.endswith(SPOOL_EXTENSIONS),
+        recursive=False,
+        stop_event=stop_event,
+    ):
+        process_pending(records, spool_dir, worker_id, chunk_size)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("spool_dir", nargs="?", default=None)
+    parser.add_argument(
+        "--worker-id",
+        default=None,
+        help="Id kept across restarts, unique per worker (default: the hostname)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    # The command line options take precedence over the MIDDLEWARE_* environment
+    overrides = {"spool_dir": args.spool_dir, "spool_chunk_size": args.chunk_size}
+    settings = Settings.from_env(
+        **{key: value for key, value in overrides.items() if value is not None}
+    )
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    # The worker doesn't serve the stats and indexes, no need to follow the output file
+    records = RecordService(settings, follow_output_file=False)
+    records.warm_up()
+    try:
+        run(records, args.worker_id)
+    finally:
+        records.close()
+
+
+if __name__ == "__main__":  # pragma: no cover (skip coverage in tests)
+    main()
@@ -0,0 +1,169 @@
+"""
+Content negotiation for the record endpoints.
+
+Request bodies are decompressed according to their `Content-Encoding` and decoded
+according to their `Content-Type`, and responses encoded according to the `Accept` header
+of the request, JSON remaining the default.
+"""
+
+from typing import Any, AsyncIterator, Callable, Mapping, Optional
+
+import msgpack
+from fastapi import Request, Response, status
+from fastapi.exception_handlers import http_exception_handler
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
+
+from app.enums import AppEnum
+from app.utils.decompression import (
+    DecompressionError,
+    DecompressionLimitError,
+    StreamingDecompressor,
+    UnsupportedEncodingError,
+    iter_decompressed,
+)
+from app.utils.media_types import MSGPACK_MEDIA_TYPES, NDJSON_MEDIA_TYPES
+
+
+def _media_type(request: Request) -> str:
+    return request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+
+def is_msgpack(request: Request) -> bool:
+    """Whether the request body is MessagePack"""
+    return _media_type(request) in MSGPACK_MEDIA_TYPES
+
+
+def is_ndjson(request: Request) -> bool:
+    """Whether the request body is NDJSON"""
+    return _media_type(request) in NDJSON_MEDIA_TYPES
+
+
+def accepts_msgpack(request: Request) -> bool:
+    """Whether the client asks for a MessagePack response"""
+    accept = request.headers.get("accept", "").lower()
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content)
+
+
+def negotiated_response(
+    request: Request,
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """Response encoded in the format accepted by the client"""
+    response_class = MsgpackResponse if accepts_msgpack(request) else JSONResponse
+    return response_class(content=content, status_code=status_code, headers=headers)
+
+
+async def negotiated_http_exception_handler(
+    request: Request, exc: HTTPException
+) -> Response:
+    """Report the HTTP errors in the format accepted by the client"""
+    if accepts_msgpack(request):
+        return MsgpackResponse(
+            {"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers
+        )
+    return await http_exception_handler(request, exc)
+
+
+class RecordRequest(Request):
+    """
+    Request whose body is decompressed as it is received, and with a MessagePack body
+    decoded where FastAPI decodes the JSON bodies.
+
+    FastAPI only decodes the bodies declared as JSON before validating them with the
+    input models, so a MessagePack request is presented with a JSON content type.
+    """
+
+    def __init__(self, scope, receive, decode_msgpack: bool = False):
+        self.decode_msgpack = decode_msgpack
+        if decode_msgpack:
+            headers = [
+                (name, value)
+                for name, value in scope["headers"]
+                if name != b"content-type"
+            ]
+            headers.append((b"content-type", b"application/json"))
+            scope = {**scope, "headers": headers}
+        super().__init__(scope, receive)
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        settings = self.app.state.settings
+        encoding = self.headers.get("content-encoding", "identity").strip().lower()
+        # A body already read is decompressed
+        if hasattr(self, "_body") or encoding == "identity":
+            # Held to the same maximum size as the decompressed bodies
+            max_size = settings.request_max_decompressed_size
+            content_length = self.headers.get("content-length", "")
+            size = int(content_length) if content_length.isdigit() else 0
+            if size <= max_size:
+                size = 0
+                async for chunk in super().stream():
+                    size += len(chunk)
+                    if size > max_size:
+                        break
+                    yield chunk
+            if size > max_size:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=AppEnum.BODY_TOO_LARGE_MSSG,
+                )
+            return
+
+        try:
+            decompressor = StreamingDecompressor(
+                encoding,
+                settings.request_max_decompressed_size,
+                settings.request_max_compression_ratio,
+            )
+            async for chunk in iter_decompressed(super().stream(), decompressor):
+                yield chunk
+        except UnsupportedEncodingError:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=AppEnum.UNSUPPORTED_CONTENT_ENCODING_MSSG,
+            )
+        except DecompressionLimitError:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=AppEnum.DECOMPRESSED_BODY_TOO_LARGE_MSSG,
+            )
+        except DecompressionError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=AppEnum.INVALID_COMPRESSED_BODY_MSSG,
+            )
+
+    async def json(self) -> Any:
+        if not self.decode_msgpack:
+            return await super().json()
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body())
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Route decompressing the request bodies, and validating the MessagePack ones with the
+    same models as the JSON ones
+    """
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def negotiated_route_handler(request: Request) -> Response:
+            # Endpoints reading their body themselves handle its format
+            decode_msgpack = self.body_field is not None and is_msgpack(request)
+            request = RecordRequest(request.scope, request.receive, decode_msgpack)
+            return await route_handler(request)
+
+        return negotiated_route_handler
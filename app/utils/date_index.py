@@ -0,0 +1,92 @@
+import json
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterator, Optional
+
+from app.settings import OUTPUT_FILE
+from app.utils.dates import date_ordinal
+from app.utils.output_reader import field_token, iter_output_lines
+
+_INVOICE_TOKEN = field_token("record_type", "invoice")
+
+
+class InvoiceDateIndex:
+    """
+    Sorted invoiceDate -> byte offset index of the invoices in the output file.
+
+    Dates are stored as ordinals next to their offsets in two compact parallel arrays,
+    so a date range is found with a binary search and only the matching records are
+    read back. The index follows the output file from the last indexed offset.
+    """
+
+    def __init__(self, output_file: str = OUTPUT_FILE):
+        self.output_file = output_file
+        self.offset = 0
+        self._dates = array("i")
+        self._offsets = array("q")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def _add(self, invoice_date: str, offset: int) -> None:
+        ordinal = date_ordinal(invoice_date)
+        # Invoices mostly arrive in date order, making the insertion an append
+        position = bisect_right(self._dates, ordinal)
+        self._dates.insert(position, ordinal)
+        self._offsets.insert(position, offset)
+
+    def refresh(self) -> None:
+        """Index the invoices appended to the output file since the last refresh"""
+        with self._lock:
+            for offset, line in iter_output_lines(self.output_file, self.offset):
+                self.offset = offset + len(line)
+                if _INVOICE_TOKEN not in line:
+                    continue
+                record = json.loads(line)
+                if record["record_type"] != "invoice":
+                    continue
+                try:
+                    self._add(record["data"]["invoiceDate"], offset)
+                except ValueError:
+                    # Records written before dates were normalized can't be indexed
+                    continue
+
+    def offsets(
+        self, date_from: Optional[str] = None, date_to: Optional[str] = None
+    ) -> list[int]:
+        """Offsets of the invoices dated within the inclusive range, in date order"""
+        with self._lock:
+            low = (
+                0
+                if date_from is None
+                else bisect_left(self._dates, date_ordinal(date_from))
+            )
+            high = (
+                len(self._dates)
+                if date_to is None
+                else bisect_right(self._dates, date_ordinal(date_to))
+            )
+            return self._offsets[low:high].tolist()
+
+    def iter_records(
+        self,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        company: Optional[str] = None,
+    ) -> Iterator[bytes]:
+        """Stream the raw JSONL lines of the invoices dated within the inclusive range"""
+        offsets = self.offsets(date_from, date_to)
+        if not offsets:
+            return
+
+        # Records are written with the company as their first field
+        prefix = b"{" if company is None else b"{" + field_token("company", company)
+
+        with open(self.output_file, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                line = f.readline()
+                if line.startswith(prefix):
+                    yield line
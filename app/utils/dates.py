@@ -0,0 +1,30 @@
+from datetime import date, datetime
+from functools import lru_cache
+
+from app.enums import InvoiceEnum
+
+
+@lru_cache(maxsize=4096)
+def normalize_invoice_date(value: str) -> str:
+    """
+    Parse an invoice date and normalize it to the ISO `YYYY-MM-DD` format.
+
+    Invoices mostly repeat a handful of dates, so parsed values are cached.
+    """
+    value = value.strip()
+    try:
+        # Fast path for the ISO dates we receive (also accepts the basic YYYYMMDD form)
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        pass
+
+    try:
+        # ISO datetimes keep only their date
+        return datetime.fromisoformat(value).date().isoformat()
+    except ValueError:
+        raise ValueError(InvoiceEnum.INVOICE_DATE_INVALID_MSSG.value) from None
+
+
+def date_ordinal(value: str) -> int:
+    """Ordinal of a normalized ISO date, compact and ordered for indexing"""
+    return date.fromisoformat(value).toordinal()
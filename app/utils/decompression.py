@@ -0,0 +1,115 @@
+import zlib
+from typing import AsyncIterator, Iterator, Optional
+
+# Output produced per decompression step, so that the limits are checked before a small
+# compressed chunk can expand in memory
+DECOMPRESSION_STEP_SIZE = 64 * 1024
+# Decompressed size from which the compression ratio is checked, as the first bytes of
+# a stream can legitimately have a very high ratio
+RATIO_CHECK_MIN_SIZE = 1024 * 1024
+
+
+class DecompressionError(ValueError):
+    """Compressed body that can't be decompressed"""
+
+
+class UnsupportedEncodingError(DecompressionError):
+    """Body compressed with an unsupported content encoding"""
+
+
+class DecompressionLimitError(DecompressionError):
+    """Body exceeding the decompressed size or compression ratio limits"""
+
+
+class LineTooLongError(ValueError):
+    """NDJSON line exceeding the maximum size"""
+
+
+class StreamingDecompressor:
+    """
+    Decompressor of a `gzip` or `deflate` body, fed with its chunks as they are received.
+
+    The body is decompressed in bounded steps, and rejected as soon as its decompressed
+    size or its compression ratio exceeds the limits, so a zip bomb is never inflated.
+    Other encodings, such as `zstd` whose streaming decompressor can't bound its output
+    per step, are unsupported.
+    """
+
+    def __init__(self, encoding: str, max_size: int, max_ratio: float):
+        self.max_size = max_size
+        self.max_ratio = max_ratio
+        # Compressed bytes consumed so far, and decompressed bytes produced from them
+        self.compressed_size = 0
+        self.size = 0
+
+        encoding = encoding.strip().lower()
+        if encoding in ("gzip", "x-gzip"):
+            self._decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        elif encoding == "deflate":
+            self._decompressor = zlib.decompressobj()
+        else:
+            raise UnsupportedEncodingError(encoding)
+
+    def decompress(self, data: bytes) -> Iterator[bytes]:
+        """Decompress a chunk of the body, step by step"""
+        received_size = self.compressed_size + len(data)
+        try:
+            while data:
+                output = self._decompressor.decompress(data, DECOMPRESSION_STEP_SIZE)
+                data = self._decompressor.unconsumed_tail
+                self.compressed_size = received_size - len(data)
+                self._check_limits(len(output))
+                if output:
+                    yield output
+        except zlib.error as e:
+            raise DecompressionError(str(e)) from None
+
+    def finish(self) -> None:
+        """Check that the whole compressed stream was received"""
+        if not self._decompressor.eof:
+            raise DecompressionError("Truncated compressed body")
+
+    def _check_limits(self, output_size: int) -> None:
+        self.size += output_size
+        if self.size > self.max_size or (
+            self.size > RATIO_CHECK_MIN_SIZE
+            and self.size > self.max_ratio * self.compressed_size
+        ):
+            raise DecompressionLimitError(
+                f"{self.size} bytes decompressed from {self.compressed_size} bytes"
+            )
+
+
+async def iter_decompressed(
+    chunks: AsyncIterator[bytes], decompressor: StreamingDecompressor
+) -> AsyncIterator[bytes]:
+    """Decompress a stream of body chunks as they are received"""
+    async for chunk in chunks:
+        for output in decompressor.decompress(chunk):
+            yield output
+    decompressor.finish()
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Split a stream of body chunks into lines (NDJSON) as they are received, raising
+    `LineTooLongError` as soon as a line exceeds `max_line_size` bytes
+    """
+    pending = b""
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            _check_line_size(line, max_line_size)
+            yield line
+        # The end of the line is not received yet
+        _check_line_size(pending, max_line_size)
+    if pending:
+        yield pending
+
+
+def _check_line_size(line: bytes, max_line_size: Optional[int]) -> None:
+    if max_line_size is not None and len(line) > max_line_size:
+        raise LineTooLongError(f"Line of more than {max_line_size} bytes")
@@ -0,0 +1,243 @@
+"""Columnar export of the processed records stored in the JSONL output file."""
+
+import csv
+import io
+import os
+from typing import Callable, Iterator, Literal, Optional
+
+from app.settings import EXPORT_ROW_GROUP_SIZE, OUTPUT_FILE
+from app.utils.dates import normalize_invoice_date
+from app.utils.output_reader import iter_output_records
+
+ExportTable = Literal["vendors", "invoices", "invoice_lines"]
+
+# Columns of each exported table, invoice lines are a child table keyed by invoiceId
+TABLE_COLUMNS: dict[str, tuple[str, ...]] = {
+    "vendors": (
+        "company",
+        "vendorName",
+        "country",
+        "bank",
+        "internationalBank",
+        "vendorStatus",
+    ),
+    "invoices": (
+        "company",
+        "invoiceId",
+        "invoiceDate",
+        "account",
+        "lineCount",
+        "totalAmount",
+    ),
+    "invoice_lines": ("company", "invoiceId", "lineNumber", "description", "amount"),
+}
+
+TABLE_RECORD_TYPES: dict[str, Literal["vendor", "invoice"]] = {
+    "vendors": "vendor",
+    "invoices": "invoice",
+    "invoice_lines": "invoice",
+}
+
+# Start of the serialized invoiceDate field, followed by its value and a closing quote
+_INVOICE_DATE_PREFIX = b'"invoiceDate": "'
+
+
+def invoice_date_filter(
+    date_from: Optional[str] = None, date_to: Optional[str] = None
+) -> Callable[[bytes], bool]:
+    """
+    Filter of the raw JSONL lines of the invoices dated within the inclusive range,
+    reading the `invoiceDate` of a line without decoding the record. Stored dates are
+    normalized before being compared, and the invoices whose date can't be parsed are
+    discarded.
+    """
+
+    def in_range(line: bytes) -> bool:
+        start = line.find(_INVOICE_DATE_PREFIX)
+        if start == -1:
+            return False
+        start += len(_INVOICE_DATE_PREFIX)
+        try:
+            invoice_date = normalize_invoice_date(
+                line[start : line.index(b'"', start)].decode()
+            )
+        except ValueError:
+            return False
+        return (date_from is None or invoice_date >= date_from) and (
+            date_to is None or invoice_date <= date_to
+        )
+
+    return in_range
+
+
+def _flatten(table: str, company: str, data: dict) -> Iterator[tuple]:
+    """Flatten the data of a single record into the rows of the given table"""
+    if table == "vendors":
+        yield (
+            company,
+            data["vendorName"],
+            data["country"],
+            data["bank"],
+            data.get("internationalBank"),
+            data.get("vendorStatus"),
+        )
+    elif table == "invoices":
+        yield (
+            company,
+            data["invoiceId"],
+            data["invoiceDate"],
+            data["account"],
+            len(data["lines"]),
+            sum(line["amount"] for line in data["lines"]),
+        )
+    else:
+        for line_number, line in enumerate(data["lines"], start=1):
+            yield (
+                company,
+                data["invoiceId"],
+                line_number,
+                line["description"],
+                line["amount"],
+            )
+
+
+def iter_table_rows(
+    table: ExportTable,
+    output_file: str = OUTPUT_FILE,
+    company: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Iterator[tuple]:
+    """
+    Stream the rows of an export table from the output file.
+
+    Company, record type and date filters are pushed down into the file scan, the date
+    range (inclusive) applies to the `invoiceDate` of invoice records. Raises
+    `ValueError` when a date of the range can't be parsed.
+    """
+    record_type = TABLE_RECORD_TYPES[table]
+    line_filter = None
+    if record_type == "invoice" and (date_from is not None or date_to is not None):
+        line_filter = invoice_date_filter(
+            None if date_from is None else normalize_invoice_date(date_from),
+            None if date_to is None else normalize_invoice_date(date_to),
+        )
+
+    for _, record in iter_output_records(
+        output_file, company=company, record_type=record_type, line_filter=line_filter
+    ):
+        yield from _flatten(table, record["company"], record["data"])
+
+
+def iter_row_groups(
+    rows: Iterator[tuple], row_group_size: int = EXPORT_ROW_GROUP_SIZE
+) -> Iterator[list[tuple]]:
+    """Group a stream of rows into lists of at most `row_group_size` rows"""
+    group = []
+    for row in rows:
+        group.append(row)
+        if len(group) >= row_group_size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+def iter_csv_chunks(
+    table: ExportTable,
+    output_file: str = OUTPUT_FILE,
+    company: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    row_group_size: int = EXPORT_ROW_GROUP_SIZE,
+) -> Iterator[str]:
+    """Stream an export table as CSV text, one chunk per row group (header first)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(TABLE_COLUMNS[table])
+
+    rows = iter_table_rows(table, output_file, company, date_from, date_to)
+    for group in iter_row_groups(rows, row_group_size):
+        writer.writerows(group)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_csv_table(
+    table: ExportTable,
+    destination: str,
+    row_group_size: int = EXPORT_ROW_GROUP_SIZE,
+    **filters,
+) -> None:
+    """Write an export table to a CSV file, flushing one row group at a time"""
+    with open(destination, "w", newline="") as f:
+        for chunk in iter_csv_chunks(table, row_group_size=row_group_size, **filters):
+            f.write(chunk)
+
+
+def export_parquet_table(
+    table: ExportTable,
+    destination: str,
+    row_group_size: int = EXPORT_ROW_GROUP_SIZE,
+    **filters,
+) -> None:
+    """Write an export table to a Parquet file with row groups of a bounded size (requires pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = TABLE_COLUMNS[table]
+    schema = pa.schema(
+        [
+            (
+                column,
+                {
+                    "lineCount": pa.int64(),
+                    "lineNumber": pa.int64(),
+                    "totalAmount": pa.float64(),
+                    "amount": pa.float64(),
+                }.get(column, pa.string()),
+            )
+            for column in columns
+        ]
+    )
+
+    with pq.ParquetWriter(destination, schema) as writer:
+        rows = iter_table_rows(table, **filters)
+        for group in iter_row_groups(rows, row_group_size):
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [pa.array(values) for values in zip(*group)], schema=schema
+                )
+            )
+
+
+def export_tables(
+    destination_dir: str,
+    file_format: Literal["csv", "parquet"] = "csv",
+    record_type: Optional[Literal["vendor", "invoice"]] = None,
+    row_group_size: int = EXPORT_ROW_GROUP_SIZE,
+    **filters,
+) -> list[str]:
+    """
+    Export every table matching the record type filter into `destination_dir`.
+
+    Returns the paths of the written files.
+    """
+    export_table = (
+        export_parquet_table if file_format == "parquet" else export_csv_table
+    )
+
+    os.makedirs(destination_dir, exist_ok=True)
+    written = []
+    for table, table_record_type in TABLE_RECORD_TYPES.items():
+        if record_type is not None and table_record_type != record_type:
+            continue
+        destination = os.path.join(destination_dir, f"{table}.{file_format}")
+        export_table(table, destination, row_group_size=row_group_size, **filters)
+        written.append(destination)
+
+    return written
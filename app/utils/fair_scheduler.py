@@ -0,0 +1,380 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.settings import (
+    SCHEDULER_COMPANY_CONCURRENCY,
+    SCHEDULER_CONCURRENCY,
+    SCHEDULER_MAX_QUEUED,
+    SCHEDULER_SLICE_SIZE,
+)
+
+# Tenant of the companies without their own weight and quota
+DEFAULT_TENANT = "*"
+
+
+def parse_company_values(value: str) -> dict[str, str]:
+    """Parse `A=3,B=1` values per company code, `*` being the default of the others"""
+    values = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        company, separator, company_value = item.partition("=")
+        if not separator or not company.strip():
+            raise ValueError(f"Invalid company value: {item.strip()!r}")
+        values[company.strip()] = company_value.strip()
+    return values
+
+
+class QuotaExceededError(Exception):
+    """A company exceeded its quota, or has too many jobs queued"""
+
+    def __init__(self, company: str, retry_after: float):
+        super().__init__(f"Quota of company {company!r} exceeded")
+        self.company = company
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Quota of `rate` records per second, allowing bursts of up to `burst` records. Only
+    used from the event loop, so it isn't locked.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError(f"Quota rate must be positive: {rate}")
+        self.rate = rate
+        self.burst = max(burst or rate, 1.0)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    @classmethod
+    def parse(cls, value: str) -> "TokenBucket":
+        """Quota of a `rate` or `rate:burst` value"""
+        rate, _, burst = value.partition(":")
+        return cls(float(rate), float(burst) if burst else None)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, count: int, partial: bool = True) -> int:
+        """
+        Take up to `count` tokens, returning how many were available, or none of them
+        unless `partial` when fewer are available
+        """
+        self._refill()
+        taken = min(count, int(self.tokens))
+        if not partial and taken < count:
+            return 0
+        self.tokens -= taken
+        return taken
+
+    def retry_after(self, count: int = 1) -> float:
+        """Seconds until `count` tokens (at most a burst) are available"""
+        self._refill()
+        return max(0.0, (min(count, self.burst) - self.tokens) / self.rate)
+
+
+@dataclass
+class _Job:
+    company: str
+    cost: int
+    granted: asyncio.Future
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _TenantStats:
+    scheduled_jobs: int = 0
+    scheduled_records: int = 0
+    limited_records: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+
+class FairScheduler:
+    """
+    Fair scheduling of the record processing and writes across companies, so that one
+    company's bulk loads don't delay the records of the others.
+
+    Each company has a token bucket quota, in records per second, and the records over
+    it are rejected with the seconds to retry after. The accepted records are queued per
+    company in jobs of at most `slice_size` records, and at most `concurrency` jobs run
+    at once in the thread pool, picked across the company queues with a deficit weighted
+    round-robin: each round grants a company `weight * slice_size` records of credit. A
+    company runs at most `company_concurrency` jobs at once, by default one so that its
+    records are written in the order received, which caps the jobs running at once to
+    the companies with queued jobs.
+
+    With a `concurrency` of 0 the jobs run right away, only the quotas being applied.
+    Companies outside `companies` and without their own weight or quota share the `*`
+    tenant, so unknown company codes can't grow the queues.
+    """
+
+    def __init__(
+        self,
+        companies: Iterable[str] = (),
+        weights: str = "",
+        quotas: str = "",
+        concurrency: int = SCHEDULER_CONCURRENCY,
+        company_concurrency: int = SCHEDULER_COMPANY_CONCURRENCY,
+        max_queued: int = SCHEDULER_MAX_QUEUED,
+        slice_size: int = SCHEDULER_SLICE_SIZE,
+    ):
+        self.weights = {
+            company: float(weight)
+            for company, weight in parse_company_values(weights).items()
+        }
+        if any(weight <= 0 for weight in self.weights.values()):
+            raise ValueError(f"Company weights must be positive: {weights}")
+        self.quotas = {
+            company: TokenBucket.parse(quota)
+            for company, quota in parse_company_values(quotas).items()
+        }
+        self.companies = set(companies) | set(self.weights) | set(self.quotas)
+        self.concurrency = concurrency
+        self.company_concurrency = company_concurrency
+        self.max_queued = max_queued
+        self.slice_size = slice_size
+
+        self._queues: dict[str, deque[_Job]] = {}
+        # Companies with queued jobs, in round-robin order, and their credit of records
+        self._ring: deque[str] = deque()
+        self._deficits: dict[str, float] = {}
+        # Jobs running, per company
+        self._running: dict[str, int] = defaultdict(int)
+        self._running_total = 0
+        self._stats: dict[str, _TenantStats] = defaultdict(_TenantStats)
+
+    def tenant(self, company: Any) -> str:
+        """Queue and quota of a company code"""
+        return (
+            company
+            if isinstance(company, str) and company in self.companies
+            else DEFAULT_TENANT
+        )
+
+    def weight(self, tenant: str) -> float:
+        return self.weights.get(tenant, self.weights.get(DEFAULT_TENANT, 1.0))
+
+    def quantum(self, tenant: str) -> float:
+        """Records of credit granted to a company per round"""
+        return self.weight(tenant) * self.slice_size
+
+    def quota(self, tenant: str) -> Optional[TokenBucket]:
+        if tenant not in self.quotas and DEFAULT_TENANT in self.quotas:
+            # Each company gets its own bucket of the default quota
+            default = self.quotas[DEFAULT_TENANT]
+            self.quotas[tenant] = TokenBucket(default.rate, default.burst)
+        return self.quotas.get(tenant)
+
+    def admit(self, tenant: str, count: int, partial: bool = True) -> int:
+        """Take the quota of `count` records, returning how many are admitted"""
+        quota = self.quota(tenant)
+        admitted = count if quota is None else quota.take(count, partial)
+        self._stats[tenant].limited_records += count - admitted
+        return admitted
+
+    def retry_after(self, tenant: str, count: int = 1) -> float:
+        quota = self.quota(tenant)
+        return 1.0 if quota is None else quota.retry_after(count)
+
+    async def run(self, company: Any, func: Callable, *args, cost: int = 1) -> Any:
+        """
+        Run `func(*args)` in the thread pool for `cost` records of a company, once its
+        quota allows it and its turn comes, raising `QuotaExceededError` otherwise
+        """
+        tenant = self.tenant(company)
+        if self.admit(tenant, cost, partial=False) < cost:
+            raise QuotaExceededError(tenant, self.retry_after(tenant, cost))
+        return await self._run(tenant, cost, func, *args)
+
+    async def run_batch(
+        self,
+        func: Callable[[list], list],
+        items: list,
+        company_of: Callable[[Any], Any],
+        limited: Callable[[Any, float], Any],
+        failed: Callable[[Any, Exception], Any],
+    ) -> list:
+        """
+        Run `func` on the items of a batch grouped by company and split in slices,
+        returning its results in the order of the items. The items over the quota of
+        their company get `limited(item, retry_after)` instead, and the items of a slice
+        where `func` raised get `failed(item, error)`, the other slices keeping their
+        results as they may already be written.
+        """
+        groups: dict[str, list[int]] = defaultdict(list)
+        for index, item in enumerate(items):
+            groups[self.tenant(company_of(item))].append(index)
+        results: list = [None] * len(items)
+
+        def reject(indices: list[int], retry_after: float) -> None:
+            for index in indices:
+                results[index] = limited(items[index], retry_after)
+
+        async def run_group(tenant: str, indices: list[int]) -> None:
+            admitted = self.admit(tenant, len(indices))
+            if admitted < len(indices):
+                reject(indices[admitted:], self.retry_after(tenant))
+            # The slices are queued together, and run in order
+            await asyncio.gather(
+                *(
+                    run_slice(tenant, indices[start : min(start + size, admitted)])
+                    for start in range(0, admitted, size)
+                )
+            )
+
+        async def run_slice(tenant: str, indices: list[int]) -> None:
+            try:
+                outputs = await self._run(
+                    tenant, len(indices), func, [items[index] for index in indices]
+                )
+            except QuotaExceededError as e:
+                reject(indices, e.retry_after)
+                return
+            except Exception as e:
+                for index in indices:
+                    results[index] = failed(items[index], e)
+                return
+            for index, output in zip(indices, outputs):
+                results[index] = output
+
+        size = self.slice_size
+        await asyncio.gather(
+            *(run_group(tenant, indices) for tenant, indices in groups.items())
+        )
+        return results
+
+    async def _run(self, tenant: str, cost: int, func: Callable, *args) -> Any:
+        if self.concurrency <= 0:
+            self._scheduled(tenant, cost, 0.0)
+            return await run_in_threadpool(func, *args)
+
+        queue = self._queues.get(tenant)
+        if len(queue or ()) >= self.max_queued:
+            self._stats[tenant].limited_records += cost
+            raise QuotaExceededError(tenant, 1.0)
+        job = _Job(tenant, cost, asyncio.get_running_loop().create_future())
+        if queue is None:
+            queue = self._queues[tenant] = deque()
+            self._ring.append(tenant)
+            self._deficits[tenant] = self.quantum(tenant)
+        queue.append(job)
+        self._dispatch()
+
+        try:
+            await job.granted
+        except asyncio.CancelledError:
+            # Cancelled after its turn came, e.g. the client disconnected
+            if job.granted.done() and not job.granted.cancelled():
+                self._release(tenant)
+            raise
+        self._scheduled(tenant, cost, time.monotonic() - job.queued_at)
+        try:
+            return await run_in_threadpool(func, *args)
+        finally:
+            self._release(tenant)
+
+    def _scheduled(self, tenant: str, cost: int, wait: float) -> None:
+        stats = self._stats[tenant]
+        stats.scheduled_jobs += 1
+        stats.scheduled_records += cost
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+
+    def _release(self, tenant: str) -> None:
+        self._running[tenant] -= 1
+        if not self._running[tenant]:
+            del self._running[tenant]
+        self._running_total -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Start the next jobs while there are free slots"""
+        while self._running_total < self.concurrency:
+            job = self._next_job()
+            if job is None:
+                return
+            self._running[job.company] += 1
+            self._running_total += 1
+            job.granted.set_result(None)
+
+    def _next_job(self) -> Optional[_Job]:
+        """Pick the next job with a deficit weighted round-robin over the companies"""
+        while True:
+            # The company whose turn it is, skipping the ones running their most jobs
+            tenant = next(
+                (
+                    t
+                    for t in self._ring
+                    if self._running.get(t, 0) < self.company_concurrency
+                ),
+                None,
+            )
+            if tenant is None:
+                return None
+            queue = self._queues[tenant]
+            while queue and queue[0].granted.cancelled():
+                queue.popleft()
+            if not queue:
+                self._drop(tenant)
+                continue
+
+            job = queue[0]
+            if self._deficits[tenant] < job.cost:
+                # Out of credit: its turn ends, with the credit of its next turn
+                self._deficits[tenant] += self.quantum(tenant)
+                self._ring.remove(tenant)
+                self._ring.append(tenant)
+                continue
+            # The company keeps its turn while it has credit left
+            self._deficits[tenant] -= job.cost
+            queue.popleft()
+            if not queue:
+                self._drop(tenant)
+            return job
+
+    def _drop(self, tenant: str) -> None:
+        """Remove a company without queued jobs from the round-robin"""
+        self._ring.remove(tenant)
+        del self._queues[tenant]
+        del self._deficits[tenant]
+
+    def stats(self) -> dict:
+        """Scheduling metrics of each company"""
+        tenants = sorted(set(self._stats) | set(self.weights) | set(self.quotas))
+        companies = {}
+        for tenant in tenants:
+            stats = self._stats[tenant]
+            quota = self.quotas.get(tenant)
+            companies[tenant] = {
+                "weight": self.weight(tenant),
+                "quota": (
+                    None
+                    if quota is None
+                    else {"rate": quota.rate, "burst": quota.burst}
+                ),
+                "queued_jobs": len(self._queues.get(tenant, ())),
+                "running_jobs": self._running.get(tenant, 0),
+                "scheduled_jobs": stats.scheduled_jobs,
+                "scheduled_records": stats.scheduled_records,
+                "limited_records": stats.limited_records,
+                # Seconds the jobs waited for their turn
+                "wait": {
+                    "mean": (
+                        stats.wait_total / stats.scheduled_jobs
+                        if stats.scheduled_jobs
+                        else None
+                    ),
+                    "max": stats.wait_max if stats.scheduled_jobs else None,
+                },
+            }
+        return {"concurrency": self.concurrency, "companies": companies}
@@ -1,7 +1,8 @@
-from typing import Literal
+import os
+from typing import Iterable, Literal
 from jsonlines import jsonlines
 
-from app.settings import OUTPUT_FILE
+from app.settings import OUTPUT_FILE, Settings
 
 
 def append_output_to_jsonl(
@@ -9,11 +10,73 @@ def append_output_to_jsonl(
     record_type: Literal["vendor", "invoice"],
     data: dict,
     output_file: str = OUTPUT_FILE,
+    fsync: bool = False,
 ) -> None:
     """
     Append a dictionary to a JSONL file.
     """
-    new_json = {"company": company, "record_type": record_type, "data": data}
+    append_outputs_to_jsonl([(company, record_type, data)], output_file, fsync)
 
-    with jsonlines.open(output_file, mode="a") as f:
-        f.write(new_json)
+
+def append_outputs_to_jsonl(
+    records: Iterable[tuple[str, Literal["vendor", "invoice"], dict]],
+    output_file: str = OUTPUT_FILE,
+    fsync: bool = False,
+) -> None:
+    """
+    Append `(company, record_type, data)` records to a JSONL file at once.
+    """
+    with open(output_file, mode="a") as fp:
+        jsonlines.Writer(fp).write_all(
+            {"company": company, "record_type": record_type, "data": data}
+            for company, record_type, data in records
+        )
+        if fsync:
+            fp.flush()
+            os.fsync(fp.fileno())
+
+
+class JsonlOutputWriter:
+    """Output backend appending the records to the JSONL output file"""
+
+    def __init__(self, output_file: str = OUTPUT_FILE, fsync: bool = False):
+        self.output_file = output_file
+        self.fsync = fsync
+
+    def append(
+        self, company: str, record_type: Literal["vendor", "invoice"], data: dict
+    ) -> None:
+        append_output_to_jsonl(company, record_type, data, self.output_file, self.fsync)
+
+    def append_many(
+        self, records: list[tuple[str, Literal["vendor", "invoice"], dict]]
+    ) -> None:
+        """Append `(company, record_type, data)` records with a single write"""
+        append_outputs_to_jsonl(records, self.output_file, self.fsync)
+
+
+class MemoryOutputWriter:
+    """Output backend keeping the records in memory, for tests and tools"""
+
+    def __init__(self):
+        self.records: list[dict] = []
+
+    def append(
+        self, company: str, record_type: Literal["vendor", "invoice"], data: dict
+    ) -> None:
+        self.records.append(
+            {"company": company, "record_type": record_type, "data": data}
+        )
+
+    def append_many(
+        self, records: list[tuple[str, Literal["vendor", "invoice"], dict]]
+    ) -> None:
+        for company, record_type, data in records:
+            self.append(company, record_type, data)
+
+
+def create_output_writer(settings: Settings) -> JsonlOutputWriter | MemoryOutputWriter:
+    """Output backend selected by the settings"""
+    if settings.output_backend == "memory":
+        return MemoryOutputWriter()
+    return JsonlOutputWriter(settings.output_file, settings.output_fsync)
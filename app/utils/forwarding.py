@@ -0,0 +1,286 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Literal, Optional
+
+import httpx
+
+from app.settings import (
+    FORWARD_BACKOFF_BASE,
+    FORWARD_BACKOFF_MAX,
+    FORWARD_BATCH_INTERVAL,
+    FORWARD_BATCH_SIZE,
+    FORWARD_QUEUE_DIR,
+    FORWARD_TIMEOUT,
+)
+from app.utils.retry_after import retry_after_seconds
+
+# Status codes of the batches worth retrying, other errors rejecting the batch for good
+RETRY_STATUS_CODES = (408, 429)
+
+
+class ForwardingDestination:
+    """
+    Records waiting to be delivered to a destination: an in-memory queue of the records
+    just written, and a disk-backed queue of the batches that failed to be delivered.
+
+    The batches of the disk queue are files numbered in order in the directory of the
+    destination, so they survive a restart, and the ones rejected by the destination are
+    moved to its `rejected/` directory.
+    """
+
+    def __init__(self, url: str, queue_dir: str):
+        self.url = url
+        self.queue_dir = os.path.join(queue_dir, f"{zlib.crc32(url.encode()):08x}")
+        self.rejected_dir = os.path.join(self.queue_dir, "rejected")
+        os.makedirs(self.rejected_dir, exist_ok=True)
+
+        # (time written, record) of the records waiting to be batched
+        self.pending: deque[tuple[float, dict]] = deque()
+        # (path, records) of the batches queued on disk, oldest first
+        self.backlog: deque[tuple[str, int]] = deque()
+        for name in sorted(os.listdir(self.queue_dir)):
+            if name.endswith(".json"):
+                path = os.path.join(self.queue_dir, name)
+                with open(path) as f:
+                    self.backlog.append((path, len(json.load(f))))
+        self._next_file = 1 + max(
+            (
+                int(name[: -len(".json")])
+                for directory in (self.queue_dir, self.rejected_dir)
+                for name in os.listdir(directory)
+                if name.endswith(".json")
+            ),
+            default=-1,
+        )
+        self.wake: Optional[asyncio.Event] = None
+
+        # Consecutive failures, and monotonic time before which nothing is sent
+        self.failures = 0
+        self.retry_at = 0.0
+        self.delivered_records = 0
+        self.delivered_batches = 0
+        self.failed_attempts = 0
+        self.rejected_batches = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_last: Optional[float] = None
+
+    def spill(self, batch: list[tuple[float, dict]], rejected: bool = False) -> None:
+        """
+        Queue a batch on disk, to be retried after the batches already queued, or keep
+        a batch rejected by the destination
+        """
+        path = os.path.join(
+            self.rejected_dir if rejected else self.queue_dir,
+            f"{self._next_file:012d}.json",
+        )
+        self._next_file += 1
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(batch, f)
+        os.replace(f"{path}.tmp", path)
+        if not rejected:
+            self.backlog.append((path, len(batch)))
+
+    def delivered(self, batch: list[tuple[float, dict]]) -> None:
+        now = time.time()
+        latencies = [now - written_at for written_at, _ in batch]
+        self.delivered_records += len(batch)
+        self.delivered_batches += 1
+        self._latency_total += sum(latencies)
+        self._latency_max = max(self._latency_max, *latencies)
+        self._latency_last = latencies[0]
+        self.failures = 0
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "pending_records": len(self.pending),
+            "backlog_batches": len(self.backlog),
+            "backlog_records": sum(records for _, records in self.backlog),
+            "delivered_records": self.delivered_records,
+            "delivered_batches": self.delivered_batches,
+            "failed_attempts": self.failed_attempts,
+            "rejected_batches": self.rejected_batches,
+            # Seconds from the record being written to its delivery
+            "delivery_latency": {
+                "mean": (
+                    self._latency_total / self.delivered_records
+                    if self.delivered_records
+                    else None
+                ),
+                "max": self._latency_max if self.delivered_records else None,
+                "last": self._latency_last,
+            },
+        }
+
+
+class ForwardingSink:
+    """
+    Output sink forwarding the written records to the HTTP ingestion APIs of downstream
+    systems, e.g. an ERP, as JSON arrays of `{"company", "record_type", "data"}` records.
+
+    `append` only queues the record in memory, so a slow or down destination never blocks
+    the writes. A background thread delivers the records of each destination in batches
+    of `batch_size`, at least every `batch_interval` seconds, over a pooled async HTTP
+    client. Batches failing to be delivered are queued on disk and retried oldest first
+    with a jittered exponential backoff (or the delay of a `Retry-After`), new batches
+    being queued behind them until the destination is back.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        queue_dir: str = FORWARD_QUEUE_DIR,
+        batch_size: int = FORWARD_BATCH_SIZE,
+        batch_interval: float = FORWARD_BATCH_INTERVAL,
+        timeout: float = FORWARD_TIMEOUT,
+        backoff_base: float = FORWARD_BACKOFF_BASE,
+        backoff_max: float = FORWARD_BACKOFF_MAX,
+    ):
+        self.destinations = [ForwardingDestination(url, queue_dir) for url in urls]
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def append(
+        self, company: str, record_type: Literal["vendor", "invoice"], data: dict
+    ) -> None:
+        """Queue a written record for delivery, without blocking"""
+        record = {"company": company, "record_type": record_type, "data": data}
+        written_at = time.time()
+        for destination in self.destinations:
+            destination.pending.append((written_at, record))
+            if len(destination.pending) == self.batch_size and self._loop is not None:
+                self._loop.call_soon_threadsafe(destination.wake.set)
+
+    def start(self) -> None:
+        """Start delivering the records in a background thread"""
+        ready = threading.Event()
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(self._run(ready),), daemon=True
+        )
+        self._thread.start()
+        ready.wait()
+
+    def close(self) -> None:
+        """Stop delivering, queuing the records not delivered yet on disk"""
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._stop)
+            self._thread.join()
+            self._thread = self._loop = None
+        for destination in self.destinations:
+            while destination.pending:
+                destination.spill(self._take_batch(destination))
+
+    def stats(self) -> dict:
+        """Delivery metrics of each destination"""
+        return {"destinations": [d.stats() for d in self.destinations]}
+
+    def _stop(self) -> None:
+        self._stopping.set()
+        for destination in self.destinations:
+            destination.wake.set()
+
+    async def _run(self, ready: threading.Event) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for destination in self.destinations:
+            destination.wake = asyncio.Event()
+        ready.set()
+
+        async with httpx.AsyncClient(timeout=self.timeout) as http:
+            await asyncio.gather(
+                *(self._deliver(http, destination) for destination in self.destinations)
+            )
+
+    async def _deliver(
+        self, http: httpx.AsyncClient, destination: ForwardingDestination
+    ) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(destination.wake.wait(), self.batch_interval)
+            except asyncio.TimeoutError:
+                pass
+            destination.wake.clear()
+            await self._flush(http, destination)
+
+    def _take_batch(self, destination: ForwardingDestination) -> list:
+        return [
+            destination.pending.popleft()
+            for _ in range(min(self.batch_size, len(destination.pending)))
+        ]
+
+    async def _flush(
+        self, http: httpx.AsyncClient, destination: ForwardingDestination
+    ) -> None:
+        while destination.pending:
+            batch = self._take_batch(destination)
+            # The batches already queued on disk are delivered first
+            if destination.backlog or time.monotonic() < destination.retry_at:
+                destination.spill(batch)
+                continue
+            delivered = await self._post(http, destination, batch)
+            if delivered is False:
+                destination.spill(batch)
+            elif delivered is None:
+                destination.spill(batch, rejected=True)
+
+        while destination.backlog and time.monotonic() >= destination.retry_at:
+            path, _ = destination.backlog[0]
+            with open(path) as f:
+                batch = json.load(f)
+            delivered = await self._post(http, destination, batch)
+            if delivered is False:
+                return
+            destination.backlog.popleft()
+            if delivered:
+                os.remove(path)
+            else:
+                os.replace(
+                    path, os.path.join(destination.rejected_dir, os.path.basename(path))
+                )
+
+    async def _post(
+        self, http: httpx.AsyncClient, destination: ForwardingDestination, batch: list
+    ) -> Optional[bool]:
+        """
+        Post a batch, returning whether it was delivered, `None` if it was rejected for
+        good by the destination
+        """
+        retry_after = None
+        try:
+            response = await http.post(
+                destination.url, json=[record for _, record in batch]
+            )
+            if response.is_success:
+                destination.delivered(batch)
+                return True
+            if response.status_code < 500 and response.status_code not in (
+                RETRY_STATUS_CODES
+            ):
+                destination.rejected_batches += 1
+                return None
+            retry_after = retry_after_seconds(response.headers.get("retry-after"))
+        except httpx.HTTPError:
+            pass
+
+        destination.failed_attempts += 1
+        destination.failures += 1
+        if retry_after is None:
+            retry_after = random.uniform(
+                0,
+                min(self.backoff_max, self.backoff_base * 2**destination.failures),
+            )
+        destination.retry_at = time.monotonic() + retry_after
+        return False
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from app.settings import INVOICE_STATS_CHECKPOINT_EVERY, OUTPUT_FILE
+from app.utils.dates import normalize_invoice_date
+from app.utils.output_reader import field_token, iter_output_lines
+
+_INVOICE_TOKEN = field_token("record_type", "invoice")
+
+# Bytes of the start of the output file hashed to recognize it when loading a checkpoint
+_FINGERPRINT_SIZE = 64 * 1024
+
+
+def to_cents(amount: float) -> int:
+    """Fixed-point representation of an amount, in hundredths"""
+    return round(amount * 100)
+
+
+class InvoiceAggregates:
+    """
+    Running invoice aggregates per (company, account, invoiceDate month).
+
+    Each aggregate holds the invoice count and the sum, min and max of the invoice
+    totals (sum of line amounts) as fixed-point integers. The aggregates are kept up
+    to date by tailing the output file from the last applied offset, and they are
+    checkpointed together with that offset and a fingerprint of the output file (its
+    inode and a hash of its start), so a restart only reads the new records, and
+    rebuilds them when the output file was replaced or rewritten. Invoices whose date
+    can't be parsed are counted in `skipped` instead.
+    """
+
+    def __init__(
+        self,
+        output_file: str = OUTPUT_FILE,
+        checkpoint_file: Optional[str] = None,
+        checkpoint_every: int = INVOICE_STATS_CHECKPOINT_EVERY,
+    ):
+        self.output_file = output_file
+        self.checkpoint_file = checkpoint_file or f"{output_file}.stats.json"
+        self.checkpoint_every = checkpoint_every
+        self.offset = 0
+        # (company, account, month) -> [count, sum, min, max]
+        self._totals: dict[tuple[str, str, str], list[int]] = {}
+        self.skipped = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _apply(self, record: dict) -> None:
+        data = record["data"]
+        try:
+            month = normalize_invoice_date(data["invoiceDate"])[:7]
+        except ValueError:
+            # Records written before dates were normalized can't be aggregated
+            self.skipped += 1
+            return
+        key = (record["company"], data["account"], month)
+        total = sum(to_cents(line["amount"]) for line in data["lines"])
+
+        aggregate = self._totals.get(key)
+        if aggregate is None:
+            self._totals[key] = [1, total, total, total]
+        else:
+            aggregate[0] += 1
+            aggregate[1] += total
+            aggregate[2] = min(aggregate[2], total)
+            aggregate[3] = max(aggregate[3], total)
+
+    def refresh(self) -> None:
+        """Apply the invoices appended to the output file since the last refresh"""
+        with self._lock:
+            for offset, line in iter_output_lines(self.output_file, self.offset):
+                self.offset = offset + len(line)
+                if _INVOICE_TOKEN not in line:
+                    continue
+                record = json.loads(line)
+                if record["record_type"] == "invoice":
+                    self._apply(record)
+                    self._pending += 1
+
+            if self._pending >= self.checkpoint_every:
+                self._write_checkpoint()
+
+    def _fingerprint(self, offset: int) -> Optional[list]:
+        """Inode of the output file and hash of its start, up to `offset`"""
+        try:
+            with open(self.output_file, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                head = f.read(min(offset, _FINGERPRINT_SIZE))
+        except FileNotFoundError:
+            return None
+        return [inode, hashlib.sha256(head).hexdigest()]
+
+    def _write_checkpoint(self) -> None:
+        checkpoint = {
+            "offset": self.offset,
+            "fingerprint": self._fingerprint(self.offset),
+            "skipped": self.skipped,
+            "aggregates": [[*key, *values] for key, values in self._totals.items()],
+        }
+        # Write to a temporary file first so a crash never leaves a torn checkpoint
+        tmp_file = f"{self.checkpoint_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(checkpoint, f, separators=(",", ":"))
+        os.replace(tmp_file, self.checkpoint_file)
+        self._pending = 0
+
+    def checkpoint(self) -> None:
+        """Persist the aggregates together with the output file offset they cover"""
+        with self._lock:
+            self._write_checkpoint()
+
+    def load_checkpoint(self) -> None:
+        """
+        Restore the aggregates from the checkpoint, unless the output file was truncated,
+        replaced or rewritten since
+        """
+        if not os.path.exists(self.checkpoint_file):
+            return
+
+        with open(self.checkpoint_file) as f:
+            checkpoint = json.load(f)
+
+        output_size = (
+            os.path.getsize(self.output_file) if os.path.exists(self.output_file) else 0
+        )
+        if checkpoint["offset"] > output_size:
+            return
+        if checkpoint.get("fingerprint") != self._fingerprint(checkpoint["offset"]):
+            return
+
+        with self._lock:
+            self.offset = checkpoint["offset"]
+            self.skipped = checkpoint.get("skipped", 0)
+            self._totals = {
+                tuple(aggregate[:3]): aggregate[3:]
+                for aggregate in checkpoint["aggregates"]
+            }
+
+    def query(
+        self,
+        company: Optional[str] = None,
+        account: Optional[str] = None,
+        month: Optional[str] = None,
+    ) -> list[dict]:
+        """Aggregates matching the given filters, with amounts converted back to decimals"""
+        with self._lock:
+            return [
+                {
+                    "company": key[0],
+                    "account": key[1],
+                    "month": key[2],
+                    "count": count,
+                    "totalAmount": total / 100,
+                    "minAmount": minimum / 100,
+                    "maxAmount": maximum / 100,
+                }
+                for key, (count, total, minimum, maximum) in self._totals.items()
+                if (company is None or key[0] == company)
+                and (account is None or key[1] == account)
+                and (month is None or key[2] == month)
+            ]
@@ -0,0 +1,221 @@
+import codecs
+import json
+import re
+from typing import Iterator, Optional
+
+import msgpack
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _ChunkedJsonParser:
+    """
+    Base of the incremental JSON parsers, fed with chunks and decoding each value of
+    interest once complete.
+
+    While a value is incomplete, the next chunks are kept aside, and it is only decoded
+    again once as much data as was tried has been received: a large value is decoded a
+    few times at doubling sizes, in linear time overall, rather than on every chunk.
+    """
+
+    incomplete_message = "Incomplete JSON"
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        # Chunks received after an incomplete value, and their size to reach before
+        # decoding it again
+        self._pending: list[str] = []
+        self._pending_size = 0
+        self._retry_size: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> list:
+        """Parse a chunk, returning the items completed by it"""
+        return list(self.parse(chunk))
+
+    def close(self) -> list:
+        """Parse the end of the input, returning its last items"""
+        return list(self.parse(b"", final=True))
+
+    def parse(self, chunk: bytes, final: bool = False) -> Iterator:
+        """
+        Parse a chunk, or the end of the input when final, yielding the items completed
+        by it as they are decoded, so the ones before invalid JSON are still yielded
+        """
+        text = self._utf8.decode(chunk, final=final)
+        if self._retry_size is not None:
+            self._pending.append(text)
+            self._pending_size += len(text)
+            if self._pending_size < self._retry_size and not final:
+                return
+            text = "".join(self._pending)
+            self._pending = []
+            self._pending_size = 0
+            self._retry_size = None
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        yield from self._parse(final)
+        if final and self._state != "end":
+            raise ValueError(self.incomplete_message)
+
+    def _decode(self, position: int, final: bool) -> Optional[tuple]:
+        """Value starting at the position and its end, or `None` until it is complete"""
+        buffer = self._buffer
+        try:
+            value, end = self._decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            self._retry_size = len(buffer) - position
+            return None
+        # A number at the end of the buffer may continue in the next chunk
+        if end == len(buffer) and not final and buffer[position] not in '"[{':
+            self._retry_size = len(buffer) - position
+            return None
+        return value, end
+
+
+class InvoiceBodyParser(_ChunkedJsonParser):
+    """
+    Incremental parser of an invoice JSON body, fed with the chunks of the request.
+
+    The top-level fields are decoded into `fields` once complete, except the `lines`
+    array, whose items are returned one by one as soon as they are complete, so neither
+    the body nor the array is ever held in memory. Raises `ValueError` on invalid JSON.
+    """
+
+    incomplete_message = "Incomplete JSON body"
+
+    def __init__(self):
+        super().__init__()
+        self.fields: dict = {}
+        self.has_lines = False
+        self._key = None
+
+    def _parse(self, final: bool) -> Iterator:
+        buffer = self._buffer
+        while True:
+            position = _WHITESPACE.match(buffer, self._pos).end()
+            self._pos = position
+            if position == len(buffer):
+                return
+            char = buffer[position]
+            state = self._state
+
+            if state == "start" and char == "{":
+                self._state = "first_key"
+            elif state == "first_key" and char == "}":
+                self._state = "end"
+            elif state in ("first_key", "key") and char == '"':
+                decoded = self._decode(position, final)
+                if decoded is None:
+                    return
+                self._key, self._pos = decoded
+                self._state = "colon"
+                continue
+            elif state == "colon" and char == ":":
+                self._state = "lines" if self._key == "lines" else "value"
+            elif state == "lines" and char == "[":
+                self.has_lines = True
+                self._state = "first_line"
+            elif state in ("value", "lines"):
+                # Any other `lines` value is kept for the validation to report it
+                decoded = self._decode(position, final)
+                if decoded is None:
+                    return
+                self.fields[self._key], self._pos = decoded
+                self._state = "next_key"
+                continue
+            elif state == "next_key" and char in ",}":
+                self._state = "key" if char == "," else "end"
+            elif state == "first_line" and char == "]":
+                self._state = "next_key"
+            elif state in ("first_line", "line"):
+                decoded = self._decode(position, final)
+                if decoded is None:
+                    return
+                line, self._pos = decoded
+                self._state = "next_line"
+                yield line
+                continue
+            elif state == "next_line" and char in ",]":
+                self._state = "line" if char == "," else "next_key"
+            else:
+                raise ValueError(f"Unexpected character {char!r} at {position}")
+
+            self._pos = position + 1
+
+
+class JsonArrayParser(_ChunkedJsonParser):
+    """
+    Incremental parser of a JSON array, fed with the chunks of a file or body, returning
+    its items one by one as soon as they are complete. A single value other than an array
+    is returned as its only item. Raises `ValueError` on invalid JSON.
+    """
+
+    incomplete_message = "Incomplete JSON array"
+
+    def _parse(self, final: bool) -> Iterator:
+        buffer = self._buffer
+        while True:
+            position = _WHITESPACE.match(buffer, self._pos).end()
+            self._pos = position
+            if position == len(buffer):
+                return
+            char = buffer[position]
+            state = self._state
+
+            if state == "start" and char == "[":
+                self._state = "first_item"
+            elif state == "first_item" and char == "]":
+                self._state = "end"
+            elif state in ("start", "first_item", "item"):
+                decoded = self._decode(position, final)
+                if decoded is None:
+                    return
+                item, self._pos = decoded
+                self._state = "end" if state == "start" else "next_item"
+                yield item
+                continue
+            elif state == "next_item" and char in ",]":
+                self._state = "item" if char == "," else "end"
+            else:
+                raise ValueError(f"Unexpected character {char!r} at {position}")
+
+            self._pos = position + 1
+
+
+class MsgpackInvoiceParser:
+    """
+    Parser of a MessagePack invoice body, with the interface of `InvoiceBodyParser`.
+
+    MessagePack bodies are compact and decoded at once, when the body is complete.
+    """
+
+    def __init__(self):
+        self.fields: dict = {}
+        self.has_lines = False
+        self._chunks: list[bytes] = []
+
+    def feed(self, chunk: bytes) -> list:
+        self._chunks.append(chunk)
+        return []
+
+    def close(self) -> list:
+        try:
+            invoice = msgpack.unpackb(b"".join(self._chunks))
+        except Exception as e:
+            raise ValueError(f"Invalid MessagePack body: {e}") from None
+        self._chunks.clear()
+        if not isinstance(invoice, dict):
+            raise ValueError("Invoice body must be a map")
+
+        lines = invoice.get("lines")
+        if isinstance(lines, list):
+            del invoice["lines"]
+            self.has_lines = True
+        self.fields = invoice
+        return lines if self.has_lines else []
@@ -0,0 +1,4 @@
+"""Media types of the request and response bodies, shared by the service and its client."""
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl")
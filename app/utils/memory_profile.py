@@ -0,0 +1,245 @@
+import os
+import random
+import sys
+import tracemalloc
+from collections import OrderedDict
+from typing import Literal, Optional
+
+from app.settings import (
+    MEMORY_MAX_SNAPSHOTS,
+    MEMORY_SAMPLE_RATE,
+    MEMORY_TRACEBACK_FRAMES,
+    MIDDLEWARE_SERVICE_DIR,
+)
+
+APP_DIR = os.path.join(MIDDLEWARE_SERVICE_DIR, "app")
+
+# Traces of tracemalloc itself are left out of the snapshots
+_SNAPSHOT_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__),)
+
+
+def module_name(filename: str) -> str:
+    """
+    Module of a traced allocation: the dotted module within `app/`, the top-level package
+    of the installed dependencies (e.g. `pydantic`, `jsonlines`), or `<python>` for the
+    standard library and the interpreter.
+    """
+    path = os.path.abspath(filename)
+    if path.startswith(APP_DIR + os.sep):
+        module = os.path.relpath(path, MIDDLEWARE_SERVICE_DIR)[: -len(".py")]
+        return module.removesuffix(f"{os.sep}__init__").replace(os.sep, ".")
+
+    parts = path.split(os.sep)
+    if "site-packages" in parts[:-1]:
+        return parts[parts.index("site-packages") + 1].removesuffix(".py")
+    return "<python>"
+
+
+class MemoryProfiler:
+    """
+    Opt-in memory instrumentation based on `tracemalloc`.
+
+    Snapshots of the traced allocations are taken on demand, the last `max_snapshots`
+    being kept to be diffed. A `sample_rate` share of the requests is measured: the bytes
+    still allocated when the request is done, its peak of allocated bytes, and the net
+    number of allocated blocks. Concurrent requests are included in the measures of each
+    other, which are averaged over many samples.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = MEMORY_SAMPLE_RATE,
+        traceback_frames: int = MEMORY_TRACEBACK_FRAMES,
+        max_snapshots: int = MEMORY_MAX_SNAPSHOTS,
+    ):
+        self.sample_rate = sample_rate
+        self.traceback_frames = traceback_frames
+        self.max_snapshots = max_snapshots
+        self._snapshots: OrderedDict[int, tracemalloc.Snapshot] = OrderedDict()
+        self._next_snapshot_id = 1
+        self._requests: dict[tuple[str, Optional[str]], dict] = {}
+        self._started = False
+
+    def start(self) -> None:
+        """Start tracing the allocations, unless they already are"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_frames)
+            self._started = True
+
+    def stop(self) -> None:
+        """Stop tracing the allocations if they were started here, and drop the snapshots"""
+        self._snapshots.clear()
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def take_snapshot(self) -> dict:
+        """Take a snapshot of the traced allocations, returning its id and the totals"""
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        snapshot_id = self._next_snapshot_id
+        self._next_snapshot_id += 1
+        self._snapshots[snapshot_id] = snapshot
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+
+        traced_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        return {
+            "id": snapshot_id,
+            "traced_bytes": traced_bytes,
+            "peak_bytes": peak_bytes,
+            "snapshots": list(self._snapshots),
+        }
+
+    def diff(
+        self,
+        snapshot_id: int,
+        base_id: Optional[int] = None,
+        group_by: Literal["module", "line"] = "module",
+        limit: int = 20,
+    ) -> dict:
+        """
+        Top allocation sites grown since a base snapshot (the previous one by default,
+        or none), grouped by module or by line of the `app/` modules. Raises `KeyError`
+        for a snapshot that isn't kept.
+        """
+        snapshot = self._snapshots[snapshot_id]
+        if base_id is None:
+            previous = [other for other in self._snapshots if other < snapshot_id]
+            base_id = previous[-1] if previous else None
+        base = self._snapshots[base_id] if base_id is not None else None
+
+        if group_by == "line":
+            sites = [
+                {
+                    "site": (
+                        f"{os.path.relpath(stat.traceback[0].filename, MIDDLEWARE_SERVICE_DIR)}"
+                        f":{stat.traceback[0].lineno}"
+                    ),
+                    "size_diff": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                    "size": stat.size,
+                    "count": stat.count,
+                }
+                for stat in self._compare(snapshot, base, "lineno")
+                if os.path.abspath(stat.traceback[0].filename).startswith(
+                    APP_DIR + os.sep
+                )
+            ]
+        else:
+            modules: dict[str, dict] = {}
+            for stat in self._compare(snapshot, base, "filename"):
+                site = modules.setdefault(
+                    module_name(stat.traceback[0].filename),
+                    {"size_diff": 0, "count_diff": 0, "size": 0, "count": 0},
+                )
+                site["size_diff"] += stat.size_diff
+                site["count_diff"] += stat.count_diff
+                site["size"] += stat.size
+                site["count"] += stat.count
+            sites = [{"site": module, **site} for module, site in modules.items()]
+
+        sites.sort(key=lambda site: abs(site["size_diff"]), reverse=True)
+        return {
+            "id": snapshot_id,
+            "base": base_id,
+            "group_by": group_by,
+            "size_diff": sum(site["size_diff"] for site in sites),
+            "sites": sites[:limit],
+        }
+
+    @staticmethod
+    def _compare(
+        snapshot: tracemalloc.Snapshot,
+        base: Optional[tracemalloc.Snapshot],
+        key_type: str,
+    ) -> list[tracemalloc.StatisticDiff]:
+        if base is None:
+            base = tracemalloc.Snapshot((), snapshot.traceback_limit)
+        return snapshot.compare_to(base, key_type)
+
+    def should_sample(self) -> bool:
+        """Whether to measure a request"""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record_request(
+        self,
+        endpoint: str,
+        company: Optional[str],
+        retained_bytes: int,
+        peak_bytes: int,
+        blocks: int,
+    ) -> None:
+        """Add the measures of a sampled request to those of its endpoint and company"""
+        stats = self._requests.setdefault(
+            (endpoint, company),
+            {
+                "requests": 0,
+                "retained_bytes": 0,
+                "peak_bytes": 0,
+                "max_peak_bytes": 0,
+                "blocks": 0,
+            },
+        )
+        stats["requests"] += 1
+        stats["retained_bytes"] += retained_bytes
+        stats["peak_bytes"] += peak_bytes
+        stats["max_peak_bytes"] = max(stats["max_peak_bytes"], peak_bytes)
+        stats["blocks"] += blocks
+
+    def request_stats(self) -> dict:
+        """Mean measures of the sampled requests per endpoint and company"""
+        return {
+            "sample_rate": self.sample_rate,
+            "requests": [
+                {
+                    "endpoint": endpoint,
+                    "company": company,
+                    "sampled_requests": stats["requests"],
+                    "mean_retained_bytes": stats["retained_bytes"] / stats["requests"],
+                    "mean_peak_bytes": stats["peak_bytes"] / stats["requests"],
+                    "max_peak_bytes": stats["max_peak_bytes"],
+                    "mean_blocks": stats["blocks"] / stats["requests"],
+                }
+                for (endpoint, company), stats in sorted(
+                    self._requests.items(),
+                    key=lambda item: (item[0][0], item[0][1] or ""),
+                )
+            ],
+        }
+
+
+class MemoryProfilingMiddleware:
+    """
+    ASGI middleware measuring the allocations of the sampled HTTP requests. Endpoints
+    report the company of a request in `request.state.company`.
+    """
+
+    def __init__(self, app, profiler: MemoryProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not tracemalloc.is_tracing()
+            or not self.profiler.should_sample()
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start_blocks = sys.getallocatedblocks()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            traced_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            route = scope.get("route")
+            self.profiler.record_request(
+                # Unmatched paths are grouped so they can't grow the stats
+                endpoint=route.path if route is not None else "<unmatched>",
+                company=scope.get("state", {}).get("company"),
+                retained_bytes=traced_bytes - start_bytes,
+                peak_bytes=peak_bytes - start_bytes,
+                blocks=sys.getallocatedblocks() - start_blocks,
+            )
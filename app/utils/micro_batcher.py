@@ -0,0 +1,122 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from app.settings import MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WINDOW
+
+# Weight of the last batch in the moving average of the batch sizes
+BATCH_SIZE_SMOOTHING = 0.2
+
+
+class MicroBatcher:
+    """
+    Collects the items submitted concurrently, e.g. by single-record requests, into
+    batches of at most `max_size` items processed by one call of `process`, which
+    returns the result of each item in order (an exception being raised to its caller).
+    When `process` raises for a whole batch, each of its items is processed again on its
+    own, so a bad item only fails its own caller. `process` should rather return the
+    errors of the items it can't process, as the items of a failed batch are processed
+    twice.
+
+    A batch is started on the next iteration of the event loop after its first item,
+    so the items received together share it, or once it's full. Under load, the batches
+    grow and the first item of a batch waits for the others up to a window growing with
+    the average batch size, at most `max_window` seconds. At low load the batches hold a
+    single item, and the window shrinks to zero so they aren't delayed.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[list], Awaitable[list]],
+        max_size: int = MICRO_BATCH_MAX_SIZE,
+        max_window: float = MICRO_BATCH_MAX_WINDOW,
+    ):
+        self.process = process
+        self.max_size = max(max_size, 1)
+        self.max_window = max_window
+        # Seconds the first item of a batch waits for others
+        self.window = 0.0
+        self.mean_size = 1.0
+
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+        # Running batches, referenced until they complete
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_size = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Process an item in the next batch, returning its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = (
+                loop.call_later(self.window, self._flush)
+                if self.window > 0
+                else loop.call_soon(self._flush)
+            )
+
+        result = await future
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # Items whose caller is gone, e.g. disconnected, are dropped
+        batch = [(item, future) for item, future in self._pending if not future.done()]
+        self._pending = []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        self._adapt(len(batch))
+        items = [item for item, _ in batch]
+        try:
+            results = await self.process(items)
+        except Exception as e:
+            results = (
+                [e]
+                if len(items) == 1
+                else [await self._run_alone(item) for item in items]
+            )
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_alone(self, item: Any) -> Any:
+        """Result of an item processed in a batch of its own, or its error"""
+        try:
+            [result] = await self.process([item])
+        except Exception as e:
+            return e
+        return result
+
+    def _adapt(self, size: int) -> None:
+        """Adapt the window to the moving average of the batch sizes"""
+        self.batches += 1
+        self.items += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.mean_size += (size - self.mean_size) * BATCH_SIZE_SMOOTHING
+        # No window while the batches mostly hold a single item
+        if self.mean_size < 2:
+            self.window = 0.0
+        else:
+            fill = (self.mean_size - 1) / (self.max_size - 1)
+            self.window = self.max_window * min(1.0, fill)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else None,
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window * 1000,
+        }
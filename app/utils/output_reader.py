@@ -0,0 +1,102 @@
+import json
+import os
+from typing import Callable, Iterator, Literal, Optional
+
+from app.settings import OUTPUT_FILE
+
+
+def field_token(key: str, value: str) -> bytes:
+    """Serialized `"key": "value"` fragment as written by `append_output_to_jsonl`"""
+    return f"{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}".encode()
+
+
+def iter_output_lines(
+    output_file: str = OUTPUT_FILE,
+    start_offset: int = 0,
+    stop_offset: Optional[int] = None,
+) -> Iterator[tuple[int, bytes]]:
+    """
+    Stream the complete lines of the JSONL output file as `(byte_offset, line)` tuples,
+    up to `stop_offset` when given.
+
+    A partially written last line (concurrent append) is not yielded, so resuming from
+    `offset + len(line)` of the last yielded line never skips a record.
+    """
+    if not os.path.exists(output_file):
+        return
+
+    with open(output_file, "rb") as f:
+        f.seek(start_offset)
+        offset = start_offset
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            if stop_offset is not None and offset >= stop_offset:
+                break
+            yield offset, line
+            offset += len(line)
+
+
+def complete_lines_end(output_file: str = OUTPUT_FILE, chunk_size: int = 65536) -> int:
+    """Offset right after the last complete line of the output file"""
+    if not os.path.exists(output_file):
+        return 0
+
+    with open(output_file, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        # Look backwards for the newline ending the last complete line
+        while end > 0:
+            start = max(0, end - chunk_size)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def is_line_start(output_file: str, offset: int) -> bool:
+    """Whether a record of the output file starts at the offset"""
+    if offset == 0:
+        return True
+    if offset < 0 or not os.path.exists(output_file):
+        return False
+
+    with open(output_file, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+
+def iter_output_records(
+    output_file: str = OUTPUT_FILE,
+    company: Optional[str] = None,
+    record_type: Optional[Literal["vendor", "invoice"]] = None,
+    start_offset: int = 0,
+    line_filter: Optional[Callable[[bytes], bool]] = None,
+) -> Iterator[tuple[int, dict]]:
+    """
+    Stream the records of the JSONL output file as `(byte_offset, record)` tuples.
+
+    The company and record type filters are pushed down into the scan: lines that
+    can't match are discarded on a raw byte check before being decoded, as are the lines
+    rejected by `line_filter`.
+    """
+    tokens = []
+    if company is not None:
+        tokens.append(field_token("company", company))
+    if record_type is not None:
+        tokens.append(field_token("record_type", record_type))
+
+    for offset, line in iter_output_lines(output_file, start_offset):
+        if any(token not in line for token in tokens):
+            continue
+        if line_filter is not None and not line_filter(line):
+            continue
+
+        record = json.loads(line)
+        if company is not None and record["company"] != company:
+            continue
+        if record_type is not None and record["record_type"] != record_type:
+            continue
+
+        yield offset, record
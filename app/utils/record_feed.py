@@ -0,0 +1,160 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Literal
+
+from app.enums import AppEnum
+from app.settings import OUTPUT_FILE, RECORD_STREAM_BUFFER_SIZE
+from app.utils.output_reader import complete_lines_end, iter_output_lines
+
+StreamFormat = Literal["ndjson", "sse"]
+
+# Lines read from the file per worker thread call when replaying
+_REPLAY_BATCH_SIZE = 1_000
+
+
+def format_event(line: bytes, offset: int, stream_format: StreamFormat) -> bytes:
+    """
+    Event of a record, carrying the offset right after it so a consumer can resume with
+    `since=<offset>`. The raw JSONL line is embedded without being decoded.
+    """
+    record = line.rstrip(b"\n")
+    if stream_format == "sse":
+        return b"id: %d\ndata: %s\n\n" % (offset, record)
+    return b'{"offset": %d, "record": %s}\n' % (offset, record)
+
+
+def format_error_event(detail: str, offset: int, stream_format: StreamFormat) -> bytes:
+    """Last event sent before closing the stream of a consumer that fell behind"""
+    error = json.dumps({"error": detail, "offset": offset}).encode()
+    if stream_format == "sse":
+        return b"event: error\ndata: %s\n\n" % error
+    return error + b"\n"
+
+
+class RecordSubscriber:
+    """
+    Bounded buffer of the records appended for one consumer of the feed.
+
+    Records are published from any thread and consumed from the event loop of the
+    consumer. Once the buffer is full the subscriber overflows and receives nothing more.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, buffer_size: int):
+        self.buffer_size = buffer_size
+        self.overflowed = False
+        self.closed = False
+        self._loop = loop
+        self._events: deque[tuple[bytes, int]] = deque()
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def publish(self, line: bytes, offset: int) -> None:
+        with self._lock:
+            if self.overflowed:
+                return
+            if len(self._events) >= self.buffer_size:
+                self.overflowed = True
+            else:
+                self._events.append((line, offset))
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    def close(self) -> None:
+        self.closed = True
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def next_events(self) -> list[tuple[bytes, int]]:
+        """Wait for the next buffered `(line, offset)` events, empty once closed"""
+        await self._ready.wait()
+        self._ready.clear()
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+
+class RecordFeed:
+    """
+    Change feed of the records appended to the output file.
+
+    The feed follows the output file from the last published offset, like the other
+    components, and fans each new line out to the subscribers from memory.
+    """
+
+    def __init__(
+        self,
+        output_file: str = OUTPUT_FILE,
+        buffer_size: int = RECORD_STREAM_BUFFER_SIZE,
+    ):
+        self.output_file = output_file
+        self.buffer_size = buffer_size
+        # Only the records appended from now on have to be published
+        self.offset = complete_lines_end(output_file)
+        self._subscribers: set[RecordSubscriber] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def refresh(self) -> None:
+        """Publish the records appended to the output file since the last refresh"""
+        with self._lock:
+            for offset, line in iter_output_lines(self.output_file, self.offset):
+                self.offset = offset + len(line)
+                for subscriber in self._subscribers:
+                    subscriber.publish(line, self.offset)
+
+    def subscribe(
+        self, loop: asyncio.AbstractEventLoop
+    ) -> tuple[RecordSubscriber, int]:
+        """Register a subscriber, returning it with the offset its first record starts at"""
+        subscriber = RecordSubscriber(loop, self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            return subscriber, self.offset
+
+    def unsubscribe(self, subscriber: RecordSubscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def close(self) -> None:
+        """End the streams of all the subscribers"""
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.close()
+
+    async def stream(
+        self, since: int = 0, stream_format: StreamFormat = "ndjson"
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream the records from the `since` offset: the ones already published are
+        replayed from the file, then the new ones are streamed as they are published.
+        """
+        subscriber, live_offset = self.subscribe(asyncio.get_running_loop())
+        try:
+            offset = since
+            lines = iter_output_lines(self.output_file, since, live_offset)
+            # Read the file in a worker thread so the replay doesn't block the event loop
+            while batch := await asyncio.to_thread(
+                list, islice(lines, _REPLAY_BATCH_SIZE)
+            ):
+                for line_offset, line in batch:
+                    offset = line_offset + len(line)
+                    yield format_event(line, offset, stream_format)
+
+            while not subscriber.closed:
+                for line, offset in await subscriber.next_events():
+                    if offset > since:
+                        yield format_event(line, offset, stream_format)
+
+                if subscriber.overflowed:
+                    yield format_error_event(
+                        AppEnum.STREAM_BUFFER_OVERFLOW_MSSG.value,
+                        max(offset, since),
+                        stream_format,
+                    )
+                    return
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,204 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from app.settings import LOG_QUEUE_SIZE, LOG_SAMPLE_RATE
+from app.utils.shard_pool import shard_key
+
+access_logger = logging.getLogger("app.access")
+audit_logger = logging.getLogger("app.audit")
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a log record as a JSON line of its message and its `fields` extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            {
+                "time": datetime.fromtimestamp(
+                    record.created, timezone.utc
+                ).isoformat(),
+                "logger": record.name,
+                "event": record.getMessage(),
+                **getattr(record, "fields", {}),
+            },
+            default=str,
+        )
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks: the records are formatted by the listener thread,
+    and dropped (and counted) when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLog:
+    """
+    Structured access and audit logs of the service, written by a background thread.
+
+    Every request gets an access log (`app.access`) and every processed record an audit
+    log (`app.audit`) with its company, record type, key and status code, a `sample_rate` share of the successful ones being kept while the
+    errors are always kept. The log records are put in a bounded queue without blocking
+    and written as JSON lines by a `QueueListener` thread, to `log_file` or stderr.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = LOG_SAMPLE_RATE,
+        queue_size: int = LOG_QUEUE_SIZE,
+        handler: Optional[logging.Handler] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.handler = handler or logging.StreamHandler(sys.stderr)
+        self.handler.setFormatter(JsonFormatter())
+        self.queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self._listener = logging.handlers.QueueListener(
+            self.queue_handler.queue, self.handler
+        )
+
+    @classmethod
+    def from_file(cls, log_file: Optional[str] = None, **options) -> "RequestLog":
+        """Request log written to a file, or to stderr without one"""
+        handler = logging.FileHandler(log_file, encoding="utf-8") if log_file else None
+        return cls(handler=handler, **options)
+
+    def start(self) -> None:
+        for logger in (access_logger, audit_logger):
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(self.queue_handler)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Stop logging, once the queued records are written"""
+        for logger in (access_logger, audit_logger):
+            logger.removeHandler(self.queue_handler)
+        self._listener.stop()
+        self.handler.close()
+
+    def sampled(self, status_code: int) -> bool:
+        """Whether to log an outcome, errors always being logged"""
+        return status_code >= 400 or random.random() < self.sample_rate
+
+    def access(self, fields: dict) -> None:
+        if self.sampled(fields["status_code"]):
+            access_logger.info("request", extra={"fields": fields})
+
+    def audit(self, fields: dict) -> None:
+        if self.sampled(fields["status_code"]):
+            audit_logger.info("record", extra={"fields": fields})
+
+    def audit_messages(self, messages: list, acks: list[dict]) -> None:
+        """Audit logs of a batch of messages and their acknowledgements"""
+        for message, ack in zip(messages, acks):
+            is_message = isinstance(message, dict)
+            data = message.get("data") if is_message else None
+            self.audit(
+                {
+                    "company": data.get("company") if isinstance(data, dict) else None,
+                    "record_type": message.get("record_type") if is_message else None,
+                    "record_key": shard_key(message) if is_message else None,
+                    "status_code": ack["status_code"],
+                }
+            )
+
+
+def _request_state(request) -> dict:
+    return request.scope.setdefault("state", {})
+
+
+def describe_record(
+    request, company: str, record_type: str, record_key: Optional[str]
+) -> None:
+    """Report the record of a request, for its logs (and memory measures)"""
+    state = _request_state(request)
+    state["company"] = company
+    state["record_type"] = record_type
+    state["record_key"] = record_key
+
+
+@contextmanager
+def log_stage(request, stage: str) -> Iterator[None]:
+    """Measure a stage of the handling of a request, adding up its repeated runs"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages = _request_state(request).setdefault("stages", {})
+        stages[stage] = stages.get(stage, 0) + time.perf_counter() - start
+
+
+class RequestLogMiddleware:
+    """
+    ASGI middleware logging the HTTP requests with their status code, duration, the
+    stages measured with `log_stage` and the record reported with `describe_record`,
+    which is audited.
+    """
+
+    def __init__(self, app, request_log: RequestLog):
+        self.app = app
+        self.request_log = request_log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            state = scope.get("state", {})
+            if "record_type" in state:
+                self.request_log.audit(
+                    {
+                        "company": state["company"],
+                        "record_type": state["record_type"],
+                        "record_key": state["record_key"],
+                        "status_code": status_code,
+                    }
+                )
+            self.request_log.access(
+                {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status_code": status_code,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                    "company": state.get("company"),
+                    "record_type": state.get("record_type"),
+                    "record_key": state.get("record_key"),
+                    "stages_ms": {
+                        stage: round(seconds * 1000, 3)
+                        for stage, seconds in state.get("stages", {}).items()
+                    },
+                }
+            )
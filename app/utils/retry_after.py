@@ -0,0 +1,19 @@
+"""Parsing of the `Retry-After` header, shared by the client and the forwarding."""
+
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait of a `Retry-After` header (seconds or HTTP date), if valid"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,81 @@
+import multiprocessing
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Literal, Optional
+
+ShardBy = Literal["company", "key"]
+
+# Field holding the key of each record type
+RECORD_KEY_FIELDS = {"vendor": "vendorName", "invoice": "invoiceId"}
+
+
+def shard_key(message: dict, shard_by: ShardBy = "key") -> Optional[str]:
+    """Company or record key (vendorName, invoiceId) a message is partitioned on"""
+    data = message.get("data")
+    if not isinstance(data, dict):
+        return None
+    if shard_by == "company":
+        return data.get("company")
+    return data.get(RECORD_KEY_FIELDS.get(message.get("record_type")))
+
+
+class ShardPool:
+    """
+    Persistent pool of worker processes, each owning a shard of the messages.
+
+    The messages of a batch are partitioned by company or record key, and sent to the
+    worker of their shard as one chunk of plain dicts (serialized once per chunk, which
+    is several times faster and more compact than JSON). The results are returned in the
+    order of the batch, and the same key always goes to the same worker.
+    """
+
+    def __init__(self, workers: int, shard_by: ShardBy = "key"):
+        self.shard_by = shard_by
+        # Spawned workers don't inherit the threads and open files of the service
+        context = multiprocessing.get_context("spawn")
+        self._executors = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context)
+            for _ in range(workers)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._executors)
+
+    def shard(self, message: dict) -> int:
+        key = shard_key(message, self.shard_by)
+        return zlib.crc32(str(key).encode()) % len(self._executors)
+
+    def map(self, function: Callable[[list[dict]], list], messages: list[dict]) -> list:
+        """
+        Run `function` on the chunk of messages of each shard, and return the results
+        of the messages in their original order.
+        """
+        chunks: list[list[dict]] = [[] for _ in self._executors]
+        positions: list[list[int]] = [[] for _ in self._executors]
+        for position, message in enumerate(messages):
+            shard = self.shard(message)
+            chunks[shard].append(message)
+            positions[shard].append(position)
+
+        futures = [
+            (executor.submit(function, chunk), shard_positions)
+            for executor, chunk, shard_positions in zip(
+                self._executors, chunks, positions
+            )
+            if chunk
+        ]
+
+        results = [None] * len(messages)
+        for future, shard_positions in futures:
+            for position, result in zip(shard_positions, future.result()):
+                results[position] = result
+        return results
+
+    def start(self, function: Callable[[list[dict]], list]) -> None:
+        """Start the worker processes, running `function` once on an empty chunk"""
+        for future in [executor.submit(function, []) for executor in self._executors]:
+            future.result()
+
+    def close(self) -> None:
+        for executor in self._executors:
+            executor.shutdown()
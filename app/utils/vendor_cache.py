@@ -0,0 +1,88 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.settings import OUTPUT_FILE, VENDOR_CACHE_MAX_ENTRIES
+from app.utils.output_reader import iter_output_records
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern plain strings, enum members and None are already shared"""
+    return sys.intern(value) if type(value) is str else value
+
+
+class VendorCache:
+    """
+    Bounded in-memory vendor master keyed by (company, vendorName).
+
+    Only the fields used to enrich invoices are kept, and the least recently used
+    vendor is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries: int = VENDOR_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], tuple[str, Optional[str]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(key: tuple[str, str], value: tuple[str, Optional[str]]) -> int:
+        """Approximate footprint of an entry, interned values are shared and not counted"""
+        return sys.getsizeof(key) + sys.getsizeof(key[1]) + sys.getsizeof(value)
+
+    def put(self, company: str, data: dict) -> None:
+        """Add or refresh a processed vendor (`VendorStrategyA/B` output data)"""
+        key = (_intern(company), data["vendorName"])
+        # Countries and statuses repeat a lot, interning keeps a single copy of each
+        value = (_intern(data["country"]), _intern(data.get("vendorStatus")))
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= self._entry_size(key, previous)
+
+            self._entries[key] = value
+            self._memory_bytes += self._entry_size(key, value)
+
+            while len(self._entries) > self.max_entries:
+                evicted_key, evicted_value = self._entries.popitem(last=False)
+                self._memory_bytes -= self._entry_size(evicted_key, evicted_value)
+                self.evictions += 1
+
+    def get(self, company: str, vendor_name: str) -> Optional[dict]:
+        """Return the country and vendorStatus of a processed vendor, if known"""
+        key = (company, vendor_name)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return {"country": value[0], "vendorStatus": value[1]}
+
+    def warm_load(self, output_file: str = OUTPUT_FILE) -> None:
+        """Fill the cache with the vendors already stored in the output file"""
+        for _, record in iter_output_records(output_file, record_type="vendor"):
+            self.put(record["company"], record["data"])
+
+    def stats(self) -> dict:
+        """Hit rate and memory footprint of the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_bytes": self._memory_bytes,
+            }
@@ -0,0 +1,241 @@
+import random
+import re
+import threading
+import unicodedata
+import zlib
+from functools import lru_cache
+
+from app.settings import OUTPUT_FILE, VENDOR_DUPLICATE_THRESHOLD
+from app.utils.output_reader import iter_output_records
+
+# Legal form suffixes dropped from the end of vendor names
+LEGAL_SUFFIXES = frozenset(
+    {
+        "ab",
+        "ag",
+        "bv",
+        "co",
+        "company",
+        "corp",
+        "corporation",
+        "gmbh",
+        "inc",
+        "incorporated",
+        "limited",
+        "llc",
+        "llp",
+        "lp",
+        "ltd",
+        "nv",
+        "oy",
+        "plc",
+        "pty",
+        "sa",
+        "sarl",
+        "sas",
+        "spa",
+        "srl",
+    }
+)
+
+# Words common to many vendor names, left out of the MinHash signatures so vendors are
+# only compared with the ones sharing a similar distinctive part of their name
+GENERIC_WORDS = frozenset(
+    {
+        "and",
+        "consulting",
+        "distribution",
+        "energy",
+        "enterprises",
+        "foods",
+        "global",
+        "group",
+        "holdings",
+        "industrial",
+        "industries",
+        "international",
+        "logistics",
+        "manufacturing",
+        "partners",
+        "products",
+        "services",
+        "solutions",
+        "supplies",
+        "supply",
+        "systems",
+        "technologies",
+        "the",
+        "trading",
+    }
+)
+
+# Locality-sensitive hashing: a vendor is a candidate duplicate when all the MinHash
+# values of at least one band match, which is likely above ~0.6 n-gram similarity
+LSH_BANDS = 12
+LSH_BAND_ROWS = 5
+# Most similar vendors reported per lookup
+MAX_DUPLICATES = 5
+
+# Universal hash functions (a * x + b) mod p standing in for the MinHash permutations
+_MERSENNE_PRIME = (1 << 31) - 1
+_MINHASH_PARAMS = [
+    (random.Random(seed).randrange(1, _MERSENNE_PRIME), seed)
+    for seed in range(LSH_BANDS * LSH_BAND_ROWS)
+]
+_JOINED_PUNCTUATION = re.compile(r"['.`´’]")
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+@lru_cache(maxsize=65536)
+def normalize_vendor_name(vendor_name: str) -> str:
+    """
+    Comparable form of a vendor name: casefolded, without accents, punctuation nor legal
+    suffix, e.g. "Global Supplies Ltd." and "GLOBAL SUPPLIES LIMITED" -> "global supplies"
+    """
+    name = unicodedata.normalize("NFKD", vendor_name.casefold())
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    # Abbreviations are joined ("S.A." -> "sa"), other punctuation separates words
+    tokens = _SEPARATORS.sub(" ", _JOINED_PUNCTUATION.sub("", name)).split()
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def name_ngrams(normalized_name: str, n: int = 3) -> set[str]:
+    """Character n-grams of a normalized name, padded so short names have some too"""
+    padded = f" {normalized_name} "
+    return {padded[i : i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+def ngram_similarity(first: set[str], second: set[str]) -> float:
+    """Jaccard similarity of two n-gram sets"""
+    return len(first & second) / len(first | second)
+
+
+@lru_cache(maxsize=65536)
+def _ngram_hashes(ngram: str) -> tuple[int, ...]:
+    """Values of an n-gram under each MinHash permutation, shared by all the names"""
+    h = zlib.crc32(ngram.encode())
+    return tuple((a * h + b) % _MERSENNE_PRIME for a, b in _MINHASH_PARAMS)
+
+
+def _minhash_signature(ngrams: set[str]) -> list[int]:
+    """Minimum value of the n-grams under each permutation"""
+    return list(map(min, zip(*map(_ngram_hashes, ngrams))))
+
+
+def _band_keys(normalized_name: str) -> list[int]:
+    """MinHash signature of the distinctive part of a name, hashed band by band"""
+    distinctive_name = " ".join(
+        token for token in normalized_name.split() if token not in GENERIC_WORDS
+    )
+    signature = _minhash_signature(name_ngrams(distinctive_name or normalized_name))
+    return [
+        hash((band, *signature[band * LSH_BAND_ROWS : (band + 1) * LSH_BAND_ROWS]))
+        for band in range(LSH_BANDS)
+    ]
+
+
+def _add_to_bucket(buckets: dict, key, value) -> None:
+    """Add a value to a bucket holding a single value, or a list of them when they collide"""
+    bucket = buckets.get(key)
+    if bucket is None:
+        buckets[key] = value
+    elif isinstance(bucket, list):
+        bucket.append(value)
+    else:
+        buckets[key] = [bucket, value]
+
+
+def _bucket_values(bucket) -> list:
+    return [] if bucket is None else bucket if isinstance(bucket, list) else [bucket]
+
+
+class VendorDuplicateIndex:
+    """
+    Incremental MinHash LSH index of the vendor names processed per company.
+
+    Names are indexed once per normalized form, and only the names sharing a band of
+    their MinHash signature with a vendor are compared with it, so a lookup stays fast
+    however many vendors are indexed. Candidates are scored with the exact n-gram
+    similarity of the normalized names.
+    """
+
+    def __init__(self, threshold: float = VENDOR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        # name id -> normalized name, and company -> normalized name -> name id
+        self._normalized_names: list[str] = []
+        self._ids: dict[str, dict[str, int]] = {}
+        # name id -> vendor name(s) normalized to it
+        self._vendor_names: list[str | list[str]] = []
+        # band key -> name id(s)
+        self._buckets: dict[int, int | list[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(
+            len(_bucket_values(vendor_names)) for vendor_names in self._vendor_names
+        )
+
+    def add(self, company: str, vendor_name: str) -> None:
+        """Index a processed vendor (`VendorStrategyA/B` output vendorName)"""
+        normalized_name = normalize_vendor_name(vendor_name)
+
+        with self._lock:
+            company_ids = self._ids.setdefault(company, {})
+            name_id = company_ids.get(normalized_name)
+            if name_id is not None:
+                vendor_names = self._vendor_names[name_id]
+                if isinstance(vendor_names, list):
+                    if vendor_name not in vendor_names:
+                        vendor_names.append(vendor_name)
+                elif vendor_names != vendor_name:
+                    self._vendor_names[name_id] = [vendor_names, vendor_name]
+                return
+
+            name_id = len(self._normalized_names)
+            self._normalized_names.append(normalized_name)
+            company_ids[normalized_name] = name_id
+            self._vendor_names.append(vendor_name)
+
+            for band_key in _band_keys(normalized_name):
+                _add_to_bucket(self._buckets, hash((company, band_key)), name_id)
+
+    def find(self, company: str, vendor_name: str) -> list[dict]:
+        """Other vendors of the company likely to be duplicates of the name, best first"""
+        normalized_name = normalize_vendor_name(vendor_name)
+        ngrams = name_ngrams(normalized_name)
+        band_keys = _band_keys(normalized_name)
+
+        with self._lock:
+            candidates = set()
+            for band_key in band_keys:
+                bucket = self._buckets.get(hash((company, band_key)))
+                candidates.update(_bucket_values(bucket))
+            candidates = [
+                (
+                    self._normalized_names[name_id],
+                    _bucket_values(self._vendor_names[name_id])[:],
+                )
+                for name_id in candidates
+            ]
+
+        duplicates = []
+        for candidate_name, vendor_names in candidates:
+            score = ngram_similarity(ngrams, name_ngrams(candidate_name))
+            if score < self.threshold:
+                continue
+            score = round(score, 3)
+            duplicates.extend(
+                {"vendorName": name, "score": score}
+                for name in vendor_names
+                if name != vendor_name
+            )
+
+        duplicates.sort(key=lambda duplicate: duplicate["score"], reverse=True)
+        return duplicates[:MAX_DUPLICATES]
+
+    def warm_load(self, output_file: str = OUTPUT_FILE) -> None:
+        """Index the vendors already stored in the output file"""
+        for _, record in iter_output_records(output_file, record_type="vendor"):
+            self.add(record["company"], record["data"]["vendorName"])
@@ -0,0 +1,150 @@
+"""
+Benchmark of the latency of a company's records while another company floods the service.
+
+Usage:
+    python benchmarks/bench_fairness.py --seconds 10 --noisy-clients 8
+
+Runs the service in process, the quiet company "B" posting vendor records one at a time
+to `/vendor-record` while the noisy company "A" posts NDJSON batches to `/records/batch`
+from `--noisy-clients` concurrent clients. Reports the latency percentiles of both, B
+alone, then with A flooding without fair scheduling (`scheduler_concurrency=0`), with
+fair scheduling, and with fair scheduling and a quota for A.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import create_app  # noqa: E402
+from app.settings import Settings  # noqa: E402
+
+VENDOR = {"vendorName": "Vendor", "country": "FR", "bank": "Bank"}
+
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+async def run(settings: Settings, args, noisy: bool) -> dict:
+    app = create_app(settings)
+    transport = httpx.ASGITransport(app=app)
+    batch = "".join(
+        json.dumps(
+            {
+                "seq": seq,
+                "record_type": "vendor",
+                "data": {**VENDOR, "company": "A", "vendorName": f"Vendor A{seq}"},
+            }
+        )
+        + "\n"
+        for seq in range(args.batch_size)
+    ).encode()
+    latencies = {"A": [], "B": []}
+    limited = 0
+
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as http:
+        while not app.state.ready:
+            await asyncio.sleep(0.01)
+        deadline = time.perf_counter() + args.seconds
+
+        async def noisy_client():
+            nonlocal limited
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await http.post(
+                    "/records/batch",
+                    content=batch,
+                    headers={"Content-Type": "application/x-ndjson"},
+                )
+                latencies["A"].append(time.perf_counter() - start)
+                retry_after = [
+                    ack["retry_after"]
+                    for ack in response.json()["acks"]
+                    if ack["status_code"] == 429
+                ]
+                limited += len(retry_after)
+                # Back off like a well-behaved client until the quota allows more
+                if retry_after:
+                    await asyncio.sleep(min(retry_after))
+
+        async def quiet_client():
+            seq = 0
+            while time.perf_counter() < deadline:
+                seq += 1
+                start = time.perf_counter()
+                response = await http.post(
+                    "/vendor-record",
+                    json={**VENDOR, "company": "B", "vendorName": f"Vendor B{seq}"},
+                )
+                latencies["B"].append(time.perf_counter() - start)
+                assert response.status_code == 201, response.text
+                await asyncio.sleep(args.quiet_interval)
+
+        await asyncio.gather(
+            quiet_client(),
+            *(noisy_client() for _ in range(args.noisy_clients if noisy else 0)),
+        )
+
+    return {
+        company: (
+            len(values),
+            percentile(values, 50) * 1000,
+            percentile(values, 99) * 1000,
+        )
+        for company, values in latencies.items()
+        if values
+    } | {"limited": limited}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--noisy-clients", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--quiet-interval", type=float, default=0.01)
+    parser.add_argument("--noisy-quota", default="2000:5000")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("B alone", {}, False),
+        ("A flooding, no fair scheduling", {"scheduler_concurrency": 0}, True),
+        ("A flooding, fair scheduling", {}, True),
+        (
+            f"A flooding, fair scheduling, A quota {args.noisy_quota}",
+            {"company_quotas": f"A={args.noisy_quota}"},
+            True,
+        ),
+    ]
+    print(
+        f"{'scenario':<52} {'B requests':>10} {'B p50 ms':>9} {'B p99 ms':>9}"
+        f" {'A batches':>10} {'A p99 ms':>9} {'A limited':>10}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, options, noisy in scenarios:
+            settings = Settings(
+                output_file=os.path.join(tmp_dir, f"output-{len(name)}.jsonl"),
+                request_log=False,
+                **options,
+            )
+            result = asyncio.run(run(settings, args, noisy))
+            quiet = result["B"]
+            noisy_result = result.get("A", (0, float("nan"), float("nan")))
+            print(
+                f"{name:<52} {quiet[0]:>10} {quiet[1]:9.1f} {quiet[2]:9.1f}"
+                f" {noisy_result[0]:>10} {noisy_result[2]:9.1f} {result['limited']:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
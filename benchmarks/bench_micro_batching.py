@@ -0,0 +1,102 @@
+"""
+Benchmark of the throughput and latency of concurrent single-record requests, micro-batched or not.
+
+Usage:
+    python benchmarks/bench_micro_batching.py --seconds 5 --clients 1,64
+
+Runs the service in process, writing to a JSONL output file, with `--clients` clients
+each posting vendor records one at a time to `/vendor-record`. Reports the records per
+second, the latency percentiles and the mean batch size, without micro-batching
+(`micro_batch_max_size=1`) and with it.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import create_app  # noqa: E402
+from app.settings import Settings  # noqa: E402
+
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+async def run(settings: Settings, clients: int, seconds: float) -> dict:
+    app = create_app(settings)
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as http:
+        while not app.state.ready:
+            await asyncio.sleep(0.01)
+        deadline = time.perf_counter() + seconds
+
+        async def client(client_id: int):
+            seq = 0
+            while time.perf_counter() < deadline:
+                seq += 1
+                start = time.perf_counter()
+                response = await http.post(
+                    "/vendor-record",
+                    json={
+                        "company": "AB"[client_id % 2],
+                        "vendorName": f"Vendor {client_id}-{seq}",
+                        "country": "FR",
+                        "bank": "Bank",
+                    },
+                )
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 201, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(client_id) for client_id in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "mean_batch_size": app.state.vendor_batcher.stats()["mean_batch_size"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", default="1,64")
+    args = parser.parse_args()
+
+    print(
+        f"{'clients':>7} {'micro-batching':>15} {'records/s':>10} {'p50 ms':>8}"
+        f" {'p99 ms':>8} {'batch size':>11}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for clients in map(int, args.clients.split(",")):
+            for name, max_size in (("off", 1), ("on", None)):
+                options = {} if max_size is None else {"micro_batch_max_size": max_size}
+                settings = Settings(
+                    output_file=os.path.join(tmp_dir, f"output-{clients}-{name}.jsonl"),
+                    request_log=False,
+                    **options,
+                )
+                result = asyncio.run(run(settings, clients, args.seconds))
+                print(
+                    f"{clients:>7} {name:>15} {result['throughput']:10.0f}"
+                    f" {result['p50']:8.2f} {result['p99']:8.2f}"
+                    f" {result['mean_batch_size']:11.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
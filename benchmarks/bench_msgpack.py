@@ -0,0 +1,151 @@
+"""
+Benchmark of the payload size and server CPU per record of JSON versus MessagePack.
+
+Usage:
+    python benchmarks/bench_msgpack.py --requests 500 --lines 20
+
+Posts pre-encoded vendor, invoice and batch bodies straight to the ASGI app (no HTTP
+client nor server in the measure), writing to the in-memory output backend, and reports
+the request and response sizes and the process CPU time per record of each format.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import msgpack
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import create_app  # noqa: E402
+from app.settings import Settings  # noqa: E402
+
+FORMATS = {
+    "json": ("application/json", lambda body: json.dumps(body).encode()),
+    "msgpack": ("application/msgpack", msgpack.packb),
+}
+
+
+def vendor(seq: int) -> dict:
+    return {
+        "company": "AB"[seq % 2],
+        "vendorName": f"Vendor {seq}",
+        "country": "FR",
+        "bank": "Bank X",
+    }
+
+
+def invoice(seq: int, lines: int) -> dict:
+    return {
+        "company": "AB"[seq % 2],
+        "invoiceId": f"INV{seq}",
+        "invoiceDate": "2025-03-15",
+        "lines": [
+            {"description": f"Office supplies {line}", "amount": line * 1.25}
+            for line in range(lines)
+        ],
+    }
+
+
+async def post(app, path: str, body: bytes, media_type: str) -> bytes:
+    """Run a POST request through the ASGI app, returning the response body"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", media_type.encode()),
+            (b"accept", media_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            response.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(response)
+
+
+async def measure(path: str, bodies: list, records_per_body: int, fmt: str) -> tuple:
+    app = create_app(Settings(output_backend="memory"))
+    media_type, encode = FORMATS[fmt]
+    encoded = [encode(body) for body in bodies]
+
+    await post(app, path, encoded[0], media_type)
+    start = time.process_time()
+    response_size = 0
+    for body in encoded:
+        response_size += len(await post(app, path, body, media_type))
+    elapsed = time.process_time() - start
+
+    records = len(bodies) * records_per_body
+    request_size = sum(map(len, encoded))
+    return request_size / records, response_size / records, elapsed / records * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    cases = [
+        ("vendor", "/vendor-record", [vendor(seq) for seq in range(args.requests)], 1),
+        (
+            "invoice",
+            "/invoice-record",
+            [invoice(seq, args.lines) for seq in range(args.requests)],
+            1,
+        ),
+        (
+            "batch",
+            "/records/batch",
+            [
+                [
+                    {
+                        "seq": seq,
+                        "record_type": "invoice",
+                        "data": invoice(seq, args.lines),
+                    }
+                    for seq in range(args.batch_size)
+                ]
+                for _ in range(max(1, args.requests // args.batch_size))
+            ],
+            args.batch_size,
+        ),
+    ]
+
+    print(
+        f"{'endpoint':>8} {'format':>8} {'request B':>10} {'response B':>11} {'CPU us':>8}"
+    )
+    for name, path, bodies, records_per_body in cases:
+        for fmt in FORMATS:
+            request_size, response_size, cpu = asyncio.run(
+                measure(path, bodies, records_per_body, fmt)
+            )
+            print(
+                f"{name:>8} {fmt:>8} {request_size:10.0f} {response_size:11.0f} {cpu:8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
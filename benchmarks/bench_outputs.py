@@ -0,0 +1,113 @@
+"""
+Benchmark of the construction of the invoice outputs by the strategies, validated or trusted.
+
+Usage:
+    python benchmarks/bench_outputs.py --lines 10,1000,50000 --seconds 2
+
+For invoices of each number of lines, measures the time per invoice of building the
+output of the strategy, and of the whole transformation of a record (validation of the
+input, strategy and dump of the output), when the output is validated again by its
+model as before, and when it's built trusting the validated input (`trusted_output`).
+"""
+
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.models.invoice import InvoiceInputBody, InvoiceOutput  # noqa: E402
+from app.models.outputs import trusted_output  # noqa: E402
+from app.services import invoice as invoice_service  # noqa: E402
+from app.services.records import transform_invoice  # noqa: E402
+
+
+def validated_output(model, **values):
+    """Construction of the outputs before `trusted_output`"""
+    return model(**values)
+
+
+def invoice(lines: int) -> dict:
+    return {
+        "company": "B",
+        "invoiceId": "INV1",
+        "invoiceDate": "2025-03-15",
+        "lines": [
+            {"description": f"Office supplies {line}", "amount": line * 1.25}
+            for line in range(lines)
+        ],
+    }
+
+
+def compare(functions: dict, seconds: float, repeat: int = 10) -> dict:
+    """
+    Best seconds per call of each function, timed in turns for about `seconds` in total,
+    so that they're measured under the same load
+    """
+    numbers = {}
+    for name, function in functions.items():
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        numbers[name] = max(1, int(seconds / repeat / len(functions) / elapsed))
+    best = dict.fromkeys(functions, float("inf"))
+    for _ in range(repeat):
+        for name, function in functions.items():
+            elapsed = timeit.timeit(function, number=numbers[name]) / numbers[name]
+            best[name] = min(best[name], elapsed)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", default="10,1000,50000")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(
+        f"{'lines':>7} {'build validated':>16} {'build trusted':>14}"
+        f" {'transform validated':>20} {'transform trusted':>18}"
+    )
+    constructs = {"validated": validated_output, "trusted": trusted_output}
+    for lines in map(int, args.lines.split(",")):
+        body = invoice(lines)
+        invoice_input = InvoiceInputBody.model_validate(body)
+        values = {
+            "invoiceId": invoice_input.invoiceId,
+            "invoiceDate": invoice_input.invoiceDate,
+            "account": "STD-B",
+            "lines": invoice_input.lines,
+        }
+
+        def transform(construct):
+            def run():
+                invoice_service.trusted_output = construct
+                transform_invoice(InvoiceInputBody.model_validate(body))
+
+            return run
+
+        build = compare(
+            {
+                name: (lambda construct=construct: construct(InvoiceOutput, **values))
+                for name, construct in constructs.items()
+            },
+            args.seconds / 4,
+        )
+        transformed = compare(
+            {name: transform(construct) for name, construct in constructs.items()},
+            args.seconds,
+        )
+        invoice_service.trusted_output = trusted_output
+
+        print(
+            f"{lines:>7} {build['validated'] * 1e6:13.1f} us"
+            f" {build['trusted'] * 1e6:11.1f} us"
+            f" {transformed['validated'] * 1000:17.3f} ms"
+            f" {transformed['trusted'] * 1000:15.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark of the throughput and memory of the record processing at scale.
+
+Usage:
+    python benchmarks/bench_scale.py --sizes 10000,1000000,10000000
+
+Processes seeded synthetic datasets (see `app.tools.generate`) of each size in batches
+with `RecordService.process_messages`, writing to a JSONL output file followed by the
+indexes and aggregates, each size in a fresh process. The records are generated while
+they are processed, so the dataset is never held in memory, and reports the processing
+throughput (generation excluded), the peak RSS of the process and the output size.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.records import RecordService  # noqa: E402
+from app.settings import Settings  # noqa: E402
+from app.tools.generate import DatasetConfig, generate_messages  # noqa: E402
+
+
+def run(size: int, batch_size: int, seed: int, results) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_file = os.path.join(tmp_dir, "output.jsonl")
+        records = RecordService(Settings(output_file=output_file))
+        records.warm_up()
+        try:
+            start = time.perf_counter()
+            processing = 0.0
+            errors = 0
+            messages = generate_messages(size, DatasetConfig(seed=seed))
+            while batch := list(islice(messages, batch_size)):
+                batch_start = time.perf_counter()
+                acks = records.process_messages(batch)
+                processing += time.perf_counter() - batch_start
+                errors += sum(ack["status"] != "ok" for ack in acks)
+            records.refresh()
+            elapsed = time.perf_counter() - start
+        finally:
+            records.close()
+
+        results.put(
+            {
+                "records_per_second": size / processing,
+                "seconds": elapsed,
+                "errors": errors,
+                # Kilobytes on Linux
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                / 1024,
+                "output_mb": os.path.getsize(output_file) / 2**20,
+            }
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,1000000,10000000")
+    parser.add_argument("--batch-size", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(
+        f"{'records':>10} {'records/s':>10} {'seconds':>9} {'errors':>7}"
+        f" {'peak RSS MB':>12} {'output MB':>10}"
+    )
+    for size in map(int, args.sizes.split(",")):
+        results = context.Queue()
+        process = context.Process(
+            target=run, args=(size, args.batch_size, args.seed, results)
+        )
+        process.start()
+        result = results.get()
+        process.join()
+        print(
+            f"{size:>10} {result['records_per_second']:10.0f} {result['seconds']:9.1f}"
+            f" {result['errors']:>7} {result['peak_rss_mb']:12.1f}"
+            f" {result['output_mb']:10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of the batch processing throughput from 1 to N worker processes.
+
+Usage:
+    python benchmarks/bench_sharding.py --records 20000 --max-workers 8
+
+Processes batches of synthetic invoices (with many lines to classify) and vendors with
+`RecordService.process_messages`, in the service process and then with 1 to N shard
+workers, writing to the in-memory output backend.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.records import RecordService  # noqa: E402
+from app.settings import Settings  # noqa: E402
+
+DESCRIPTIONS = ["Office supplies", "Beverages - alcohol", "Tobacco", "Snacks", "Paper"]
+
+
+def messages(count: int, lines: int, seed: int = 1) -> list[dict]:
+    rnd = random.Random(seed)
+    batch = []
+    for seq in range(count):
+        company = rnd.choice("AB")
+        if seq % 10 == 0:
+            data = {
+                "company": company,
+                "vendorName": f"Vendor {rnd.randrange(1000)}",
+                "country": rnd.choice(["US", "FR"]),
+                "bank": "Bank X",
+            }
+            batch.append({"seq": seq, "record_type": "vendor", "data": data})
+            continue
+
+        data = {
+            "company": company,
+            "invoiceId": f"INV{seq}",
+            "invoiceDate": f"2025-03-{rnd.randint(1, 28):02d}",
+            "lines": [
+                {"description": rnd.choice(DESCRIPTIONS), "amount": rnd.random() * 100}
+                for _ in range(lines)
+            ],
+        }
+        batch.append({"seq": seq, "record_type": "invoice", "data": data})
+    return batch
+
+
+def throughput(batch: list[dict], workers: int, batch_size: int) -> float:
+    records = RecordService(Settings(output_backend="memory", shard_workers=workers))
+    records.warm_up()
+    try:
+        start = time.perf_counter()
+        for position in range(0, len(batch), batch_size):
+            records.process_messages(batch[position : position + batch_size])
+        return len(batch) / (time.perf_counter() - start)
+    finally:
+        records.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=2_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    batch = messages(args.records, args.lines)
+    baseline = throughput(batch, 0, args.batch_size)
+    print(f"CPUs: {os.cpu_count()}")
+    print(f"{'workers':>8} {'records/s':>12} {'speedup':>8}")
+    print(f"{'in-proc':>8} {baseline:12.0f} {1.0:8.2f}")
+
+    workers = 1
+    while workers <= args.max_workers:
+        result = throughput(batch, workers, args.batch_size)
+        print(f"{workers:>8} {result:12.0f} {result / baseline:8.2f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
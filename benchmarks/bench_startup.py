@@ -0,0 +1,92 @@
+"""
+Benchmark of the service cold start.
+
+Usage:
+    python benchmarks/bench_startup.py
+
+Each measurement runs in a fresh interpreter so nothing is already imported: the time
+to import the app module, to build a service with `create_app`, to report ready, and
+the latency of the first and second requests.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+MEASURE = """
+import json, tempfile, time
+
+start = time.perf_counter()
+from app.main import create_app
+from app.settings import Settings
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+
+output_file = tempfile.mktemp(suffix=".jsonl")
+app = create_app(Settings(output_file=output_file))
+created = time.perf_counter()
+
+vendor = {"company": "A", "vendorName": "Bench Vendor", "country": "US", "bank": "Bench Bank"}
+with TestClient(app) as client:
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.001)
+    ready = time.perf_counter()
+
+    latencies = []
+    for _ in range(2):
+        request_start = time.perf_counter()
+        client.post("/vendor-record", json=vendor)
+        latencies.append(time.perf_counter() - request_start)
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "ready_ms": (ready - created) * 1000,
+    "first_request_ms": latencies[0] * 1000,
+    "second_request_ms": latencies[1] * 1000,
+}))
+"""
+
+IMPORT_RECORD_SERVICE = """
+import json, sys, time
+
+start = time.perf_counter()
+import app.services.records
+print(json.dumps({
+    "import_ms": (time.perf_counter() - start) * 1000,
+    "imports_fastapi": "fastapi" in sys.modules,
+}))
+"""
+
+
+def run_fresh(code: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(runs: int = 5) -> None:
+    results = [run_fresh(MEASURE) for _ in range(runs)]
+    print(f"Service cold start (median of {runs} runs):")
+    for key in results[0]:
+        values = sorted(result[key] for result in results)
+        print(f"  {key:<20} {values[len(values) // 2]:8.1f}")
+
+    records = run_fresh(IMPORT_RECORD_SERVICE)
+    print(
+        f"Record service import (tools and workers): {records['import_ms']:.1f} ms, "
+        f"imports FastAPI: {records['imports_fastapi']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
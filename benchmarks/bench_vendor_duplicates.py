@@ -0,0 +1,79 @@
+"""
+Benchmark of the vendor duplicates index.
+
+Usage:
+    python benchmarks/bench_vendor_duplicates.py --vendors 1000000
+
+Indexes synthetic vendor names (random pronounceable words, often followed by a generic
+business word and a legal suffix), then looks up new names and case variants of the
+indexed ones, reporting the add and lookup latencies and the process memory.
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils.vendor_duplicates import VendorDuplicateIndex  # noqa: E402
+
+SYLLABLES = [c + v for c in "bcdfghjklmnprstvwz" for v in "aeiou"] + [
+    c + v + e for c in "bcdfgklmnprst" for v in "aeiou" for e in "lnrs"
+]
+BUSINESS_WORDS = ["Supplies", "Trading", "Foods", "Logistics", "Partners", "Group"]
+LEGAL_SUFFIXES = ["Ltd", "Inc.", "LLC", "GmbH", "S.A.", ""]
+
+
+def vendor_name(rnd: random.Random) -> str:
+    words = [
+        "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+        for _ in range(rnd.randint(1, 3))
+    ]
+    if rnd.random() < 0.6:
+        words.append(rnd.choice(BUSINESS_WORDS))
+    words.append(rnd.choice(LEGAL_SUFFIXES))
+    return " ".join(words).strip()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return sorted(values)[int(len(values) * fraction)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vendors", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    names = [vendor_name(rnd) for _ in range(args.vendors)]
+    index = VendorDuplicateIndex()
+
+    start = time.perf_counter()
+    for name in names:
+        index.add("A", name)
+    add_seconds = time.perf_counter() - start
+
+    latencies = []
+    flagged = 0
+    for lookup in range(args.lookups):
+        name = rnd.choice(names).upper() if lookup % 2 else vendor_name(rnd)
+        start = time.perf_counter()
+        flagged += bool(index.find("A", name))
+        latencies.append(time.perf_counter() - start)
+
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Indexed vendors:  {len(index)}")
+    print(f"Add:              {add_seconds / args.vendors * 1e6:.1f} us/vendor")
+    print(f"Lookup p50:       {percentile(latencies, 0.5) * 1e6:.1f} us")
+    print(f"Lookup p99:       {percentile(latencies, 0.99) * 1e6:.1f} us")
+    print(f"Flagged lookups:  {flagged}/{args.lookups}")
+    print(f"Max RSS:          {max_rss_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,24 @@
+import os
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 
-from app.main import app
+from app.main import create_app
+from app.settings import Settings
 from app.enums import AppEnum
+from app.utils.file_writer import append_output_to_jsonl
 
+app = create_app(Settings(output_backend="memory"))
 client = TestClient(app)
 
 
-# Mock the file writer to avoid actual file operations during tests
 @pytest.fixture(autouse=True)
-def mock_append_output(monkeypatch):
-    # This will store the calls to the mocked function
-    calls = []
-
-    # Mock
-    def mock_append(company, record_type, data):
-        calls.append({"company": company, "record_type": record_type, "data": data})
-
-    # Set the function to be replaced with the mock
-    monkeypatch.setattr("app.main.append_output_to_jsonl", mock_append)
+def mock_append_output_to_jsonl_calls():
+    """Collect the records written by the in-memory output backend of the test app"""
+    # This will store the calls to the output writer
+    calls = app.state.records.output.records
+    calls.clear()
 
     # Return the calls list, to be used in tests to assert the correct calls were made
     return calls
@@ -28,3 +28,39 @@ def test_root_endpoint():
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": AppEnum.ROOT_ENDPOINT_MSSG}
+
+
+def test_startup_warms_up_before_ready(tmp_path):
+    """Test that the components are loaded from the output file before reporting ready"""
+    output_file = str(tmp_path / "output.jsonl")
+    append_output_to_jsonl(
+        "A",
+        "vendor",
+        {"vendorName": "Mock Warm Vendor", "country": "FR", "bank": "Mock Bank"},
+        output_file=output_file,
+    )
+    startup_app = create_app(Settings(output_file=output_file))
+
+    assert client.get("/ready").status_code == 503
+
+    with TestClient(startup_app) as startup_client:
+        deadline = time.monotonic() + 10
+        while startup_client.get("/ready").status_code != 200:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        response = startup_client.get("/stats/vendor-cache")
+
+    assert response.status_code == 200
+    assert response.json()["entries"] == 1
+    assert response.json()["max_entries"] > 0
+
+    # The aggregates are checkpointed on shutdown
+    assert os.path.exists(f"{output_file}.stats.json")
+
+
+def test_import_doesnt_build_app():
+    """Test that the service is only built by the `create_app` factory"""
+    import app.main
+
+    assert not hasattr(app.main, "app")
@@ -0,0 +1,164 @@
+import gzip
+import json
+import zlib
+
+import msgpack
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.enums import AppEnum
+from app.main import create_app
+from app.settings import Settings
+
+VENDOR = {
+    "company": "A",
+    "vendorName": "Mock Vendor",
+    "country": "US",
+    "bank": "Mock Bank",
+}
+INVOICE = {
+    "company": "A",
+    "invoiceId": "INV1001",
+    "invoiceDate": "2025-03-15",
+    "lines": [{"description": "Beverages - alcohol", "amount": 10.0}],
+}
+
+
+def _client(**settings):
+    return TestClient(create_app(Settings(output_backend="memory", **settings)))
+
+
+def _post(client, url, body, encoding="gzip", content_type="application/json"):
+    return client.post(
+        url,
+        content=body,
+        headers={"Content-Type": content_type, "Content-Encoding": encoding},
+    )
+
+
+def test_compressed_record_endpoints():
+    """Test that gzip and deflate bodies are accepted on the record endpoints"""
+    client = _client()
+
+    response = _post(
+        client, "/vendor-record", gzip.compress(json.dumps(VENDOR).encode())
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = _post(
+        client,
+        "/invoice-record",
+        zlib.compress(json.dumps(INVOICE).encode()),
+        "deflate",
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["data"]["account"] == "ALC-001"
+
+    response = _post(
+        client,
+        "/vendor-record",
+        gzip.compress(msgpack.packb(VENDOR)),
+        content_type="application/msgpack",
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    messages = [{"seq": 1, "record_type": "invoice", "data": INVOICE}]
+    response = _post(
+        client, "/records/batch", gzip.compress(json.dumps(messages).encode())
+    )
+    assert response.json()["acks"][0]["status_code"] == status.HTTP_201_CREATED
+
+    assert len(client.app.state.records.output.records) == 4
+
+
+def test_ndjson_batch_processed_while_decompressing():
+    """Test that an NDJSON batch is processed in chunks as the body is decompressed"""
+    client = _client(batch_chunk_size=10)
+    records = client.app.state.records
+    chunk_sizes = []
+    process_messages = records.process_messages
+
+    def mock_process_messages(messages):
+        chunk_sizes.append(len(messages))
+        return process_messages(messages)
+
+    records.process_messages = mock_process_messages
+    lines = [
+        json.dumps({"seq": seq, "record_type": "vendor", "data": VENDOR})
+        for seq in range(25)
+    ]
+    lines[3] = "not json"
+    body = gzip.compress(("\n".join(lines) + "\n\n").encode())
+
+    response = _post(
+        client, "/records/batch", body, content_type="application/x-ndjson"
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    acks = response.json()["acks"]
+    assert [ack["seq"] for ack in acks] == [0, 1, 2, None] + list(range(4, 25))
+    assert acks[3]["status_code"] == status.HTTP_400_BAD_REQUEST
+    # The records of a chunk are processed per company, apart from the invalid messages
+    assert chunk_sizes == [9, 1, 10, 5]
+    assert len(records.output.records) == 24
+
+
+def test_compressed_body_errors():
+    """Test that the bodies that can't or mustn't be decompressed are rejected"""
+    client = _client(request_max_decompressed_size=1000)
+    body = gzip.compress(json.dumps([VENDOR] * 100).encode())
+
+    for url in ("/vendor-record", "/invoice-record", "/records/batch"):
+        response = _post(client, url, body)
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert response.json()["detail"] == AppEnum.DECOMPRESSED_BODY_TOO_LARGE_MSSG
+
+        response = _post(client, url, b"not gzip")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == AppEnum.INVALID_COMPRESSED_BODY_MSSG
+
+        response = _post(client, url, b"{}", encoding="br")
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+    assert client.app.state.records.output.records == []
+
+
+def test_uncompressed_body_limits():
+    """Test that uncompressed bodies and NDJSON lines are held to the maximum sizes"""
+    client = _client(request_max_decompressed_size=1000, batch_max_line_size=200)
+    body = json.dumps([VENDOR] * 100).encode()
+
+    for url in ("/vendor-record", "/invoice-record", "/records/batch"):
+        response = _post(client, url, body, encoding="identity")
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert response.json()["detail"] == AppEnum.BODY_TOO_LARGE_MSSG
+
+    # Without a Content-Length, the body is checked as it is received
+    response = client.post(
+        "/records/batch",
+        content=iter([body[:600], body[600:]]),
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    message = json.dumps({"record_type": "vendor", "data": VENDOR}).encode()
+    for line in (message + b" " * 200, message + b" " * 200 + b"\n" + message):
+        response = _post(
+            client,
+            "/records/batch",
+            message + b"\n" + line,
+            encoding="identity",
+            content_type="application/x-ndjson",
+        )
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert response.json()["detail"] == AppEnum.BATCH_LINE_TOO_LONG_MSSG
+
+    response = _post(
+        client,
+        "/records/batch",
+        b"\n".join([message] * 3),
+        encoding="identity",
+        content_type="application/x-ndjson",
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["acks"]) == 3
@@ -0,0 +1,80 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.enums import InvoiceEnum
+from app.main import create_app
+from app.settings import Settings
+from app.utils.file_writer import append_output_to_jsonl
+
+
+@pytest.fixture
+def mock_output_file(tmp_path):
+    return str(tmp_path / "output.jsonl")
+
+
+@pytest.fixture
+def client(mock_output_file):
+    """Client of a service exporting from a temporary output file"""
+    settings = Settings(output_file=mock_output_file, export_row_group_size=1)
+    return TestClient(create_app(settings))
+
+
+def test_api_export_invoice_lines(client, mock_output_file):
+    """Test that the export endpoint streams the requested table as CSV"""
+    append_output_to_jsonl(
+        "A",
+        "invoice",
+        {
+            "invoiceId": "INV1001",
+            "invoiceDate": "2025-03-15",
+            "account": "STD-001",
+            "lines": [{"description": "Office supplies", "amount": 150.0}],
+        },
+        output_file=mock_output_file,
+    )
+
+    # The requested row group size is capped by the settings
+    response = client.get(
+        "/export/invoice_lines", params={"company": "A", "row_group_size": 1000}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines() == [
+        "company,invoiceId,lineNumber,description,amount",
+        "A,INV1001,1,Office supplies,150.0",
+    ]
+
+
+def test_api_export_date_range(client, mock_output_file):
+    """Test that the date range is normalized, and rejected when invalid"""
+    for invoice_id, invoice_date in (
+        ("INV1001", "2025-03-15"),
+        ("INV1002", "2025-04-01"),
+    ):
+        append_output_to_jsonl(
+            "A",
+            "invoice",
+            {
+                "invoiceId": invoice_id,
+                "invoiceDate": invoice_date,
+                "account": "STD-001",
+                "lines": [],
+            },
+            output_file=mock_output_file,
+        )
+
+    response = client.get("/export/invoices", params={"date_to": "20250331"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text.splitlines()[1:] == ["A,INV1001,2025-03-15,STD-001,0,0"]
+
+    response = client.get("/export/invoices", params={"date_from": "15/03/2025"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"] == InvoiceEnum.INVOICE_DATE_INVALID_MSSG
+
+
+def test_api_export_unknown_table(client):
+    """Test that the API returns a 422 error when the table doesn't exist"""
+    response = client.get("/export/mock_table")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
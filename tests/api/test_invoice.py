@@ -1,25 +1,22 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import status
-from app.main import app
-from app.enums import AppEnum, InvoiceEnum
+from app.main import create_app
+from app.settings import Settings
+from app.enums import AppEnum, InvoiceEnum, VendorEnum
 
+app = create_app(Settings(output_backend="memory"))
 client = TestClient(app)
 
 
 @pytest.fixture(autouse=True)
-def mock_append_output_to_jsonl_calls(monkeypatch):
-    """Mock the file writer to avoid actual file operations during tests"""
-    # This will store the calls to the mocked function
-    calls = []
-
-    # Mock
-    def mock_append(company, record_type, data):
-        calls.append({"company": company, "record_type": record_type, "data": data})
-
-    # Set the function to be replaced with the mock, keep in mind that mocking functions
-    # has to be where the function is used, not where it is defined
-    monkeypatch.setattr("app.main.append_output_to_jsonl", mock_append)
+def mock_append_output_to_jsonl_calls():
+    """Collect the records written by the in-memory output backend of the test app"""
+    # This will store the calls to the output writer
+    calls = app.state.records.output.records
+    calls.clear()
 
     # Return the calls list, to be used in tests to assert the correct calls were made
     return calls
@@ -135,6 +132,38 @@ def test_api_vendor_company_b_uses_strategy_b(mock_append_output_to_jsonl_calls)
     assert "data" in response_data
 
 
+def test_api_invoice_attaches_cached_vendor(mock_append_output_to_jsonl_calls):
+    """Test that an invoice referencing a processed vendor gets its status and country"""
+    client.post(
+        "/vendor-record",
+        json={
+            "company": "B",
+            "vendorName": "Mock Cached Vendor",
+            "country": "US",
+            "bank": "Mock Bank",
+        },
+    )
+
+    invoice_data = {
+        "company": "B",
+        "invoiceId": "INV1001",
+        "invoiceDate": "2025-03-15",
+        "lines": [{"description": "Mock Line 1", "amount": 100.0}],
+        "other_details": {"vendorName": "Mock Cached Vendor"},
+    }
+    response = client.post("/invoice-record", json=invoice_data)
+
+    vendor = {"country": "US", "vendorStatus": VendorEnum.STATUS_INCOMPLETE}
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["data"]["vendor"] == vendor
+    assert mock_append_output_to_jsonl_calls[1]["data"]["vendor"] == vendor
+
+    # Unknown vendors are not attached
+    invoice_data["other_details"]["vendorName"] = "Mock Unknown Vendor"
+    response = client.post("/invoice-record", json=invoice_data)
+    assert "vendor" not in response.json()["data"]
+
+
 def test_api_internal_server_error(monkeypatch):
     """Test that unexpected exceptions are converted to 500 errors and informs the client"""
 
@@ -144,7 +173,7 @@ def test_api_internal_server_error(monkeypatch):
 
     # Mock the function to raise the exception, use InvoiceStrategyA as an example
     monkeypatch.setattr(
-        "app.services.invoice.InvoiceStrategyA.process_invoice", mock_raise_exception
+        "app.services.invoice.InvoiceStrategyA.account", mock_raise_exception
     )
 
     # Call the endpoint with a valid request body for company A
@@ -164,3 +193,96 @@ def test_api_internal_server_error(monkeypatch):
     # Check the response
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert "Mocked Internal Server Error Exception" in response.json()["detail"]
+
+
+def test_api_invoice_streamed_body(mock_append_output_to_jsonl_calls):
+    """Test that a body received in small chunks, with the lines first, is processed"""
+    lines = [{"description": f"Mock Line {i}", "amount": i} for i in range(500)]
+    lines[250]["description"] = "Beverages - Alcohol"
+    lines[400]["description"] = "Tobacco"
+    body = json.dumps(
+        {"lines": lines, "company": "B", "invoiceId": "INV1", "invoiceDate": "20250315"}
+    ).encode()
+
+    response = client.post(
+        "/invoice-record",
+        content=(body[i : i + 7] for i in range(0, len(body), 7)),
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()["data"]
+    assert data["account"] == InvoiceEnum.ACCOUNT_MULTI_B
+    assert data["invoiceDate"] == "2025-03-15"
+    assert data["lines"][:2] == [
+        {"description": "Mock Line 0", "amount": 0.0},
+        {"description": "Mock Line 1", "amount": 1.0},
+    ]
+    assert mock_append_output_to_jsonl_calls[0]["data"] == data
+
+
+def test_api_invoice_line_errors(mock_append_output_to_jsonl_calls):
+    """Test that the invalid lines and bodies are reported with a 422 error"""
+    invoice_data = {
+        "company": "A",
+        "invoiceId": "INV1001",
+        "invoiceDate": "2025-03-15",
+        "lines": [{"description": "Mock Line 1", "amount": 100.0}, {"amount": "x"}],
+    }
+    response = client.post("/invoice-record", json=invoice_data)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["errors"] == {
+        "lines.1.description": ["Field required"],
+        "lines.1.amount": [
+            "Input should be a valid number, unable to parse string as a number"
+        ],
+    }
+
+    response = client.post("/invoice-record", content=b'{"company": "A", "lines": [')
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"] == AppEnum.INVALID_BODY_MSSG
+    assert len(mock_append_output_to_jsonl_calls) == 0
+
+
+def test_api_invoice_limits():
+    """Test that the invoices over the body size or lines limits are rejected with a 413 error"""
+    limited_client = TestClient(
+        create_app(
+            Settings(
+                output_backend="memory", invoice_max_body_size=1000, invoice_max_lines=3
+            )
+        )
+    )
+    invoice_data = {
+        "company": "A",
+        "invoiceId": "INV1001",
+        "invoiceDate": "2025-03-15",
+        "lines": [{"description": "Mock Line", "amount": 1.0}] * 4,
+    }
+    response = limited_client.post("/invoice-record", json=invoice_data)
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert response.json()["detail"] == InvoiceEnum.INVOICE_TOO_MANY_LINES_MSSG
+
+    invoice_data["lines"] = [{"description": "Mock Line" * 50, "amount": 1.0}] * 3
+    body = json.dumps(invoice_data).encode()
+    response = limited_client.post("/invoice-record", content=body)
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert response.json()["detail"] == InvoiceEnum.INVOICE_BODY_TOO_LARGE_MSSG
+
+    # Without a content length, the body is rejected once the limit is reached
+    response = limited_client.post(
+        "/invoice-record", content=(body[i : i + 100] for i in range(0, len(body), 100))
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert limited_client.app.state.records.output.records == []
+
+
+def test_api_invoice_openapi_body():
+    """Test that the streamed invoice body is still documented in the OpenAPI schema"""
+    operation = client.get("/openapi.json").json()["paths"]["/invoice-record"]["post"]
+    schema = operation["requestBody"]["content"]["application/json"]["schema"]
+    assert schema["required"] == ["company", "invoiceId", "invoiceDate", "lines"]
+    assert schema["properties"]["lines"]["items"]["required"] == [
+        "description",
+        "amount",
+    ]
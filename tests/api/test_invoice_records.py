@@ -0,0 +1,67 @@
+import json
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.enums import InvoiceEnum
+from app.main import create_app
+from app.settings import Settings
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Client of a service writing the records to a temporary output file"""
+    settings = Settings(output_file=str(tmp_path / "output.jsonl"))
+    return TestClient(create_app(settings))
+
+
+def _post_invoice(client, invoice_id, invoice_date):
+    return client.post(
+        "/invoice-record",
+        json={
+            "company": "A",
+            "invoiceId": invoice_id,
+            "invoiceDate": invoice_date,
+            "lines": [{"description": "Mock Line", "amount": 100.0}],
+        },
+    )
+
+
+def test_api_invoice_records_date_range(client):
+    """Test that the invoices within the date range are streamed as NDJSON"""
+    _post_invoice(client, "INV1001", "2025-03-15")
+    # Dates are normalized on ingestion
+    _post_invoice(client, "INV1002", "2025-03-16T09:00:00")
+    _post_invoice(client, "INV1003", "2025-04-01")
+
+    response = client.get(
+        "/invoice-records", params={"from": "2025-03-16", "to": "20250401"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["data"]["invoiceId"] for record in records] == [
+        "INV1002",
+        "INV1003",
+    ]
+    assert records[0]["data"]["invoiceDate"] == "2025-03-16"
+
+
+def test_api_invoice_records_invalid_range(client):
+    """Test that the API returns a 422 error when a range bound isn't a date"""
+    response = client.get("/invoice-records", params={"from": "mock_date"})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert InvoiceEnum.INVOICE_DATE_INVALID_MSSG in response.json()["detail"]
+
+
+def test_api_invoice_invalid_date(client):
+    """Test that the API returns a 422 error when the invoice date can't be parsed"""
+    response = _post_invoice(client, "INV1001", "mock_date")
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert InvoiceEnum.INVOICE_DATE_INVALID_MSSG in str(
+        response.json()["errors"]["invoiceDate"]
+    )
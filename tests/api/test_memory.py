@@ -0,0 +1,115 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.enums import AppEnum
+from app.main import create_app
+from app.settings import Settings
+
+VENDOR_BODY = {
+    "company": "A",
+    "vendorName": "Mock Vendor Name",
+    "country": "FR",
+    "bank": "Mock Bank",
+}
+INVOICE_BODY = {
+    "company": "B",
+    "invoiceId": "INV1",
+    "invoiceDate": "2025-03-15",
+    "lines": [{"description": "Tobacco", "amount": 10.0}],
+}
+
+
+@pytest.fixture
+def client():
+    """Client of a service measuring the allocations of every request"""
+    app = create_app(
+        Settings(output_backend="memory", memory_profiling=True, memory_sample_rate=1.0)
+    )
+    with TestClient(app) as client:
+        yield client
+
+
+def test_memory_snapshots_diff(client):
+    """Test diffing the snapshots taken before and after processing records"""
+    first = client.post("/admin/memory/snapshots")
+    assert first.status_code == 201
+    assert first.json()["traced_bytes"] > 0
+
+    for seq in range(50):
+        client.post("/vendor-record", json={**VENDOR_BODY, "vendorName": f"V{seq}"})
+    second = client.post("/admin/memory/snapshots").json()
+    assert second["snapshots"] == [first.json()["id"], second["id"]]
+
+    response = client.get(f"/admin/memory/snapshots/{second['id']}/diff")
+    assert response.status_code == 200
+    diff = response.json()
+    assert diff["base"] == first.json()["id"]
+    assert diff["group_by"] == "module"
+    assert any(site["site"].startswith("app.") for site in diff["sites"])
+
+    response = client.get(
+        f"/admin/memory/snapshots/{second['id']}/diff",
+        params={"group_by": "line", "limit": 3},
+    )
+    sites = response.json()["sites"]
+    assert 0 < len(sites) <= 3
+    assert all(site["site"].startswith("app/") for site in sites)
+
+    # Without a base, all the allocations of the snapshot are reported
+    response = client.get(f"/admin/memory/snapshots/{first.json()['id']}/diff")
+    assert response.json()["base"] is None
+    assert response.json()["size_diff"] > 0
+
+
+def test_memory_snapshot_not_found(client):
+    response = client.get("/admin/memory/snapshots/42/diff")
+    assert response.status_code == 404
+    assert response.json()["detail"] == AppEnum.MEMORY_SNAPSHOT_NOT_FOUND_MSSG
+
+
+def test_memory_request_stats(client):
+    """Test the allocations of the sampled requests per endpoint and company"""
+    client.post("/vendor-record", json=VENDOR_BODY)
+    client.post("/vendor-record", json=VENDOR_BODY)
+    client.post("/invoice-record", json=INVOICE_BODY)
+    client.get("/unknown-path")
+
+    stats = client.get("/admin/memory/requests").json()
+    assert stats["sample_rate"] == 1.0
+    requests = {
+        (request["endpoint"], request["company"]): request
+        for request in stats["requests"]
+    }
+    assert requests["/vendor-record", "A"]["sampled_requests"] == 2
+    assert requests["/invoice-record", "B"]["sampled_requests"] == 1
+    assert requests["<unmatched>", None]["sampled_requests"] == 1
+    assert requests["/vendor-record", "A"]["max_peak_bytes"] > 0
+
+
+def test_memory_sample_rate(client):
+    """Test tuning the sampling of the requests"""
+    response = client.put("/admin/memory/sampling", params={"rate": 0})
+    assert response.json() == {"sample_rate": 0}
+
+    client.post("/vendor-record", json=VENDOR_BODY)
+    endpoints = [
+        request["endpoint"]
+        for request in client.get("/admin/memory/requests").json()["requests"]
+    ]
+    assert endpoints == ["/admin/memory/sampling"]
+
+    response = client.put("/admin/memory/sampling", params={"rate": 2})
+    assert response.status_code == 422
+
+
+def test_memory_profiling_disabled():
+    """Test that the memory endpoints are unavailable unless memory profiling is enabled"""
+    with TestClient(create_app(Settings(output_backend="memory"))) as client:
+        for response in (
+            client.post("/admin/memory/snapshots"),
+            client.get("/admin/memory/snapshots/1/diff"),
+            client.get("/admin/memory/requests"),
+            client.put("/admin/memory/sampling", params={"rate": 0.5}),
+        ):
+            assert response.status_code == 409
+            assert response.json()["detail"] == AppEnum.MEMORY_PROFILING_DISABLED_MSSG
@@ -0,0 +1,110 @@
+import msgpack
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.enums import AppEnum, InvoiceEnum
+from app.main import create_app
+from app.settings import Settings
+
+app = create_app(Settings(output_backend="memory"))
+client = TestClient(app)
+
+MSGPACK_HEADERS = {
+    "Content-Type": "application/msgpack",
+    "Accept": "application/msgpack",
+}
+VENDOR = {
+    "company": "A",
+    "vendorName": "Mock Vendor",
+    "country": "FR",
+    "bank": "Mock Bank",
+}
+INVOICE = {
+    "company": "B",
+    "invoiceId": "INV1001",
+    "invoiceDate": "2025-03-15",
+    "lines": [
+        {"description": "Tobacco", "amount": 100},
+        {"description": "Beverages - alcohol", "amount": 200.5},
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def output_records():
+    """Records written by the in-memory output backend of the test app"""
+    records = app.state.records.output.records
+    records.clear()
+    return records
+
+
+def _post_msgpack(url, body, headers=MSGPACK_HEADERS):
+    return client.post(url, content=msgpack.packb(body), headers=headers)
+
+
+def test_vendor_record_msgpack(output_records):
+    """Test that a MessagePack vendor is validated and answered like a JSON one"""
+    response = _post_msgpack("/vendor-record", VENDOR)
+    json_response = client.post("/vendor-record", json=VENDOR)
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == json_response.json()
+    assert output_records[0] == output_records[1]
+
+
+def test_invoice_record_msgpack(output_records):
+    """Test that a MessagePack invoice is processed like a JSON one"""
+    response = _post_msgpack("/invoice-record", INVOICE)
+
+    assert response.status_code == status.HTTP_201_CREATED
+    data = msgpack.unpackb(response.content)["data"]
+    assert data["account"] == InvoiceEnum.ACCOUNT_MULTI_B
+    assert data["lines"][0] == {"description": "Tobacco", "amount": 100.0}
+    assert output_records[0]["data"] == data
+
+
+def test_formats_negotiated_independently():
+    """Test that the request and response formats are chosen independently"""
+    response = _post_msgpack(
+        "/invoice-record", INVOICE, {"Content-Type": "application/x-msgpack"}
+    )
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["data"]["account"] == InvoiceEnum.ACCOUNT_MULTI_B
+
+    response = client.post(
+        "/records/batch",
+        json=[{"seq": 1, "record_type": "vendor", "data": VENDOR}],
+        headers={"Accept": "application/msgpack"},
+    )
+    assert msgpack.unpackb(response.content)["acks"] == [
+        {"seq": 1, "status": "ok", "status_code": 201}
+    ]
+
+
+def test_errors_msgpack(output_records):
+    """Test that the errors are reported in MessagePack to the clients asking for it"""
+    response = _post_msgpack("/vendor-record", {**VENDOR, "company": "Z"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert msgpack.unpackb(response.content) == {"detail": AppEnum.UNKNOWN_COMPANY_MSSG}
+
+    response = _post_msgpack("/vendor-record", {"company": "A"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert msgpack.unpackb(response.content)["errors"]["bank"] == ["Field required"]
+
+    response = client.post("/vendor-record", content=b"\xc1", headers=MSGPACK_HEADERS)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.headers["content-type"] == "application/msgpack"
+
+    response = _post_msgpack("/invoice-record", {**INVOICE, "lines": [{}]})
+    assert msgpack.unpackb(response.content)["errors"]["lines.0.amount"] == [
+        "Field required"
+    ]
+
+    for body in (b"\xc1", msgpack.packb([INVOICE])):
+        response = client.post("/invoice-record", content=body, headers=MSGPACK_HEADERS)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert msgpack.unpackb(response.content)["detail"] == AppEnum.INVALID_BODY_MSSG
+
+    assert output_records == []
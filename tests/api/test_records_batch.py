@@ -0,0 +1,87 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.enums import AppEnum
+from app.main import create_app
+from app.settings import Settings
+
+app = create_app(Settings(output_backend="memory"))
+client = TestClient(app)
+
+
+def test_api_records_batch():
+    """Test that a batch of records is processed and acknowledged in order"""
+    vendor_data = {
+        "company": "A",
+        "vendorName": "Mock Vendor Name",
+        "country": "Mock Country",
+        "bank": "Mock Bank",
+    }
+
+    response = client.post(
+        "/records/batch",
+        json=[
+            {"seq": 1, "record_type": "vendor", "data": vendor_data},
+            {
+                "seq": 2,
+                "record_type": "vendor",
+                "data": {**vendor_data, "company": "C"},
+            },
+        ],
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [(ack["seq"], ack["status_code"]) for ack in response.json()["acks"]] == [
+        (1, status.HTTP_201_CREATED),
+        (2, status.HTTP_404_NOT_FOUND),
+    ]
+    assert len(app.state.records.output.records) == 1
+
+
+def test_api_records_batch_not_a_list():
+    """Test that the API returns a 422 error when the batch isn't a list of messages"""
+    response = client.post("/records/batch", json={"seq": 1})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"] == AppEnum.INVALID_BATCH_MSSG
+
+    response = client.post("/records/batch", content=b"[not json")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_api_records_batch_company_error(monkeypatch):
+    """Test that an error writing the records of a company only fails their acks"""
+    process_messages = app.state.records.process_messages
+
+    def mock_process_messages(messages):
+        if messages[0]["data"]["company"] == "B":
+            raise OSError("Mocked write error")
+        return process_messages(messages)
+
+    monkeypatch.setattr(app.state.records, "process_messages", mock_process_messages)
+    vendor_data = {
+        "company": "A",
+        "vendorName": "Mock Vendor Name",
+        "country": "Mock Country",
+        "bank": "Mock Bank",
+    }
+    app.state.records.output.records.clear()
+
+    response = client.post(
+        "/records/batch",
+        json=[
+            {"seq": 1, "record_type": "vendor", "data": vendor_data},
+            {
+                "seq": 2,
+                "record_type": "vendor",
+                "data": {**vendor_data, "company": "B"},
+            },
+        ],
+    )
+
+    acks = response.json()["acks"]
+    assert [(ack["seq"], ack["status_code"]) for ack in acks] == [
+        (1, status.HTTP_201_CREATED),
+        (2, status.HTTP_500_INTERNAL_SERVER_ERROR),
+    ]
+    assert acks[1]["detail"] == "Mocked write error"
+    assert len(app.state.records.output.records) == 1
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.enums import AppEnum
+from app.main import create_app
+from app.models.vendor import VendorInputBody
+from app.settings import Settings
+
+VENDOR_DATA = {
+    "company": "A",
+    "vendorName": "Mock Vendor Name",
+    "country": "Mock Country",
+    "bank": "Mock Bank",
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    return create_app(Settings(output_file=str(tmp_path / "output.jsonl")))
+
+
+def _write_then_close(records, vendor_names):
+    """Once a consumer is subscribed, process vendors and end the streams"""
+
+    def target():
+        deadline = time.monotonic() + 10
+        while not len(records.record_feed) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for vendor_name in vendor_names:
+            records.process_vendor(
+                VendorInputBody(**{**VENDOR_DATA, "vendorName": vendor_name})
+            )
+        records.close()
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+
+def test_api_records_stream_ndjson(app):
+    """Test that the records are replayed from the offset, then streamed as written"""
+    client = TestClient(app)
+    client.post("/vendor-record", json={**VENDOR_DATA, "vendorName": "V1"})
+    client.post("/vendor-record", json={**VENDOR_DATA, "vendorName": "V2"})
+
+    writer = _write_then_close(app.state.records, ["V3"])
+    response = client.get("/records/stream", params={"since": 0})
+    writer.join()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["record"]["data"]["vendorName"] for event in events] == [
+        "V1",
+        "V2",
+        "V3",
+    ]
+    assert events[-1]["offset"] == app.state.records.record_feed.offset
+
+    # Resuming from an event offset skips the records already received
+    writer = _write_then_close(app.state.records, [])
+    response = client.get("/records/stream", params={"since": events[0]["offset"]})
+    writer.join()
+    assert [json.loads(line)["offset"] for line in response.text.splitlines()] == [
+        event["offset"] for event in events[1:]
+    ]
+
+
+def test_api_records_stream_sse(app):
+    """Test that the records are streamed as Server-Sent Events resuming from Last-Event-ID"""
+    client = TestClient(app)
+    client.post("/vendor-record", json={**VENDOR_DATA, "vendorName": "V1"})
+    first_end = app.state.records.record_feed.offset
+
+    writer = _write_then_close(app.state.records, ["V2"])
+    response = client.get(
+        "/records/stream",
+        headers={"Accept": "text/event-stream", "Last-Event-ID": str(first_end)},
+    )
+    writer.join()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    [event] = response.text.split("\n\n")[:-1]
+    event_id, data = event.split("\n")
+    assert event_id == f"id: {app.state.records.record_feed.offset}"
+    assert json.loads(data.removeprefix("data: "))["data"]["vendorName"] == "V2"
+
+
+@pytest.mark.parametrize("since", ["1", "1000"])
+def test_api_records_stream_invalid_offset(app, since):
+    """Test that the API returns a 422 error when the offset isn't the start of a record"""
+    client = TestClient(app)
+    client.post("/vendor-record", json=VENDOR_DATA)
+
+    response = client.get("/records/stream", params={"since": since})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"] == AppEnum.STREAM_OFFSET_INVALID_MSSG
+
+    response = client.get(
+        "/records/stream",
+        headers={"Accept": "text/event-stream", "Last-Event-ID": "mock_id"},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
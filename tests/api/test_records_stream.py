@@ -0,0 +1,137 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.enums import AppEnum
+from app.main import create_app
+from app.settings import Settings
+
+VENDOR_DATA = {
+    "company": "A",
+    "vendorName": "Mock Vendor Name",
+    "country": "Mock Country",
+    "bank": "Mock Bank",
+}
+
+INVOICE_DATA = {
+    "company": "B",
+    "invoiceId": "INV1001",
+    "invoiceDate": "2025-03-15",
+    "lines": [{"description": "Mock Line 1", "amount": 100.0}],
+}
+
+
+def _stream_app(**overrides):
+    """Service with an in-memory output and small windows to exercise the flow control"""
+    settings = dict(
+        output_backend="memory",
+        ws_credit_window=4,
+        ws_ack_batch_size=2,
+        ws_ack_flush_interval=0.01,
+    )
+    return create_app(Settings(**{**settings, **overrides}))
+
+
+def test_ws_records_acks_in_batches():
+    """Test that records are processed and acknowledged in batches that grant back credit"""
+    app = _stream_app()
+    client = TestClient(app)
+    with client.websocket_connect("/ws/records") as websocket:
+        assert websocket.receive_json() == {"type": "credit", "credit": 4}
+
+        websocket.send_json({"seq": 1, "record_type": "vendor", "data": VENDOR_DATA})
+        websocket.send_json({"seq": 2, "record_type": "invoice", "data": INVOICE_DATA})
+        batch = websocket.receive_json()
+
+        assert batch["type"] == "ack"
+        assert batch["credit"] == 2
+        assert [ack["seq"] for ack in batch["acks"]] == [1, 2]
+        assert {ack["status"] for ack in batch["acks"]} == {"ok"}
+
+        # A partial batch is flushed once no more messages arrive
+        websocket.send_json({"seq": 3, "record_type": "vendor", "data": VENDOR_DATA})
+        batch = websocket.receive_json()
+        assert [ack["seq"] for ack in batch["acks"]] == [3]
+
+    assert [call["record_type"] for call in app.state.records.output.records] == [
+        "vendor",
+        "invoice",
+        "vendor",
+    ]
+
+
+def test_ws_records_error_acks(monkeypatch):
+    """Test that invalid messages are acknowledged with an error and the stream goes on"""
+
+    def mock_raise_exception(*args, **kwargs):
+        raise Exception("Mocked Internal Server Error Exception")
+
+    monkeypatch.setattr(
+        "app.services.invoice.InvoiceStrategyB.process_invoice", mock_raise_exception
+    )
+    app = _stream_app(ws_credit_window=10, ws_ack_batch_size=6)
+    client = TestClient(app)
+
+    with client.websocket_connect("/ws/records") as websocket:
+        websocket.receive_json()
+        websocket.send_text("mock invalid json")
+        websocket.send_text("[1]")
+        websocket.send_json({"seq": 2, "record_type": "mock_type", "data": {}})
+        websocket.send_json({"seq": 3, "record_type": "vendor", "data": {}})
+        websocket.send_json(
+            {"seq": 4, "record_type": "vendor", "data": {**VENDOR_DATA, "company": "C"}}
+        )
+        websocket.send_json({"seq": 5, "record_type": "invoice", "data": INVOICE_DATA})
+        acks = websocket.receive_json()["acks"]
+
+    assert [(ack["seq"], ack["status_code"]) for ack in acks] == [
+        (None, status.HTTP_400_BAD_REQUEST),
+        (None, status.HTTP_400_BAD_REQUEST),
+        (2, status.HTTP_422_UNPROCESSABLE_ENTITY),
+        (3, status.HTTP_422_UNPROCESSABLE_ENTITY),
+        (4, status.HTTP_404_NOT_FOUND),
+        (5, status.HTTP_500_INTERNAL_SERVER_ERROR),
+    ]
+    assert acks[0]["detail"] == AppEnum.INVALID_MESSAGE_MSSG
+    assert acks[2]["detail"] == AppEnum.UNKNOWN_RECORD_TYPE_MSSG
+    assert "vendorName" in acks[3]["errors"]
+    assert acks[4]["detail"] == AppEnum.UNKNOWN_COMPANY_MSSG
+    assert acks[5]["detail"] == "Mocked Internal Server Error Exception"
+    assert len(app.state.records.output.records) == 0
+
+
+def test_ws_records_binary_frames():
+    """Test that messages sent in binary frames are processed like text ones"""
+    app = _stream_app()
+    client = TestClient(app)
+
+    with client.websocket_connect("/ws/records") as websocket:
+        websocket.receive_json()
+        websocket.send_json(
+            {"seq": 1, "record_type": "vendor", "data": VENDOR_DATA}, mode="binary"
+        )
+        websocket.send_bytes(b"\xff")
+        acks = websocket.receive_json()["acks"]
+
+    assert [(ack["seq"], ack["status_code"]) for ack in acks] == [
+        (1, status.HTTP_201_CREATED),
+        (None, status.HTTP_400_BAD_REQUEST),
+    ]
+    assert len(app.state.records.output.records) == 1
+
+
+def test_ws_records_credit_exceeded():
+    """Test that a producer sending beyond its credit window is disconnected"""
+    client = TestClient(_stream_app(ws_credit_window=1, ws_ack_flush_interval=10))
+
+    with client.websocket_connect("/ws/records") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"seq": 1, "record_type": "vendor", "data": VENDOR_DATA})
+        websocket.send_json({"seq": 2, "record_type": "vendor", "data": VENDOR_DATA})
+
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+
+    assert exc_info.value.code == 1008
+    assert exc_info.value.reason == AppEnum.CREDIT_EXCEEDED_MSSG
@@ -0,0 +1,145 @@
+import json
+import logging
+
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.settings import Settings
+from app.utils.request_log import RequestLog, access_logger
+
+VENDOR_BODY = {
+    "company": "A",
+    "vendorName": "Mock Vendor Name",
+    "country": "FR",
+    "bank": "Mock Bank",
+}
+INVOICE_BODY = {
+    "company": "B",
+    "invoiceId": "INV1",
+    "invoiceDate": "2025-03-15",
+    "lines": [{"description": "Tobacco", "amount": 10.0}],
+}
+
+
+def _run(tmp_path, sample_rate, requests) -> dict:
+    """Run requests against a service, returning its logs by logger"""
+    log_file = tmp_path / "service.log"
+    settings = Settings(
+        output_backend="memory",
+        request_log=True,
+        log_file=str(log_file),
+        log_sample_rate=sample_rate,
+    )
+    with TestClient(create_app(settings)) as client:
+        requests(client)
+
+    logs = {"app.access": [], "app.audit": []}
+    for line in log_file.read_text().splitlines():
+        log = json.loads(line)
+        logs[log.pop("logger")].append(log)
+    return logs
+
+
+def test_access_and_audit_logs(tmp_path):
+    """Test the structured logs of the record endpoints"""
+
+    def requests(client):
+        client.post("/vendor-record", json=VENDOR_BODY)
+        client.post("/invoice-record", json=INVOICE_BODY)
+        client.get("/")
+
+    logs = _run(tmp_path, 1.0, requests)
+
+    vendor, invoice, root = logs["app.access"]
+    assert vendor["event"] == "request"
+    assert vendor["method"] == "POST"
+    assert vendor["path"] == "/vendor-record"
+    assert vendor["status_code"] == 201
+    assert (vendor["company"], vendor["record_type"], vendor["record_key"]) == (
+        "A",
+        "vendor",
+        "Mock Vendor Name",
+    )
+    assert set(vendor["stages_ms"]) == {"process", "duplicates"}
+    assert vendor["duration_ms"] >= sum(vendor["stages_ms"].values())
+    assert (invoice["company"], invoice["record_key"]) == ("B", "INV1")
+    assert set(invoice["stages_ms"]) == {"receive", "validate", "write"}
+    assert root["company"] is None and root["stages_ms"] == {}
+
+    assert [
+        (log["event"], log["company"], log["record_type"], log["record_key"])
+        for log in logs["app.audit"]
+    ] == [
+        ("record", "A", "vendor", "Mock Vendor Name"),
+        ("record", "B", "invoice", "INV1"),
+    ]
+    assert "time" in logs["app.audit"][0]
+
+
+def test_errors_always_logged(tmp_path):
+    """Test that only the errors are logged without sampling"""
+
+    def requests(client):
+        client.post("/vendor-record", json=VENDOR_BODY)
+        client.post("/vendor-record", json={**VENDOR_BODY, "company": "C"})
+        client.post("/vendor-record", json={"company": "A"})
+
+    logs = _run(tmp_path, 0, requests)
+
+    assert [(log["status_code"], log["company"]) for log in logs["app.access"]] == [
+        (404, "C"),
+        (422, None),
+    ]
+    assert [(log["status_code"], log["company"]) for log in logs["app.audit"]] == [
+        (404, "C")
+    ]
+
+
+def test_batch_audit_logs(tmp_path):
+    """Test the audit logs of the records of a batch"""
+
+    def requests(client):
+        client.post(
+            "/records/batch",
+            json=[
+                {"seq": 1, "record_type": "vendor", "data": VENDOR_BODY},
+                {"seq": 2, "record_type": "invoice", "data": INVOICE_BODY},
+                "not a message",
+            ],
+        )
+
+    logs = _run(tmp_path, 1.0, requests)
+
+    assert [
+        (log["company"], log["record_type"], log["record_key"], log["status_code"])
+        for log in logs["app.audit"]
+    ] == [
+        ("A", "vendor", "Mock Vendor Name", 201),
+        ("B", "invoice", "INV1", 201),
+        (None, None, None, 400),
+    ]
+    (access,) = logs["app.access"]
+    assert access["record_type"] is None
+    assert set(access["stages_ms"]) == {"process"}
+
+
+def test_full_queue_dropped():
+    """Test that the log records are dropped rather than blocking on a full queue"""
+    request_log = RequestLog(queue_size=1, handler=logging.NullHandler())
+    access_logger.setLevel(logging.INFO)
+    access_logger.addHandler(request_log.queue_handler)
+    try:
+        for _ in range(3):
+            request_log.access({"status_code": 500})
+    finally:
+        access_logger.removeHandler(request_log.queue_handler)
+
+    assert request_log.queue_handler.queue.qsize() == 1
+    assert request_log.queue_handler.dropped == 2
+
+
+def test_request_log_disabled_by_default():
+    app = create_app(Settings(output_backend="memory"))
+    assert app.state.request_log is None
+    with TestClient(app) as client:
+        assert client.post("/records/batch", json=[]).json() == {"acks": []}
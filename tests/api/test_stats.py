@@ -0,0 +1,72 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.settings import Settings
+from app.utils.file_writer import append_output_to_jsonl
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Client of a service writing the records to a temporary output file"""
+    settings = Settings(output_file=str(tmp_path / "output.jsonl"))
+    return TestClient(create_app(settings))
+
+
+def test_api_invoice_stats_are_updated_on_write(client):
+    """Test that the stats endpoint reflects the invoices processed so far"""
+    for invoice_id in ("INV1001", "INV1002"):
+        client.post(
+            "/invoice-record",
+            json={
+                "company": "A",
+                "invoiceId": invoice_id,
+                "invoiceDate": "2025-03-15",
+                "lines": [
+                    {"description": "Beverages - alcohol", "amount": 200.0},
+                    {"description": "Office supplies", "amount": 150.0},
+                ],
+            },
+        )
+
+    response = client.get("/stats/invoices", params={"company": "A"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "aggregates": [
+            {
+                "company": "A",
+                "account": "ALC-001",
+                "month": "2025-03",
+                "count": 2,
+                "totalAmount": 700.0,
+                "minAmount": 350.0,
+                "maxAmount": 350.0,
+            }
+        ],
+        "skipped": 0,
+    }
+
+
+def test_api_invoice_stats_skipped(client):
+    """Test that the invoices whose date can't be parsed are counted as skipped"""
+    invoice = {
+        "invoiceId": "INV1001",
+        "invoiceDate": "not a date",
+        "account": "STD-001",
+        "lines": [{"description": "Mock Line", "amount": 100.0}],
+    }
+    append_output_to_jsonl(
+        "A", "invoice", invoice, output_file=client.app.state.settings.output_file
+    )
+
+    response = client.get("/stats/invoices")
+
+    assert response.json() == {"aggregates": [], "skipped": 1}
+
+
+def test_api_invoice_stats_invalid_month(client):
+    """Test that the API returns a 422 error when the month isn't in YYYY-MM format"""
+    response = client.get("/stats/invoices", params={"month": "March"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -1,25 +1,20 @@
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import status
-from app.main import app
+from app.main import create_app
+from app.settings import Settings
 from app.enums import AppEnum
 
+app = create_app(Settings(output_backend="memory"))
 client = TestClient(app)
 
 
 @pytest.fixture(autouse=True)
-def mock_append_output_to_jsonl_calls(monkeypatch):
-    """Mock the file writer to avoid actual file operations during tests"""
-    # This will store the calls to the mocked function
-    calls = []
-
-    # Mock
-    def mock_append(company, record_type, data):
-        calls.append({"company": company, "record_type": record_type, "data": data})
-
-    # Set the function to be replaced with the mock, keep in mind that mocking functions
-    # has to be where the function is used, not where it is defined
-    monkeypatch.setattr("app.main.append_output_to_jsonl", mock_append)
+def mock_append_output_to_jsonl_calls():
+    """Collect the records written by the in-memory output backend of the test app"""
+    # This will store the calls to the output writer
+    calls = app.state.records.output.records
+    calls.clear()
 
     # Return the calls list, to be used in tests to assert the correct calls were made
     return calls
@@ -107,6 +102,31 @@ def test_api_vendor_company_b_uses_strategy_b(mock_append_output_to_jsonl_calls)
     assert "data" in response_data
 
 
+def test_api_vendor_flags_duplicates(mock_append_output_to_jsonl_calls):
+    """Test that the vendors likely to duplicate a processed vendor are flagged"""
+    vendor_data = {
+        "company": "A",
+        "vendorName": "Mock Duplicate Supplies Ltd.",
+        "country": "US",
+        "bank": "Mock Bank",
+    }
+
+    response = client.post("/vendor-record", json=vendor_data)
+    assert response.json()["duplicates"] == []
+
+    response = client.post(
+        "/vendor-record",
+        json={**vendor_data, "vendorName": "MOCK DUPLICATE SUPPLIES LIMITED"},
+    )
+
+    # The vendor is processed anyway, the duplicates are only flagged
+    assert response.status_code == status.HTTP_201_CREATED
+    assert len(mock_append_output_to_jsonl_calls) == 2
+    assert response.json()["duplicates"] == [
+        {"vendorName": "Mock Duplicate Supplies Ltd.", "score": 1.0}
+    ]
+
+
 def test_api_internal_server_error(monkeypatch):
     """Test that unexpected exceptions are converted to 500 errors and informs the client"""
 
@@ -133,3 +153,24 @@ def test_api_internal_server_error(monkeypatch):
     # Check the response
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert "Mocked Internal Server Error Exception" in response.json()["detail"]
+
+
+def test_api_write_error(monkeypatch):
+    """Test that an error processing the batch of a record is reported as a 500 error"""
+
+    def mock_raise_exception(vendor_inputs):
+        raise OSError("Mocked write error")
+
+    monkeypatch.setattr(app.state.records, "process_vendors", mock_raise_exception)
+    response = client.post(
+        "/vendor-record",
+        json={
+            "company": "A",
+            "vendorName": "Mock Vendor Name",
+            "country": "Mock Country",
+            "bank": "Mock Bank",
+        },
+    )
+
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert response.json()["detail"] == "Mocked write error"
@@ -0,0 +1,4 @@
+import os
+
+# Fully validate the outputs of the strategies, in the shard workers too
+os.environ.setdefault("MIDDLEWARE_STRICT_OUTPUTS", "true")
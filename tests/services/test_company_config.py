@@ -0,0 +1,214 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.enums import InvoiceEnum, VendorEnum
+from app.main import create_app
+from app.services.company_config import (
+    DEFAULT_COMPANIES,
+    CompanyConfigStore,
+    active_config,
+    compile_accounts,
+    parse_config,
+    using_config,
+)
+from app.services.records import RecordService
+from app.settings import Settings
+
+VENDOR = {
+    "company": "A",
+    "vendorName": "Mock Vendor",
+    "country": "FR",
+    "bank": "Mock Bank",
+}
+INVOICE = {
+    "company": "B",
+    "invoiceId": "INV1",
+    "invoiceDate": "2025-03-15",
+    "lines": [{"description": "Tobacco", "amount": 10.0}],
+}
+# Company A local in France, company B without a tobacco account
+CONFIG = {
+    "companies": {
+        "A": {"local_country": "FR"},
+        "B": {
+            "keywords": ["Alcohol", "wine"],
+            "accounts": {"alcohol": "ALC-B", "wine": "WINE-B", "": "STD-B"},
+            "status_incomplete": "Incomplete",
+        },
+    }
+}
+
+
+def _write(path, config) -> None:
+    path.write_text(json.dumps(config))
+
+
+def test_compile_accounts():
+    """Test that the built-in account rules are the ones of the strategies"""
+    accounts = DEFAULT_COMPANIES["B"].accounts
+    assert accounts == {
+        frozenset(): InvoiceEnum.ACCOUNT_STD_B,
+        frozenset({"alcohol"}): InvoiceEnum.ACCOUNT_ALC_B,
+        frozenset({"tobacco"}): InvoiceEnum.ACCOUNT_TOB_B,
+        frozenset({"alcohol", "tobacco"}): InvoiceEnum.ACCOUNT_MULTI_B,
+    }
+    # Without a rule of their own, the first most specific one applies
+    assert compile_accounts(("a", "b", "c"), {"a": "A", "b": "B", "": "-"}) == (
+        {
+            frozenset(): "-",
+            frozenset("a"): "A",
+            frozenset("b"): "B",
+            frozenset("c"): "-",
+            frozenset("ab"): "A",
+            frozenset("ac"): "A",
+            frozenset("bc"): "B",
+            frozenset("abc"): "A",
+        }
+    )
+    assert DEFAULT_COMPANIES["A"].account({"alcohol", "tobacco"}) == "ALC-001"
+
+    with pytest.raises(ValueError, match="unknown keywords"):
+        compile_accounts(("a",), {"b": "B", "": "-"})
+    with pytest.raises(ValueError, match="default"):
+        compile_accounts(("a",), {"a": "A"})
+
+
+def test_parse_config():
+    snapshot = parse_config(CONFIG, version=3)
+    assert snapshot.version == 3
+    assert snapshot.companies["A"].local_country == "FR"
+    assert snapshot.companies["B"].keywords == ("alcohol", "wine")
+    assert snapshot.companies["B"].status_verified == VendorEnum.STATUS_VERIFIED
+    assert snapshot.keywords == ("alcohol", "wine")
+    assert parse_config({}).companies == DEFAULT_COMPANIES
+
+    invalid_configs = {
+        "Invalid company configuration": {"companies": {"A": {"color": "red"}}},
+        "Unknown company": {"companies": {"C": {}}},
+        "non-empty keywords": {"companies": {"B": {"keywords": [" "]}}},
+        "up to 10": {"companies": {"B": {"keywords": list("abcdefghijk")}}},
+        "unknown keywords": {"companies": {"B": {"keywords": ["wine"]}}},
+    }
+    for message, config in invalid_configs.items():
+        with pytest.raises(ValueError, match=message):
+            parse_config(config)
+
+
+def test_reload(tmp_path):
+    """Test that a valid file replaces the snapshot, and an invalid one is ignored"""
+    path = tmp_path / "companies.json"
+    _write(path, {})
+    store = CompanyConfigStore(str(path))
+    snapshot = store.snapshot
+    assert snapshot.source == str(path)
+
+    _write(path, CONFIG)
+    assert store.reload()
+    assert store.snapshot.version == 1
+    assert store.snapshot.companies["A"].local_country == "FR"
+    # The previous snapshot isn't modified
+    assert snapshot.companies["A"].local_country == "US"
+
+    path.write_text("{")
+    assert not store.reload()
+    assert store.snapshot.version == 1
+    stats = store.stats()
+    assert (stats["reloads"], stats["failed_reloads"]) == (1, 1)
+    assert "Expecting" in stats["last_error"]
+
+    assert CompanyConfigStore().snapshot.source is None
+
+
+def test_watch_reloads(tmp_path):
+    """Test that the file is reloaded in the background when it changes"""
+    path = tmp_path / "companies.json"
+    _write(path, {})
+    store = CompanyConfigStore(str(path))
+    store.start()
+    try:
+        # Leave time for the watcher to start
+        time.sleep(0.2)
+        _write(path, CONFIG)
+        deadline = time.monotonic() + 10
+        while store.snapshot.version == 0:
+            assert time.monotonic() < deadline, "Timed out"
+            time.sleep(0.05)
+    finally:
+        store.stop()
+    assert store.snapshot.companies["A"].local_country == "FR"
+
+
+def test_service_config(tmp_path):
+    """Test that the records are processed with the reloaded configuration"""
+    path = tmp_path / "companies.json"
+    _write(path, {})
+    settings = Settings(output_backend="memory", company_config_file=str(path))
+    with TestClient(create_app(settings)) as client:
+        records: RecordService = client.app.state.records
+        response = client.post("/vendor-record", json=VENDOR)
+        assert response.json()["data"]["internationalBank"] == (
+            VendorEnum.CONFIRM_INTERNATIONAL_BANK_MSSG
+        )
+
+        _write(path, CONFIG)
+        records.company_config.reload()
+        response = client.post("/vendor-record", json=VENDOR)
+        assert response.json()["data"]["internationalBank"] is None
+        response = client.post("/invoice-record", json=INVOICE)
+        assert response.json()["data"]["account"] == "STD-B"
+        ack = records.process_message(
+            {
+                "seq": 1,
+                "record_type": "vendor",
+                "data": {**VENDOR, "company": "B", "country": "US"},
+            }
+        )
+        assert ack["status"] == "ok"
+        assert records.output.records[-1]["data"]["vendorStatus"] == "Incomplete"
+        assert client.get("/stats/company-config").json()["version"] == 1
+
+
+def test_invoice_stream_snapshot(tmp_path):
+    """Test that an invoice received during a reload is processed with one snapshot"""
+    path = tmp_path / "companies.json"
+    _write(path, CONFIG)
+    records = RecordService(
+        Settings(output_backend="memory", company_config_file=str(path))
+    )
+    stream = records.invoice_stream()
+    stream.feed(json.dumps({**INVOICE, "lines": []})[:-2].encode())
+    stream.feed(b'{"description": "Wine and tobacco", "amount": 1.0}]}')
+
+    _write(path, {})
+    records.company_config.reload()
+    _, invoice_data, _ = stream.finish()
+    assert invoice_data["account"] == "WINE-B"
+    assert records.invoice_stream().config.version == 1
+    # Outside a request, the strategies apply the built-in configuration
+    assert active_config().companies == DEFAULT_COMPANIES
+    with using_config(records.company_config.snapshot) as snapshot:
+        assert active_config() is snapshot
+
+
+def test_sharded_config(tmp_path):
+    """Test that the shard workers process a batch with its configuration snapshot"""
+    path = tmp_path / "companies.json"
+    _write(path, CONFIG)
+    records = RecordService(
+        Settings(
+            output_backend="memory",
+            company_config_file=str(path),
+            shard_workers=1,
+        )
+    )
+    records.warm_up()
+    try:
+        records.process_messages(
+            [{"seq": 1, "record_type": "invoice", "data": INVOICE}]
+        )
+    finally:
+        records.close()
+    assert records.output.records[0]["data"]["account"] == "STD-B"
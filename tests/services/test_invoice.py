@@ -1,7 +1,12 @@
 import pytest
+from pydantic import ValidationError
 
 from app.models.invoice import InvoiceInputBody, InvoiceLine, InvoiceOutput
-from app.services.invoice import InvoiceStrategyA, InvoiceStrategyB
+from app.services.invoice import (
+    InvoiceLineClassifier,
+    InvoiceStrategyA,
+    InvoiceStrategyB,
+)
 from app.enums import InvoiceEnum
 
 
@@ -132,3 +137,67 @@ class TestInvoiceStrategyB:
         result = InvoiceStrategyB.process_invoice(invoice_input)
         self._verify_core_fields(result, invoice_input)
         assert result.account == InvoiceEnum.ACCOUNT_STD_B
+
+
+def test_invoice_classifier_short_circuit():
+    """Test that the lines are no longer classified once all the keywords are found"""
+    descriptions = ["Alcohol beverages", "Snacks", "Tobacco products"]
+    classified = []
+
+    def iter_descriptions():
+        for description in descriptions + ["Never classified"]:
+            classified.append(description)
+            yield description
+
+    classifier = InvoiceStrategyB.classifier()
+    classifier.add_lines(iter_descriptions())
+
+    assert classifier.decided
+    assert classified == descriptions
+    assert InvoiceStrategyB.account(classifier.found_keywords) == (
+        InvoiceEnum.ACCOUNT_MULTI_B
+    )
+
+    # Lines added after the account is decided are ignored
+    classifier.add_line("Other")
+    assert classifier.found_keywords == {"alcohol", "tobacco"}
+
+    classifier = InvoiceLineClassifier(("alcohol",))
+    classifier.add_lines(["Snacks"])
+    assert not classifier.decided
+
+
+def _invoice_input() -> InvoiceInputBody:
+    return InvoiceInputBody(
+        company="B",
+        invoiceId="INV3001",
+        invoiceDate="2025-03-20",
+        lines=[InvoiceLine(description="Tobacco products", amount=400.0)],
+    )
+
+
+def test_trusted_output(monkeypatch):
+    """Test that the validated lines of the input are reused without being copied"""
+    monkeypatch.setattr("app.models.outputs.STRICT_OUTPUTS", False)
+    invoice_input = _invoice_input()
+    result = InvoiceStrategyB.process_invoice(invoice_input)
+    assert result.lines is invoice_input.lines
+    assert result.model_dump() == {
+        "invoiceId": "INV3001",
+        "invoiceDate": "2025-03-20",
+        "account": InvoiceEnum.ACCOUNT_TOB_B,
+        "lines": [{"description": "Tobacco products", "amount": 400.0}],
+    }
+
+
+def test_strict_output(monkeypatch):
+    """Test that the outputs are fully validated in strict mode, lines included"""
+    monkeypatch.setattr("app.models.outputs.STRICT_OUTPUTS", True)
+    invoice_input = _invoice_input()
+    result = InvoiceStrategyB.process_invoice(invoice_input)
+    assert result.lines == invoice_input.lines
+    assert result.lines is not invoice_input.lines
+
+    invoice_input.lines[0].amount = "unknown"
+    with pytest.raises(ValidationError, match="lines.0.amount"):
+        InvoiceStrategyB.process_invoice(invoice_input)
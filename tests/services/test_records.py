@@ -0,0 +1,199 @@
+import pytest
+
+from app.enums import InvoiceEnum
+from app.models.invoice import InvoiceInputBody
+from app.models.vendor import VendorInputBody
+from app.services.records import RecordProcessingError, RecordService
+from app.settings import Settings
+
+MESSAGES = [
+    {
+        "seq": 1,
+        "record_type": "vendor",
+        "data": {
+            "company": "A",
+            "vendorName": "Mock Vendor",
+            "country": "US",
+            "bank": "Mock Bank",
+        },
+    },
+    {
+        "seq": 2,
+        "record_type": "invoice",
+        "data": {
+            "company": "B",
+            "invoiceId": "INV1001",
+            "invoiceDate": "2025-03-15",
+            "lines": [{"description": "Tobacco", "amount": 10.0}],
+        },
+    },
+    {
+        "seq": 3,
+        "record_type": "invoice",
+        "data": {
+            "company": "A",
+            "invoiceId": "INV1002",
+            "invoiceDate": "2025-03-16",
+            "lines": [{"description": "Beverages - alcohol", "amount": 20.0}],
+            "other_details": {"vendorName": "Mock Vendor"},
+        },
+    },
+    {"seq": 4, "record_type": "invoice", "data": {"company": "A"}},
+    {"seq": 5, "record_type": "mock_type", "data": {}},
+    {"seq": 6, "record_type": "vendor", "data": []},
+]
+
+
+@pytest.fixture(scope="module")
+def sharded_records():
+    """Record service processing the batches in two shard worker processes"""
+    records = RecordService(Settings(output_backend="memory", shard_workers=2))
+    records.warm_up()
+    yield records
+    records.close()
+
+
+def _ack_statuses(acks):
+    return [(ack["seq"], ack["status_code"]) for ack in acks]
+
+
+def test_process_messages_sharded_like_in_process(sharded_records):
+    """Test that the shard workers acknowledge and write the records like the service"""
+    records = RecordService(Settings(output_backend="memory"))
+    sharded_records.output.records.clear()
+
+    acks = records.process_messages(MESSAGES)
+    sharded_acks = sharded_records.process_messages(MESSAGES)
+
+    assert (
+        _ack_statuses(sharded_acks)
+        == _ack_statuses(acks)
+        == [
+            (1, 201),
+            (2, 201),
+            (3, 201),
+            (4, 422),
+            (5, 422),
+            (6, 422),
+        ]
+    )
+    assert sharded_acks[3]["errors"] == acks[3]["errors"]
+    # Outputs are written in the batch order, the invoice enriched with its vendor
+    assert sharded_records.output.records == records.output.records
+    assert sharded_records.output.records[2]["data"]["vendor"] == {
+        "country": "US",
+        "vendorStatus": None,
+    }
+
+
+def test_process_messages_keeps_key_order(sharded_records):
+    """Test that the records of a key are written in order, whichever worker runs them"""
+    sharded_records.output.records.clear()
+    messages = [
+        {
+            "seq": seq,
+            "record_type": "vendor",
+            "data": {
+                "company": "A",
+                "vendorName": f"Mock Vendor {seq % 5}",
+                "country": "US",
+                "bank": f"Mock Bank {seq}",
+            },
+        }
+        for seq in range(50)
+    ]
+
+    acks = sharded_records.process_messages(messages)
+
+    assert [ack["seq"] for ack in acks] == list(range(50))
+    assert [record["data"]["bank"] for record in sharded_records.output.records] == [
+        f"Mock Bank {seq}" for seq in range(50)
+    ]
+
+
+def test_process_messages_write_error(monkeypatch):
+    """Test that a record that can't be written is acknowledged with a 500 error"""
+    records = RecordService(Settings(output_backend="memory"))
+
+    def mock_raise_exception(*args, **kwargs):
+        raise Exception("Mocked Write Error")
+
+    monkeypatch.setattr(records.output, "append", mock_raise_exception)
+
+    [ack] = records.process_messages(MESSAGES[:1])
+
+    assert ack["status_code"] == 500
+    assert ack["detail"] == "Mocked Write Error"
+
+
+def test_process_messages_record_error(monkeypatch):
+    """Test that a record that can't be prepared for the write doesn't fail the others"""
+    records = RecordService(Settings(output_backend="memory"))
+    get_vendor = records.vendor_cache.get
+
+    def mock_get_vendor(company, vendor_name):
+        if vendor_name == "Mock Broken Vendor":
+            raise Exception("Mocked Vendor Cache Error")
+        return get_vendor(company, vendor_name)
+
+    monkeypatch.setattr(records.vendor_cache, "get", mock_get_vendor)
+    invoice = MESSAGES[2]
+    broken_invoice = {
+        **invoice,
+        "seq": 7,
+        "data": {
+            **invoice["data"],
+            "other_details": {"vendorName": "Mock Broken Vendor"},
+        },
+    }
+    unhashable_invoice = {
+        **invoice,
+        "seq": 8,
+        "data": {**invoice["data"], "other_details": {"vendorName": ["Mock Vendor"]}},
+    }
+
+    acks = records.process_messages([broken_invoice, unhashable_invoice, *MESSAGES[:3]])
+
+    assert _ack_statuses(acks) == [(7, 500), (8, 201), (1, 201), (2, 201), (3, 201)]
+    assert acks[0]["detail"] == "Mocked Vendor Cache Error"
+    assert len(records.output.records) == 4
+    # An invoice referencing a vendor name that isn't a string isn't enriched
+    assert "vendor" not in records.output.records[0]["data"]
+
+    with pytest.raises(Exception, match="Mocked Vendor Cache Error"):
+        records.process_invoice(InvoiceInputBody(**broken_invoice["data"]))
+
+    # Vendor output missing its name
+    monkeypatch.setattr(
+        "app.services.records.transform_vendors",
+        lambda vendor_inputs: [{}, {"vendorName": "Mock Vendor", "country": "US"}],
+    )
+    vendor_input = VendorInputBody(**MESSAGES[0]["data"])
+    results = records.process_vendors([vendor_input, vendor_input])
+    assert isinstance(results[0], KeyError) and results[1]["country"] == "US"
+    assert len(records.output.records) == 5
+
+
+def test_process_invoice_errors():
+    """Test that invoices without lines or of an unknown company are not written"""
+    records = RecordService(Settings(output_backend="memory"))
+    invoice_data = {
+        "company": "A",
+        "invoiceId": "INV1001",
+        "invoiceDate": "2025-03-15",
+        "lines": [],
+    }
+
+    with pytest.raises(RecordProcessingError) as e:
+        records.process_invoice(InvoiceInputBody(**invoice_data))
+    assert e.value.status_code == 422
+
+    invoice_data["lines"] = [{"description": "Mock Line", "amount": 1.0}]
+    with pytest.raises(RecordProcessingError) as e:
+        records.process_invoice(InvoiceInputBody(**{**invoice_data, "company": "Z"}))
+    assert e.value.status_code == 404
+
+    assert records.process_invoice(InvoiceInputBody(**invoice_data))["account"] == (
+        InvoiceEnum.ACCOUNT_STD_001
+    )
+    assert len(records.output.records) == 1
@@ -0,0 +1,238 @@
+import asyncio
+import subprocess
+import sys
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+from pydantic import ValidationError
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from app.client import (
+    MiddlewareClient,
+    MiddlewareClientError,
+    RecordRejectedError,
+    retry_after_seconds,
+)
+from app.main import create_app
+from app.models.vendor import VendorInputBody
+from app.settings import Settings
+
+VENDOR = {
+    "company": "A",
+    "vendorName": "Mock Vendor Name",
+    "country": "FR",
+    "bank": "Mock Bank",
+}
+INVOICE = {
+    "company": "B",
+    "invoiceId": "INV1",
+    "invoiceDate": "2025-03-15",
+    "lines": [{"description": "Tobacco", "amount": 10.0}],
+}
+
+
+class LocalService:
+    """
+    Local instance of the service, counting the batches it receives, answering the first
+    ones with the given error responses, and delaying the others
+    """
+
+    def __init__(self, errors=(), delay: float = 0):
+        self.app = create_app(Settings(output_backend="memory"))
+        self.errors = list(errors)
+        self.delay = delay
+        self.batches = 0
+        self.in_flight = self.max_in_flight = 0
+
+    @property
+    def records(self) -> list:
+        return self.app.state.records.output.records
+
+    async def __call__(self, scope, receive, send):
+        self.batches += 1
+        if self.errors:
+            await self.errors.pop(0)(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    def client(self, **options) -> MiddlewareClient:
+        return MiddlewareClient(
+            "http://testserver",
+            transport=httpx.ASGITransport(app=self),
+            backoff_base=0.001,
+            **options,
+        )
+
+
+def test_submit_batches():
+    """Test that the records submitted together are posted in batches"""
+    service = LocalService()
+
+    async def submit():
+        async with service.client(batch_size=3) as client:
+            return await asyncio.gather(
+                *(
+                    client.submit_vendor({**VENDOR, "vendorName": f"V{i}"})
+                    for i in range(4)
+                ),
+                *(client.submit_invoice(INVOICE) for _ in range(3)),
+                client.submit_vendor(VendorInputBody(**VENDOR)),
+                client.submit_invoice(**{**INVOICE, "company": "A"}),
+            )
+
+    acks = asyncio.run(submit())
+    assert [ack["status_code"] for ack in acks] == [201] * 9
+    assert [ack["seq"] for ack in acks] == list(range(1, 10))
+    assert service.batches == 3
+    assert len(service.records) == 9
+
+
+def test_submit_after_delay():
+    """Test that a record waits for more records at most the batch delay"""
+    service = LocalService()
+
+    async def submit():
+        async with service.client(batch_delay=0.01) as client:
+            first = await client.submit_vendor(**VENDOR)
+            second = await client.submit_vendor(**VENDOR)
+            return first, second
+
+    assert [ack["seq"] for ack in asyncio.run(submit())] == [1, 2]
+    assert service.batches == 2
+
+
+def test_submit_invalid_record():
+    """Test that the records are validated with the input models before being sent"""
+
+    async def submit():
+        async with LocalService().client() as client:
+            await client.submit_vendor(company="A")
+
+    with pytest.raises(ValidationError):
+        asyncio.run(submit())
+
+
+def test_record_rejected():
+    service = LocalService()
+
+    async def submit():
+        async with service.client() as client:
+            return await asyncio.gather(
+                client.submit_vendor(VENDOR),
+                client.submit_vendor({**VENDOR, "company": "C"}),
+                return_exceptions=True,
+            )
+
+    ok, rejected = asyncio.run(submit())
+    assert ok["status"] == "ok"
+    assert isinstance(rejected, RecordRejectedError)
+    assert rejected.status_code == 404
+    assert rejected.ack["seq"] == 2
+
+
+def test_retry_after():
+    """Test that the batches rejected with a 429 error are retried after `Retry-After`"""
+    service = LocalService(
+        errors=[
+            JSONResponse({"detail": "Too many"}, 429, {"Retry-After": "0.05"}),
+            JSONResponse({"detail": "Too many"}, 429, {"Retry-After": "0"}),
+        ]
+    )
+
+    async def submit():
+        async with service.client() as client:
+            start = asyncio.get_running_loop().time()
+            ack = await client.submit_vendor(VENDOR)
+            return ack, asyncio.get_running_loop().time() - start
+
+    ack, elapsed = asyncio.run(submit())
+    assert ack["status"] == "ok"
+    assert elapsed >= 0.05
+    assert service.batches == 3
+
+
+def test_retries_exhausted():
+    """Test the errors of the batches that can't be processed"""
+    service = LocalService(errors=[PlainTextResponse("Unavailable", 503)] * 3)
+
+    async def submit(service, **options):
+        async with service.client(**options) as client:
+            await client.submit_vendor(VENDOR)
+
+    with pytest.raises(MiddlewareClientError) as error:
+        asyncio.run(submit(service, max_retries=2))
+    assert (error.value.status_code, error.value.detail) == (503, "Unavailable")
+    assert service.batches == 3
+
+    # Errors other than 429 and 5xx aren't retried
+    service = LocalService(errors=[JSONResponse({"detail": "Too large"}, 413)])
+    with pytest.raises(MiddlewareClientError) as error:
+        asyncio.run(submit(service))
+    assert (error.value.status_code, error.value.detail) == (413, "Too large")
+    assert service.batches == 1
+
+
+def test_transport_errors():
+    """Test that the batches that fail to be sent are retried"""
+
+    class FailingTransport(httpx.ASGITransport):
+        def __init__(self, app, failures: int):
+            super().__init__(app=app)
+            self.failures = failures
+
+        async def handle_async_request(self, request):
+            if self.failures:
+                self.failures -= 1
+                raise httpx.ConnectError("Connection refused")
+            return await super().handle_async_request(request)
+
+    async def submit(failures: int):
+        transport = FailingTransport(LocalService(), failures)
+        async with MiddlewareClient(
+            "http://testserver",
+            transport=transport,
+            max_retries=2,
+            backoff_base=0.001,
+        ) as client:
+            return await client.submit_vendor(VENDOR)
+
+    assert asyncio.run(submit(2))["status"] == "ok"
+    with pytest.raises(MiddlewareClientError, match="Connection refused"):
+        asyncio.run(submit(3))
+
+
+def test_max_in_flight():
+    """Test that the batches posted at once are capped"""
+    service = LocalService(delay=0.01)
+
+    async def submit():
+        async with service.client(batch_size=1, max_in_flight=2) as client:
+            await asyncio.gather(*(client.submit_vendor(VENDOR) for _ in range(6)))
+
+    asyncio.run(submit())
+    assert service.batches == 6
+    assert service.max_in_flight == 2
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds("2") == 2
+    assert retry_after_seconds("-1") == 0
+    assert retry_after_seconds(formatdate(0, usegmt=True)) == 0
+    assert 55 < retry_after_seconds(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(None) is None
+
+
+def test_client_imports_without_the_server():
+    """Test that the client doesn't import the server-side web framework"""
+    code = "import sys, app.client; assert 'fastapi' not in sys.modules, sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
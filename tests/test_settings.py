@@ -0,0 +1,45 @@
+import pytest
+
+from app.settings import OUTPUT_FILE, Settings
+
+
+def test_settings_defaults():
+    """Test that the settings default to the module constants"""
+    settings = Settings.from_env({})
+    assert settings.output_backend == "jsonl"
+    assert settings.output_file == OUTPUT_FILE
+    assert settings.output_fsync is False
+
+
+def test_settings_from_env():
+    """Test that every field can be set from its MIDDLEWARE_* environment variable"""
+    settings = Settings.from_env(
+        {
+            "MIDDLEWARE_OUTPUT_BACKEND": "memory",
+            "MIDDLEWARE_OUTPUT_FILE": "/mock/output.jsonl",
+            "MIDDLEWARE_OUTPUT_FSYNC": "true",
+            "MIDDLEWARE_VENDOR_CACHE_MAX_ENTRIES": "10",
+            "MIDDLEWARE_WS_ACK_FLUSH_INTERVAL": "0.5",
+            "OTHER_VARIABLE": "ignored",
+        },
+        spool_chunk_size=5,
+    )
+
+    assert settings.output_backend == "memory"
+    assert settings.output_file == "/mock/output.jsonl"
+    assert settings.output_fsync is True
+    assert settings.vendor_cache_max_entries == 10
+    assert settings.ws_ack_flush_interval == 0.5
+    assert settings.spool_chunk_size == 5
+
+
+def test_settings_unknown_output_backend():
+    """Test that an unknown output backend is rejected"""
+    with pytest.raises(ValueError):
+        Settings.from_env({"MIDDLEWARE_OUTPUT_BACKEND": "mock_backend"})
+
+
+def test_settings_unknown_shard_key():
+    """Test that an unknown shard key is rejected"""
+    with pytest.raises(ValueError):
+        Settings.from_env({"MIDDLEWARE_SHARD_BY": "mock_key"})
@@ -1,7 +1,12 @@
 import os
 import pytest
 import jsonlines
-from app.utils.file_writer import append_output_to_jsonl
+from app.settings import Settings
+from app.utils.file_writer import (
+    JsonlOutputWriter,
+    append_output_to_jsonl,
+    create_output_writer,
+)
 
 
 @pytest.fixture
@@ -108,3 +113,43 @@ def test_append_multiple_records(mock_jsonl_path):
         assert records[1]["company"] == test_input_2["company"]
         assert records[1]["record_type"] == test_input_2["record_type"]
         assert records[1]["data"] == test_input_2["data"]
+
+
+def test_append_output_to_jsonl_fsync(mock_jsonl_path, monkeypatch):
+    """Test that the file is synced to disk when the fsync writer policy is used"""
+    synced = []
+    monkeypatch.setattr("app.utils.file_writer.os.fsync", synced.append)
+
+    append_output_to_jsonl("A", "vendor", {}, output_file=mock_jsonl_path, fsync=True)
+
+    assert len(synced) == 1
+
+
+def test_jsonl_output_writer_append_many(mock_jsonl_path):
+    """Test that the records of a batch are appended with a single write"""
+    writer = JsonlOutputWriter(str(mock_jsonl_path))
+    writer.append("A", "vendor", {"vendorName": "Mock Vendor"})
+    writer.append_many(
+        [
+            ("B", "invoice", {"invoiceId": "INV1"}),
+            ("B", "invoice", {"invoiceId": "INV2"}),
+        ]
+    )
+
+    with jsonlines.open(mock_jsonl_path) as reader:
+        records = list(reader)
+    assert [record["company"] for record in records] == ["A", "B", "B"]
+    assert records[2]["data"] == {"invoiceId": "INV2"}
+
+
+def test_create_output_writer():
+    """Test that the output backend is selected by the settings"""
+    memory_writer = create_output_writer(Settings(output_backend="memory"))
+    memory_writer.append("A", "vendor", {"mock_key": "mock_value"})
+    assert memory_writer.records == [
+        {"company": "A", "record_type": "vendor", "data": {"mock_key": "mock_value"}}
+    ]
+
+    jsonl_writer = create_output_writer(Settings(output_file="mock.jsonl"))
+    assert isinstance(jsonl_writer, JsonlOutputWriter)
+    assert jsonl_writer.output_file == "mock.jsonl"
@@ -0,0 +1,23 @@
+import os
+
+from app.tools.export import main
+from app.utils.file_writer import append_output_to_jsonl
+
+
+def test_export_cli_writes_tables(tmp_path, capsys):
+    """Test that the CLI exports the tables of the given output file and prints their paths"""
+    output_file = str(tmp_path / "output.jsonl")
+    append_output_to_jsonl(
+        "A",
+        "vendor",
+        {"vendorName": "Mock Vendor", "country": "FR", "bank": "Mock Bank"},
+        output_file=output_file,
+    )
+
+    destination_dir = str(tmp_path / "export")
+    main([destination_dir, "--output-file", output_file, "--record-type", "vendor"])
+
+    assert os.listdir(destination_dir) == ["vendors.csv"]
+    assert capsys.readouterr().out.strip() == os.path.join(
+        destination_dir, "vendors.csv"
+    )
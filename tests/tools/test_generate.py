@@ -0,0 +1,122 @@
+import gzip
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.services.records import RecordService
+from app.settings import Settings
+from app.tools.generate import DatasetConfig, generate_messages, main, post_dataset
+
+
+def test_generate_messages_seeded():
+    """Test that a seed always generates the same valid records, of any number"""
+    messages = list(generate_messages(500))
+
+    assert messages == list(generate_messages(500))
+    assert messages[:100] == list(generate_messages(100))
+    assert messages != list(generate_messages(500, DatasetConfig(seed=2)))
+    assert [message["seq"] for message in messages] == list(range(1, 501))
+    assert {message["record_type"] for message in messages} == {"vendor", "invoice"}
+
+    records = RecordService(Settings(output_backend="memory"))
+    acks = records.process_messages(messages)
+    assert all(ack["status"] == "ok" for ack in acks)
+
+
+def test_generate_messages_mix():
+    """Test that the configured mix is generated"""
+    config = DatasetConfig(
+        vendor_rate=0.5,
+        companies={"A": 1, "C": 1},
+        countries={"FR": 1},
+        missing_registration_rate=1,
+        missing_tax_id_rate=0,
+        lines_tail_rate=0.5,
+        lines_max=100,
+        keywords={"tobacco": 1},
+    )
+    messages = list(generate_messages(400, config))
+    vendors = [m["data"] for m in messages if m["record_type"] == "vendor"]
+    invoices = [m["data"] for m in messages if m["record_type"] == "invoice"]
+
+    assert {message["data"]["company"] for message in messages} == {"A", "C"}
+    assert {vendor["country"] for vendor in vendors} == {"FR"}
+    assert not any("registrationNumber" in vendor for vendor in vendors)
+    assert all("taxId" in vendor for vendor in vendors)
+    lines = [len(invoice["lines"]) for invoice in invoices]
+    assert max(lines) == 100 and min(lines) >= 1
+    assert all(
+        "tobacco" in line["description"].lower()
+        for invoice in invoices
+        for line in invoice["lines"]
+    )
+
+
+def test_generate_files(tmp_path, capsys):
+    """Test the generation of gzipped NDJSON files"""
+    main([str(tmp_path), "--records", "25", "--records-per-file", "10", "--gzip"])
+
+    paths = capsys.readouterr().out.split()
+    assert [os.path.basename(path) for path in paths] == [
+        "dataset-00000.ndjson.gz",
+        "dataset-00001.ndjson.gz",
+        "dataset-00002.ndjson.gz",
+    ]
+    messages = []
+    for path in paths:
+        with gzip.open(path, "rt") as f:
+            messages += [json.loads(line) for line in f]
+    assert messages == list(generate_messages(25))
+
+
+def test_post_dataset():
+    """Test posting the records to the batch endpoint"""
+    with TestClient(create_app(Settings(output_backend="memory"))) as client:
+        config = DatasetConfig(companies={"A": 3, "C": 1})
+        status_codes = post_dataset(
+            client, generate_messages(50, config), batch_size=20
+        )
+        stored = client.app.state.records.output.records
+
+    assert set(status_codes) == {201, 404}
+    assert sum(status_codes.values()) == 50
+    assert len(stored) == status_codes[201]
+
+
+def test_main_arguments(tmp_path, capsys):
+    """Test the mix options, and that a single destination is required"""
+    main(
+        [
+            str(tmp_path),
+            "--records",
+            "5",
+            "--companies",
+            "B=1",
+            "--countries",
+            "US=1",
+            "--keywords",
+            "alcohol=1",
+        ]
+    )
+    with open(capsys.readouterr().out.strip()) as f:
+        assert {json.loads(line)["data"]["company"] for line in f} == {"B"}
+
+    with pytest.raises(SystemExit):
+        main(["--records", "5"])
+
+
+def test_main_url(monkeypatch, capsys):
+    """Test posting the records to the service at an URL"""
+    app = create_app(Settings(output_backend="memory"))
+    monkeypatch.setattr(
+        "app.tools.generate.httpx.Client",
+        lambda base_url, timeout: TestClient(app, base_url=base_url),
+    )
+
+    main(["--url", "http://testserver", "--records", "30"])
+
+    assert json.loads(capsys.readouterr().out) == {"201": 30}
+    assert len(app.state.records.output.records) == 30
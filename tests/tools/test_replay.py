@@ -0,0 +1,234 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from app.tools.replay import main, replay
+
+# Candidate rules where company B tobacco invoices go to the standard account
+CANDIDATE_RULES = """
+from app.enums import InvoiceEnum
+from app.services.invoice import INVOICE_STRATEGIES, InvoiceStrategyB
+
+
+class CandidateInvoiceStrategyB(InvoiceStrategyB):
+    keywords = ("alcohol",)
+
+
+class FailingInvoiceStrategy(InvoiceStrategyB):
+    @classmethod
+    def account(cls, found_keywords):
+        raise ValueError("Mock candidate error")
+
+
+INVOICE_STRATEGIES = {
+    **INVOICE_STRATEGIES,
+    "B": CandidateInvoiceStrategyB,
+    "C": FailingInvoiceStrategy,
+}
+"""
+
+
+def _invoice(company, invoice_id, description):
+    return {
+        "record_type": "invoice",
+        "data": {
+            "company": company,
+            "invoiceId": invoice_id,
+            "invoiceDate": "2025-03-15",
+            "lines": [{"description": description, "amount": 10.0}],
+        },
+    }
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Gzipped archive of inputs, some of them joined with their archived output"""
+    joined = _invoice("A", "INV-A2", "Snacks")
+    joined["output"] = {
+        "invoiceId": "INV-A2",
+        "invoiceDate": "2025-03-15",
+        "account": "ALC-001",
+        "lines": [{"description": "Snacks", "amount": 12.0}],
+        "vendor": {"country": "US", "vendorStatus": None},
+    }
+    messages = [
+        _invoice("B", "INV-B1", "Tobacco"),
+        _invoice("B", "INV-B2", "Alcohol and tobacco"),
+        _invoice("B", "INV-B3", "Tobacco products"),
+        _invoice("A", "INV-A1", "Alcohol"),
+        _invoice("C", "INV-C1", "Tobacco"),
+        joined,
+        {
+            "record_type": "vendor",
+            "data": {"company": "B", "vendorName": "V", "country": "US", "bank": "X"},
+        },
+        {"record_type": "invoice", "data": {"company": "A"}},
+    ]
+    lines = [json.dumps(message) for message in messages] + ["not json", "", ""]
+    path = tmp_path / "archive.ndjson.gz"
+    path.write_bytes(gzip.compress("\n".join(lines).encode()))
+
+    rules_path = tmp_path / "candidate_rules.py"
+    rules_path.write_text(CANDIDATE_RULES)
+    return str(path), str(rules_path)
+
+
+def _summary(report):
+    summary = dict(report)
+    for key in ("seconds", "records_per_second"):
+        summary.pop(key)
+    return summary
+
+
+def test_replay_report(archive):
+    """Test that the changed outputs are counted per transition, with samples"""
+    path, rules_path = archive
+    output = io.StringIO()
+
+    summary = replay([path], rules_path, output=output, chunk_size=2, max_samples=1)
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines[-1] == summary
+    assert (summary["records"], summary["invalid"], summary["changed"]) == (9, 2, 5)
+    transitions = {
+        (t["company"], t["field"], t["from"], t["to"]): t["count"]
+        for t in summary["transitions"]
+    }
+    assert transitions == {
+        ("B", "account", "TOB-B", "STD-B"): 2,
+        ("B", "account", "MULTI-B", "ALC-B"): 1,
+        ("A", "account", "ALC-001", "STD-001"): 1,
+        ("A", "lines", "<changed>", "<changed>"): 1,
+        ("C", "error", "Unknown company", "Mock candidate error"): 1,
+    }
+
+    # One sample per transition, streamed in the order of the archive
+    samples = [line for line in lines if line["type"] == "sample"]
+    assert [(sample["position"], sample["key"]) for sample in samples] == [
+        (1, "INV-B1"),
+        (2, "INV-B2"),
+        (5, "INV-C1"),
+        (6, "INV-A2"),
+        (6, "INV-A2"),
+    ]
+    assert samples[0]["changes"] == {"account": ["TOB-B", "STD-B"]}
+    assert samples[2]["changes"]["error"] == ["Unknown company", "Mock candidate error"]
+    assert samples[3]["file"] == path
+
+
+def test_replay_worker_processes(archive):
+    """Test that the records replayed in worker processes give the same report"""
+    path, rules_path = archive
+
+    summary = replay([path], rules_path, output=io.StringIO(), chunk_size=2)
+    parallel_summary = replay(
+        [path], rules_path, output=io.StringIO(), workers=2, chunk_size=2
+    )
+
+    assert _summary(parallel_summary) == _summary(summary)
+
+
+def test_replay_main(archive, tmp_path):
+    """Test that the command line tool writes the report, comparing any two rule sets"""
+    path, rules_path = archive
+    report_path = tmp_path / "report.ndjson"
+
+    main(
+        [
+            path,
+            "--candidate",
+            "app.services.invoice",
+            "--current",
+            rules_path,
+            "--workers",
+            "0",
+            "--report",
+            str(report_path),
+        ]
+    )
+
+    summary = json.loads(report_path.read_text().splitlines()[-1])
+    assert summary["changed"] == 5
+    assert {"from": "STD-B", "to": "TOB-B"}.items() <= summary["transitions"][0].items()
+
+
+def test_replay_configs(archive, tmp_path):
+    """Test that the current and candidate company configurations are diffed"""
+    path, _ = archive
+    current_config = tmp_path / "current.json"
+    current_config.write_text(json.dumps({"companies": {"A": {"local_country": "FR"}}}))
+    # Company B tobacco invoices go to the standard account
+    candidate_config = tmp_path / "candidate.json"
+    candidate_config.write_text(
+        json.dumps(
+            {
+                "companies": {
+                    "B": {
+                        "keywords": ["alcohol"],
+                        "accounts": {"alcohol": "ALC-B", "": "STD-B"},
+                    }
+                }
+            }
+        )
+    )
+    configs = {
+        "current_config": str(current_config),
+        "candidate_config": str(candidate_config),
+    }
+
+    summary = replay([path], None, output=io.StringIO(), chunk_size=2, **configs)
+    transitions = {
+        (t["company"], t["field"], t["from"], t["to"]): t["count"]
+        for t in summary["transitions"]
+    }
+    assert transitions == {
+        ("B", "account", "TOB-B", "STD-B"): 2,
+        ("B", "account", "MULTI-B", "ALC-B"): 1,
+        # Archived output, compared instead of the current rules
+        ("A", "account", "ALC-001", "STD-001"): 1,
+        ("A", "lines", "<changed>", "<changed>"): 1,
+    }
+    parallel_summary = replay(
+        [path], None, output=io.StringIO(), workers=2, chunk_size=2, **configs
+    )
+    assert _summary(parallel_summary) == _summary(summary)
+
+    # Without a candidate configuration, the current one applies to both sides
+    summary = replay(
+        [path], None, output=io.StringIO(), current_config=str(candidate_config)
+    )
+    assert summary["changed"] == 1
+
+
+def test_replay_main_configs(archive, tmp_path, monkeypatch):
+    """Test that the deployed company configuration is the current one by default"""
+    path, _ = archive
+    deployed_config = tmp_path / "deployed.json"
+    deployed_config.write_text(
+        json.dumps({"companies": {"B": {"keywords": [], "accounts": {"": "STD-B"}}}})
+    )
+    built_in_config = tmp_path / "built_in.json"
+    built_in_config.write_text("{}")
+    monkeypatch.setenv("MIDDLEWARE_COMPANY_CONFIG_FILE", str(deployed_config))
+    report_path = tmp_path / "report.ndjson"
+
+    main(
+        [
+            path,
+            "--candidate-config",
+            str(built_in_config),
+            "--workers",
+            "0",
+            "--report",
+            str(report_path),
+        ]
+    )
+
+    summary = json.loads(report_path.read_text().splitlines()[-1])
+    transitions = {(t["company"], t["from"], t["to"]) for t in summary["transitions"]}
+    assert ("B", "STD-B", "TOB-B") in transitions
+
+    with pytest.raises(SystemExit):
+        main([path])
@@ -0,0 +1,242 @@
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from app.services.records import RecordService
+from app.settings import Settings
+from app.tools.spool import (
+    claim_file,
+    default_worker_id,
+    main,
+    process_pending,
+    requeue_claimed_files,
+    run,
+)
+
+VENDOR_MESSAGE = {
+    "record_type": "vendor",
+    "data": {
+        "company": "A",
+        "vendorName": "Mock Vendor Name",
+        "country": "Mock Country",
+        "bank": "Mock Bank",
+    },
+}
+
+
+@pytest.fixture
+def spool_dir(tmp_path):
+    return str(tmp_path / "spool")
+
+
+@pytest.fixture
+def records(spool_dir):
+    """Record service writing to an in-memory output"""
+    return RecordService(
+        Settings(output_backend="memory", spool_dir=spool_dir, spool_chunk_size=10)
+    )
+
+
+def _drop(spool_dir, name, content):
+    os.makedirs(spool_dir, exist_ok=True)
+    with open(os.path.join(spool_dir, name), "w") as f:
+        f.write(content)
+
+
+def test_process_pending_moves_files(records, spool_dir):
+    """Test that clean files go to done/ and files with rejects go to failed/"""
+    _drop(spool_dir, "a.json", json.dumps([VENDOR_MESSAGE, VENDOR_MESSAGE]))
+    _drop(spool_dir, "b.json", json.dumps(VENDOR_MESSAGE))
+    _drop(
+        spool_dir,
+        "c.ndjson",
+        "\n".join(
+            [
+                json.dumps(VENDOR_MESSAGE),
+                "mock invalid json",
+                "",
+                json.dumps({"record_type": "vendor", "data": {}}),
+                "[1]",
+            ]
+        ),
+    )
+    _drop(spool_dir, "d.json", "mock invalid json")
+    _drop(spool_dir, "e.tmp", "still being written")
+
+    results = process_pending(records, spool_dir, "mock-worker", chunk_size=2)
+
+    assert [(r["file"], r["records"], r["rejected"]) for r in results] == [
+        ("a.json", 2, 0),
+        ("b.json", 1, 0),
+        ("c.ndjson", 4, 3),
+        ("d.json", 1, 1),
+    ]
+    assert len(records.output.records) == 4
+
+    assert sorted(os.listdir(os.path.join(spool_dir, "done"))) == [
+        "a.json",
+        "a.json.stats.json",
+        "b.json",
+        "b.json.stats.json",
+    ]
+    assert sorted(os.listdir(spool_dir)) == ["done", "e.tmp", "failed", "processing"]
+    assert os.listdir(os.path.join(spool_dir, "processing")) == []
+
+    with open(os.path.join(spool_dir, "failed", "c.ndjson.rejects.ndjson")) as f:
+        rejects = [json.loads(line) for line in f]
+    assert [reject["position"] for reject in rejects] == [2, 4, 5]
+    assert [reject["ack"]["status_code"] for reject in rejects] == [400, 422, 400]
+
+    with open(os.path.join(spool_dir, "done", "a.json.stats.json")) as f:
+        assert json.load(f)["records_per_second"] > 0
+
+
+def test_process_pending_never_overwrites(records, spool_dir):
+    """Test that a file of an already processed name is stored under a new name"""
+    for _ in range(3):
+        _drop(spool_dir, "a.json", json.dumps(VENDOR_MESSAGE))
+        _drop(spool_dir, "b.json", "mock invalid json")
+        process_pending(records, spool_dir, "mock-worker")
+
+    assert sorted(os.listdir(os.path.join(spool_dir, "done"))) == [
+        "a.1.json",
+        "a.1.json.stats.json",
+        "a.2.json",
+        "a.2.json.stats.json",
+        "a.json",
+        "a.json.stats.json",
+    ]
+    assert len(os.listdir(os.path.join(spool_dir, "failed"))) == 9
+
+
+def test_process_pending_sets_aside_failed_files(monkeypatch, records, spool_dir):
+    """Test that a file failing to be processed goes to failed/ with its error"""
+
+    def process_messages(messages):
+        raise RuntimeError("mock write failure")
+
+    _drop(spool_dir, "a.json", json.dumps(VENDOR_MESSAGE))
+    _drop(spool_dir, "b.json", json.dumps(VENDOR_MESSAGE))
+    monkeypatch.setattr(records, "process_messages", process_messages)
+
+    results = process_pending(records, spool_dir, "mock-worker")
+
+    assert results == [
+        {"file": name, "error": "RuntimeError: mock write failure"}
+        for name in ("a.json", "b.json")
+    ]
+    assert os.listdir(os.path.join(spool_dir, "processing")) == []
+    with open(os.path.join(spool_dir, "failed", "a.json.stats.json")) as f:
+        assert json.load(f) == results[0]
+
+
+def test_requeue_claimed_files(records, spool_dir):
+    """Test that the files left claimed by the worker are put back in the spool"""
+    processing_dir = os.path.join(spool_dir, "processing")
+    os.makedirs(processing_dir)
+    _drop(spool_dir, "a.json", "[]")
+    _drop(processing_dir, "a.json.worker-1", json.dumps([VENDOR_MESSAGE]))
+    _drop(processing_dir, "a.json.worker-1.rejects.ndjson", "{}")
+    _drop(processing_dir, "b.json.worker-2", "[]")
+
+    assert requeue_claimed_files(spool_dir, "worker-1") == ["a.1.json"]
+    assert os.listdir(processing_dir) == ["b.json.worker-2"]
+
+    process_pending(records, spool_dir, "worker-1")
+    assert len(records.output.records) == 1
+    assert os.listdir(os.path.join(spool_dir, "failed")) == []
+
+
+def test_run_recovers_files_after_restart(records, spool_dir):
+    """Test that a worker restarted with the default id recovers its claimed files"""
+    processing_dir = os.path.join(spool_dir, "processing")
+    os.makedirs(processing_dir)
+    _drop(processing_dir, f"a.json.{default_worker_id()}", json.dumps(VENDOR_MESSAGE))
+    stop_event = threading.Event()
+    stop_event.set()
+
+    run(records, None, stop_event)
+
+    assert os.listdir(processing_dir) == []
+    assert os.path.exists(os.path.join(spool_dir, "done", "a.json"))
+    assert default_worker_id() == socket.gethostname()
+
+
+def test_process_pending_streams_json_files(monkeypatch, records, spool_dir):
+    """Test that the messages of a `.json` file are parsed as it is read"""
+    monkeypatch.setattr("app.tools.spool.SPOOL_READ_SIZE", 16)
+    _drop(spool_dir, "a.json", json.dumps([VENDOR_MESSAGE] * 3)[:-1] + ", mock]")
+    _drop(spool_dir, "b.json", "12")
+
+    [result, scalar_result] = process_pending(
+        records, spool_dir, "mock-worker", chunk_size=2
+    )
+
+    assert (result["records"], result["rejected"]) == (4, 1)
+    assert (scalar_result["records"], scalar_result["rejected"]) == (1, 1)
+    assert len(records.output.records) == 3
+    with open(os.path.join(spool_dir, "failed", "a.json.rejects.ndjson")) as f:
+        assert [json.loads(line)["position"] for line in f] == [4]
+
+
+def test_claim_file_only_once(spool_dir):
+    """Test that a file can only be claimed by one of the workers sharing the spool"""
+    _drop(spool_dir, "a.json", "[]")
+    os.makedirs(os.path.join(spool_dir, "processing"))
+
+    assert claim_file(spool_dir, "a.json", "worker-1").endswith("a.json.worker-1")
+    assert claim_file(spool_dir, "a.json", "worker-2") is None
+
+
+def test_process_pending_skips_claimed_files(monkeypatch, records, spool_dir):
+    """Test that a file claimed by another worker after the listing is skipped"""
+    _drop(spool_dir, "a.json", "[]")
+    monkeypatch.setattr("app.tools.spool.claim_file", lambda *args: None)
+
+    assert process_pending(records, spool_dir, "mock-worker") == []
+    assert os.listdir(os.path.join(spool_dir, "processing")) == []
+
+
+def test_run_watches_new_files(records, spool_dir):
+    """Test that the worker picks up the files dropped while it is watching"""
+    _drop(spool_dir, "a.json", json.dumps([VENDOR_MESSAGE]))
+    stop_event = threading.Event()
+    worker = threading.Thread(target=run, args=(records, None, stop_event))
+    worker.start()
+
+    try:
+        done_path = os.path.join(spool_dir, "done", "b.ndjson")
+        deadline = time.monotonic() + 10
+        while not os.path.exists(os.path.join(spool_dir, "done", "a.json")):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        _drop(spool_dir, "b.ndjson", json.dumps(VENDOR_MESSAGE))
+        while not os.path.exists(done_path):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        stop_event.set()
+        worker.join(timeout=10)
+
+    assert len(records.output.records) == 2
+
+
+def test_main_runs_worker(monkeypatch, spool_dir):
+    """Test that the CLI starts the worker with the given options"""
+    calls = []
+    monkeypatch.setattr(
+        "app.tools.spool.run", lambda *args: calls.append(args), raising=True
+    )
+
+    main([spool_dir, "--worker-id", "worker-1", "--chunk-size", "10"])
+
+    [(records, worker_id)] = calls
+    assert worker_id == "worker-1"
+    assert records.settings.spool_dir == spool_dir
+    assert records.settings.spool_chunk_size == 10
+    assert records.follows_output_file is False
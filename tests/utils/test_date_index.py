@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from app.utils.date_index import InvoiceDateIndex
+from app.utils.file_writer import append_output_to_jsonl
+
+
+def _append_invoice(output_file, company, invoice_id, invoice_date):
+    append_output_to_jsonl(
+        company,
+        "invoice",
+        {
+            "invoiceId": invoice_id,
+            "invoiceDate": invoice_date,
+            "account": "STD-001",
+            "lines": [{"description": "Mock Line", "amount": 1.0}],
+        },
+        output_file=output_file,
+    )
+
+
+@pytest.fixture
+def output_file(tmp_path):
+    """Fixture with invoices appended out of date order, and other records in between"""
+    output_file = str(tmp_path / "output.jsonl")
+    _append_invoice(output_file, "A", "INV3", "2025-03-20")
+    append_output_to_jsonl(
+        "A", "vendor", {"other": {"record_type": "invoice"}}, output_file
+    )
+    _append_invoice(output_file, "A", "INV1", "2025-03-10")
+    _append_invoice(output_file, "B", "INV2", "2025-03-15")
+    # Written before invoice dates were normalized
+    _append_invoice(output_file, "A", "INV0", "15/03/2025")
+    _append_invoice(output_file, "A", "INV4", "2025-04-01")
+    return output_file
+
+
+def _invoice_ids(lines):
+    return [json.loads(line)["data"]["invoiceId"] for line in lines]
+
+
+def test_date_index_range_in_date_order(output_file):
+    """Test that a range returns the matching invoices sorted by date, bounds inclusive"""
+    index = InvoiceDateIndex(output_file)
+    index.refresh()
+
+    assert len(index) == 4
+    assert _invoice_ids(index.iter_records("2025-03-10", "2025-03-20")) == [
+        "INV1",
+        "INV2",
+        "INV3",
+    ]
+    assert _invoice_ids(index.iter_records(date_from="2025-03-16")) == ["INV3", "INV4"]
+    assert _invoice_ids(index.iter_records(date_to="2025-03-10")) == ["INV1"]
+    assert _invoice_ids(index.iter_records("2025-05-01", "2025-06-01")) == []
+
+
+def test_date_index_company_filter(output_file):
+    """Test that only the records of the requested company are streamed"""
+    index = InvoiceDateIndex(output_file)
+    index.refresh()
+
+    assert _invoice_ids(index.iter_records(company="B")) == ["INV2"]
+
+
+def test_date_index_follows_appends(output_file):
+    """Test that a refresh only indexes the newly appended invoices"""
+    index = InvoiceDateIndex(output_file)
+    index.refresh()
+    _append_invoice(output_file, "A", "INV5", "2025-03-01")
+    index.refresh()
+    index.refresh()
+
+    assert len(index) == 5
+    assert _invoice_ids(index.iter_records(date_to="2025-03-10")) == ["INV5", "INV1"]
+
+
+def test_date_index_missing_output_file(tmp_path):
+    """Test that an index of a missing output file is empty"""
+    index = InvoiceDateIndex(str(tmp_path / "missing.jsonl"))
+    index.refresh()
+
+    assert list(index.iter_records()) == []
@@ -0,0 +1,36 @@
+import re
+
+import pytest
+
+from app.enums import InvoiceEnum
+from app.utils.dates import date_ordinal, normalize_invoice_date
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2025-03-15",
+        " 2025-03-15 ",
+        "20250315",
+        "2025-03-15T10:30:00",
+        "2025-03-15 10:30",
+    ],
+)
+def test_normalize_invoice_date_formats(value):
+    """Test that the accepted date formats are normalized to YYYY-MM-DD"""
+    assert normalize_invoice_date(value) == "2025-03-15"
+
+
+@pytest.mark.parametrize("value", ["15/03/2025", "2025-02-30", "", "March 15"])
+def test_normalize_invoice_date_invalid(value):
+    """Test that invalid dates raise a ValueError with a user-friendly message"""
+    with pytest.raises(
+        ValueError, match=re.escape(InvoiceEnum.INVOICE_DATE_INVALID_MSSG)
+    ):
+        normalize_invoice_date(value)
+
+
+def test_date_ordinal_is_ordered():
+    """Test that ordinals preserve the date order"""
+    assert date_ordinal("2025-03-15") + 1 == date_ordinal("2025-03-16")
+    assert date_ordinal("2024-12-31") < date_ordinal("2025-01-01")
@@ -0,0 +1,103 @@
+import asyncio
+import gzip
+import os
+import zlib
+
+import pytest
+
+from app.utils.decompression import (
+    DecompressionError,
+    DecompressionLimitError,
+    LineTooLongError,
+    StreamingDecompressor,
+    UnsupportedEncodingError,
+    iter_decompressed,
+    iter_lines,
+)
+
+BODY = b"".join(b'{"seq": %d, "record_type": "vendor"}\n' % seq for seq in range(5000))
+
+
+def _decompress(body, encoding="gzip", chunk_size=100, max_size=10**9, max_ratio=1000):
+    decompressor = StreamingDecompressor(encoding, max_size, max_ratio)
+    output = b"".join(
+        output
+        for i in range(0, len(body), chunk_size)
+        for output in decompressor.decompress(body[i : i + chunk_size])
+    )
+    decompressor.finish()
+    return output
+
+
+@pytest.mark.parametrize(
+    "encoding, compress",
+    [("gzip", gzip.compress), ("x-gzip", gzip.compress), ("deflate", zlib.compress)],
+)
+def test_decompress_in_chunks(encoding, compress):
+    """Test that a body is decompressed whatever its chunks"""
+    assert _decompress(compress(BODY), encoding) == BODY
+    assert _decompress(compress(BODY), encoding, chunk_size=10**6) == BODY
+
+
+def test_decompress_limits():
+    """Test that the bodies over the size or ratio limits are rejected while decompressing"""
+    with pytest.raises(DecompressionLimitError):
+        _decompress(gzip.compress(BODY), max_size=len(BODY) - 1)
+
+    # A zip bomb is rejected once the ratio check kicks in, long before it is inflated
+    bomb = gzip.compress(b"\0" * 100 * 1024 * 1024)
+    decompressor = StreamingDecompressor("gzip", 10**10, 100)
+    with pytest.raises(DecompressionLimitError):
+        for _ in decompressor.decompress(bomb):
+            pass
+    assert decompressor.size <= 1024 * 1024 + 64 * 1024
+
+    # Incompressible data is under any ratio
+    data = os.urandom(2 * 1024 * 1024)
+    assert _decompress(gzip.compress(data), max_ratio=2) == data
+
+
+def test_decompress_errors():
+    """Test that corrupt, truncated and unsupported bodies raise a DecompressionError"""
+    with pytest.raises(DecompressionError):
+        _decompress(b"not gzip data")
+    with pytest.raises(DecompressionError):
+        _decompress(gzip.compress(BODY)[:-20])
+    with pytest.raises(UnsupportedEncodingError):
+        StreamingDecompressor("br", 10**9, 100)
+    # Its output can't be bounded per step
+    with pytest.raises(UnsupportedEncodingError):
+        StreamingDecompressor("zstd", 10**9, 100)
+
+
+def test_iter_decompressed_lines():
+    """Test that a compressed NDJSON stream is split into lines as it is decompressed"""
+
+    async def chunks(data):
+        for i in range(0, len(data), 1000):
+            yield data[i : i + 1000]
+
+    async def collect():
+        decompressor = StreamingDecompressor("gzip", 10**9, 1000)
+        decompressed = iter_decompressed(
+            chunks(gzip.compress(BODY + b"{}")), decompressor
+        )
+        return [line async for line in iter_lines(decompressed)]
+
+    lines = asyncio.run(collect())
+    assert lines == BODY.split(b"\n")[:-1] + [b"{}"]
+
+
+@pytest.mark.parametrize("body", [b"{}\n" + b"x" * 11, b"x" * 11 + b"\n{}"])
+def test_iter_lines_max_line_size(body):
+    """Test that a line exceeding the maximum size is rejected before it ends"""
+
+    async def chunks():
+        for i in range(len(body)):
+            yield body[i : i + 1]
+
+    async def collect():
+        return [line async for line in iter_lines(chunks(), max_line_size=10)]
+
+    with pytest.raises(LineTooLongError):
+        asyncio.run(collect())
@@ -0,0 +1,196 @@
+import csv
+
+import pytest
+
+from app.utils.export import (
+    TABLE_COLUMNS,
+    export_tables,
+    invoice_date_filter,
+    iter_csv_chunks,
+    iter_row_groups,
+    iter_table_rows,
+)
+from app.utils.file_writer import append_output_to_jsonl
+from app.utils.output_reader import iter_output_records
+
+
+@pytest.fixture
+def output_file(tmp_path):
+    """Fixture with an output file holding vendor and invoice records of two companies"""
+    output_file = str(tmp_path / "output.jsonl")
+    append_output_to_jsonl(
+        "A",
+        "vendor",
+        {"vendorName": "Mock Vendor", "country": "FR", "bank": "Mock Bank"},
+        output_file=output_file,
+    )
+    append_output_to_jsonl(
+        "A",
+        "invoice",
+        {
+            "invoiceId": "INV1001",
+            "invoiceDate": "2025-03-15",
+            "account": "ALC-001",
+            "lines": [
+                {"description": "Office supplies", "amount": 150.0},
+                {"description": "Beverages - alcohol", "amount": 200.0},
+            ],
+        },
+        output_file=output_file,
+    )
+    append_output_to_jsonl(
+        "B",
+        "invoice",
+        {
+            "invoiceId": "INV2001",
+            "invoiceDate": "2025-04-01",
+            "account": "STD-B",
+            "lines": [{"description": "Stationery", "amount": 50.0}],
+        },
+        output_file=output_file,
+    )
+    return output_file
+
+
+def test_iter_output_records_filters_and_offsets(output_file):
+    """Test that the scan applies the pushed down filters and reports the byte offset of each record"""
+    records = list(iter_output_records(output_file, record_type="invoice"))
+    assert [record["data"]["invoiceId"] for _, record in records] == [
+        "INV1001",
+        "INV2001",
+    ]
+
+    # Resuming from an offset starts exactly at that record
+    offset = records[1][0]
+    assert list(iter_output_records(output_file, start_offset=offset)) == [records[1]]
+
+    assert [
+        record["company"] for _, record in iter_output_records(output_file, company="B")
+    ] == ["B"]
+
+
+def test_iter_output_records_nested_fields_dont_match(tmp_path):
+    """Test that nested fields matching the raw filter are discarded once decoded"""
+    output_file = str(tmp_path / "output.jsonl")
+    nested = {"other": {"company": "A", "record_type": "vendor"}}
+    append_output_to_jsonl("B", "invoice", nested, output_file=output_file)
+
+    assert list(iter_output_records(output_file, company="A")) == []
+    assert list(iter_output_records(output_file, record_type="vendor")) == []
+
+
+def test_iter_output_records_missing_file(tmp_path):
+    """Test that a missing output file yields no records"""
+    assert list(iter_output_records(str(tmp_path / "missing.jsonl"))) == []
+
+
+def test_iter_output_records_skips_partial_tail(output_file):
+    """Test that a partially written last line is not decoded"""
+    with open(output_file, "a") as f:
+        f.write('{"company": "A", "record_')
+
+    assert len(list(iter_output_records(output_file))) == 3
+
+
+def test_iter_table_rows_flattens_invoice_lines(output_file):
+    """Test that invoice lines are flattened into a child table keyed by invoiceId"""
+    rows = list(iter_table_rows("invoice_lines", output_file))
+    assert rows == [
+        ("A", "INV1001", 1, "Office supplies", 150.0),
+        ("A", "INV1001", 2, "Beverages - alcohol", 200.0),
+        ("B", "INV2001", 1, "Stationery", 50.0),
+    ]
+
+    invoices = list(iter_table_rows("invoices", output_file))
+    assert invoices[0] == ("A", "INV1001", "2025-03-15", "ALC-001", 2, 350.0)
+
+
+def test_iter_table_rows_date_range(output_file):
+    """Test that the date range filter is inclusive on both ends"""
+    rows = iter_table_rows("invoices", output_file, date_from="2025-04-01")
+    assert [row[1] for row in rows] == ["INV2001"]
+
+    rows = iter_table_rows("invoices", output_file, date_to="2025-03-15")
+    assert [row[1] for row in rows] == ["INV1001"]
+
+
+def test_iter_table_rows_normalized_dates(output_file):
+    """Test that the range and the stored dates are normalized before being compared"""
+    for invoice_id, invoice_date in (("INV3001", "2025-03-20T08:00:00"), ("X", "?")):
+        append_output_to_jsonl(
+            "A",
+            "invoice",
+            {
+                "invoiceId": invoice_id,
+                "invoiceDate": invoice_date,
+                "account": "STD-001",
+                "lines": [],
+            },
+            output_file=output_file,
+        )
+
+    rows = iter_table_rows(
+        "invoices", output_file, date_from="20250316", date_to="2025-04-01T00:00"
+    )
+    assert [row[1] for row in rows] == ["INV2001", "INV3001"]
+    assert not invoice_date_filter()(b'{"record_type": "invoice"}')
+
+    # Invoices whose date can't be parsed are only exported without a date range
+    assert len(list(iter_table_rows("invoices", output_file))) == 4
+    # The range doesn't apply to vendors
+    assert len(list(iter_table_rows("vendors", output_file, date_to="2000-01-01"))) == 1
+
+    with pytest.raises(ValueError):
+        list(iter_table_rows("invoices", output_file, date_from="15/03/2025"))
+
+
+def test_iter_row_groups_bounded_size():
+    """Test that rows are grouped in row groups of at most the requested size"""
+    groups = list(iter_row_groups(iter([(i,) for i in range(5)]), row_group_size=2))
+    assert [len(group) for group in groups] == [2, 2, 1]
+
+
+def test_iter_csv_chunks_one_chunk_per_row_group(output_file):
+    """Test that the CSV stream starts with the header and yields one chunk per row group"""
+    chunks = list(iter_csv_chunks("invoice_lines", output_file, row_group_size=2))
+    assert len(chunks) == 2
+    assert chunks[0].splitlines()[0] == ",".join(TABLE_COLUMNS["invoice_lines"])
+
+    # Empty tables still contain the header
+    assert list(iter_csv_chunks("vendors", output_file, company="B")) == [
+        ",".join(TABLE_COLUMNS["vendors"]) + "\r\n"
+    ]
+
+
+def test_export_tables_csv(output_file, tmp_path):
+    """Test that the CSV export writes one file per table matching the record type"""
+    written = export_tables(
+        str(tmp_path / "export"),
+        record_type="invoice",
+        output_file=output_file,
+        company="A",
+    )
+    assert [path.rsplit("/", 1)[1] for path in written] == [
+        "invoices.csv",
+        "invoice_lines.csv",
+    ]
+
+    with open(written[1], newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["lineNumber"] for row in rows] == ["1", "2"]
+
+
+def test_export_tables_parquet(output_file, tmp_path):
+    """Test that the Parquet export keeps the row groups bounded"""
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    written = export_tables(
+        str(tmp_path / "export"),
+        file_format="parquet",
+        row_group_size=2,
+        output_file=output_file,
+    )
+    lines = pq.ParquetFile(written[2])
+    assert lines.metadata.num_rows == 3
+    assert lines.num_row_groups == 2
+    assert lines.schema_arrow.field("amount").type == "double"
@@ -0,0 +1,328 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.enums import AppEnum
+from app.main import create_app
+from app.settings import Settings
+from app.utils.fair_scheduler import (
+    FairScheduler,
+    QuotaExceededError,
+    TokenBucket,
+    parse_company_values,
+)
+
+VENDOR_BODY = {
+    "company": "A",
+    "vendorName": "Mock Vendor Name",
+    "country": "FR",
+    "bank": "Mock Bank",
+}
+
+
+class FakeClock:
+    def __init__(self, monkeypatch):
+        self.now = 0.0
+        monkeypatch.setattr("app.utils.fair_scheduler.time.monotonic", lambda: self.now)
+
+
+def test_parse_company_values():
+    assert parse_company_values(" A=3, B = 1.5:2 ,") == {"A": "3", "B": "1.5:2"}
+    assert parse_company_values("") == {}
+    for value in ("A", "=3"):
+        with pytest.raises(ValueError, match="Invalid company value"):
+            parse_company_values(value)
+
+
+def test_token_bucket(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    bucket = TokenBucket.parse("10:20")
+    assert bucket.take(25) == 20
+    assert bucket.retry_after(5) == 0.5
+    clock.now = 0.25
+    assert bucket.take(5) == 2
+    # A request larger than a burst waits at most for a full burst
+    assert bucket.retry_after(100) == pytest.approx(1.95)
+    clock.now = 100
+    assert bucket.tokens == 0.5 and bucket.take(30) == 20
+
+    assert TokenBucket.parse("0.5").burst == 1
+    with pytest.raises(ValueError, match="positive"):
+        TokenBucket(0)
+
+
+def _run_jobs(scheduler: FairScheduler, jobs: list[tuple[str, int]]) -> list[str]:
+    """
+    Queue jobs `(company, cost)` behind a running job, returning the order in which they
+    ran once it completes
+    """
+    order = []
+    release = threading.Event()
+
+    async def run():
+        blocker = asyncio.ensure_future(scheduler.run("X", release.wait, cost=0))
+        await asyncio.sleep(0.01)
+        tasks = [
+            asyncio.ensure_future(
+                scheduler.run(company, order.append, company, cost=cost)
+            )
+            for company, cost in jobs
+        ]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+
+    asyncio.run(run())
+    return order
+
+
+def test_weighted_round_robin():
+    """Test that the companies take turns in proportion to their weight"""
+    scheduler = FairScheduler(["A", "B", "C"], weights="A=2", concurrency=1)
+    order = _run_jobs(scheduler, [("A", 50)] * 6 + [("B", 50)] * 3 + [("C", 100)] * 2)
+    assert order == ["A", "A", "B", "A", "A", "B", "C", "A", "A", "B", "C"]
+
+    stats = scheduler.stats()["companies"]
+    assert stats["A"]["weight"] == 2 and stats["B"]["weight"] == 1
+    assert stats["A"]["scheduled_jobs"] == 6
+    assert stats["C"]["scheduled_records"] == 200
+    assert stats["A"]["wait"]["max"] >= stats["A"]["wait"]["mean"] > 0
+    assert stats["A"]["queued_jobs"] == 0 and not stats["A"]["running_jobs"]
+
+
+def _max_running(scheduler: FairScheduler) -> tuple[dict, list]:
+    """Run 5 jobs of companies A and B, returning the most running at once and the order"""
+    running = {"A": 0, "B": 0}
+    max_running = {"A": 0, "B": 0}
+    order = []
+    lock = threading.Lock()
+
+    def job(company, seq):
+        with lock:
+            running[company] += 1
+            max_running[company] = max(max_running[company], running[company])
+        threading.Event().wait(0.005)
+        with lock:
+            running[company] -= 1
+            order.append((company, seq))
+
+    async def run():
+        await asyncio.gather(
+            *(
+                scheduler.run(company, job, company, seq)
+                for seq in range(5)
+                for company in ("A", "B")
+            )
+        )
+
+    asyncio.run(run())
+    return max_running, order
+
+
+def test_one_job_per_company():
+    """Test that the jobs of a company run one at a time, in order"""
+    max_running, order = _max_running(FairScheduler(["A", "B"], concurrency=4))
+    assert max_running == {"A": 1, "B": 1}
+    assert [seq for company, seq in order if company == "A"] == list(range(5))
+
+
+def test_company_concurrency():
+    """Test that a company runs up to `company_concurrency` jobs at once"""
+    scheduler = FairScheduler(["A", "B"], concurrency=4, company_concurrency=2)
+    max_running, _ = _max_running(scheduler)
+    assert max_running["A"] == max_running["B"] == 2
+    assert scheduler.stats()["companies"]["A"]["running_jobs"] == 0
+
+
+def test_quota_exceeded(monkeypatch):
+    FakeClock(monkeypatch)
+    scheduler = FairScheduler(["A"], quotas="A=2:3")
+
+    async def run(cost):
+        return await scheduler.run("A", lambda: "done", cost=cost)
+
+    assert asyncio.run(run(3)) == "done"
+    with pytest.raises(QuotaExceededError) as error:
+        asyncio.run(run(1))
+    assert (error.value.company, error.value.retry_after) == ("A", 0.5)
+    # A job is admitted as a whole or not at all
+    with pytest.raises(QuotaExceededError) as error:
+        asyncio.run(run(2))
+    assert scheduler.quotas["A"].tokens == 0
+    stats = scheduler.stats()["companies"]["A"]
+    assert stats["quota"] == {"rate": 2, "burst": 3}
+    assert (stats["scheduled_records"], stats["limited_records"]) == (3, 3)
+
+
+def test_default_tenant(monkeypatch):
+    """Test that unknown companies share a tenant, known ones getting their own quota"""
+    FakeClock(monkeypatch)
+    scheduler = FairScheduler(["A", "B"], quotas="*=1", concurrency=0)
+    assert scheduler.tenant("A") == "A"
+    assert scheduler.tenant("Z") == scheduler.tenant(None) == "*"
+
+    async def run(company):
+        return await scheduler.run(company, lambda: company)
+
+    assert [asyncio.run(run(company)) for company in ("A", "B", "Z")] == ["A", "B", "Z"]
+    for company in ("A", "B", "Y"):
+        with pytest.raises(QuotaExceededError):
+            asyncio.run(run(company))
+    assert scheduler.stats()["concurrency"] == 0
+    assert scheduler.stats()["companies"]["*"]["limited_records"] == 1
+
+
+def test_invalid_weights():
+    with pytest.raises(ValueError, match="positive"):
+        FairScheduler(weights="A=0")
+
+
+def test_full_queue():
+    """Test that the jobs over the queue limit of a company are rejected"""
+    scheduler = FairScheduler(["A"], concurrency=1, max_queued=2)
+    with pytest.raises(QuotaExceededError) as error:
+        _run_jobs(scheduler, [("A", 1)] * 3)
+    assert error.value.retry_after == 1
+    assert scheduler.stats()["companies"]["A"]["limited_records"] == 1
+
+
+def test_cancelled_jobs():
+    """Test that the cancelled jobs are skipped, or release their slot"""
+    scheduler = FairScheduler(["A", "B", "C"], concurrency=1)
+    release = threading.Event()
+    order = []
+
+    async def run():
+        blocker = asyncio.ensure_future(scheduler.run("A", release.wait))
+        await asyncio.sleep(0.01)
+        waiting = asyncio.ensure_future(scheduler.run("B", order.append, "B1"))
+        granted = asyncio.ensure_future(scheduler.run("C", order.append, "C1"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        # The next job gets its turn, but is cancelled before running
+        scheduler.concurrency = 2
+        scheduler._dispatch()
+        granted.cancel()
+        await asyncio.gather(waiting, granted, return_exceptions=True)
+        assert scheduler.stats()["companies"]["C"]["running_jobs"] == 0
+        release.set()
+        await blocker
+        await scheduler.run("B", order.append, "B2")
+
+    asyncio.run(run())
+    assert order == ["B2"]
+    assert scheduler.stats()["companies"]["C"]["scheduled_jobs"] == 0
+
+
+def test_run_batch(monkeypatch):
+    """Test that a batch is processed per company in slices, in the order of its items"""
+    FakeClock(monkeypatch)
+    scheduler = FairScheduler(["A", "B"], quotas="B=3", slice_size=2)
+    calls = []
+
+    def process(items):
+        calls.append([item["seq"] for item in items])
+        return [item["seq"] * 10 for item in items]
+
+    items = [{"seq": seq, "company": "AB"[seq % 2]} for seq in range(9)]
+    results = asyncio.run(
+        scheduler.run_batch(
+            process,
+            items,
+            lambda item: item["company"],
+            lambda item, retry_after: ("limited", retry_after),
+            lambda item, error: ("failed", str(error)),
+        )
+    )
+
+    assert results == [0, 10, 20, 30, 40, 50, 60, ("limited", 1 / 3), 80]
+    assert sorted(calls) == [[0, 2], [1, 3], [4, 6], [5], [8]]
+
+
+def test_run_batch_full_queue():
+    scheduler = FairScheduler(["A"], concurrency=1, max_queued=0)
+    results = asyncio.run(
+        scheduler.run_batch(
+            lambda items: items,
+            [1, 2],
+            lambda item: "A",
+            lambda item, after: after,
+            lambda item, error: error,
+        )
+    )
+    assert results == [1, 1]
+
+
+def test_run_batch_failed_slice():
+    """Test that the items of a failed slice get an error, the other slices their results"""
+    scheduler = FairScheduler(["A", "B"], slice_size=2)
+
+    def process(items):
+        if items[0]["company"] == "B":
+            raise OSError("Write failed")
+        return [item["seq"] for item in items]
+
+    items = [{"seq": seq, "company": "AB"[seq % 2]} for seq in range(4)]
+    results = asyncio.run(
+        scheduler.run_batch(
+            process,
+            items,
+            lambda item: item["company"],
+            lambda item, retry_after: ("limited", retry_after),
+            lambda item, error: ("failed", str(error)),
+        )
+    )
+    assert results == [0, ("failed", "Write failed"), 2, ("failed", "Write failed")]
+
+
+def _client(**settings) -> TestClient:
+    return TestClient(create_app(Settings(output_backend="memory", **settings)))
+
+
+def test_vendor_quota_exceeded():
+    with _client(company_quotas="A=0.5") as client:
+        assert client.post("/vendor-record", json=VENDOR_BODY).status_code == 201
+        response = client.post("/vendor-record", json=VENDOR_BODY)
+        # Other companies aren't limited
+        other = client.post("/vendor-record", json={**VENDOR_BODY, "company": "B"})
+        stats = client.get("/stats/scheduler").json()
+
+    assert response.status_code == 429
+    assert response.json()["detail"] == AppEnum.RATE_LIMITED_MSSG
+    assert response.headers["Retry-After"] == "2"
+    assert other.status_code == 201
+    assert stats["companies"]["A"]["limited_records"] == 1
+    assert stats["companies"]["B"]["scheduled_records"] == 1
+
+
+def test_invoice_quota_exceeded():
+    invoice = {
+        "company": "B",
+        "invoiceId": "INV1",
+        "invoiceDate": "2025-03-15",
+        "lines": [{"description": "Tobacco", "amount": 10.0}],
+    }
+    with _client(company_quotas="B=1") as client:
+        responses = [client.post("/invoice-record", json=invoice) for _ in range(2)]
+        assert len(client.app.state.records.output.records) == 1
+    assert [response.status_code for response in responses] == [201, 429]
+    assert responses[1].headers["Retry-After"] == "1"
+
+
+def test_batch_quota_exceeded():
+    messages = [
+        {"seq": seq, "record_type": "vendor", "data": VENDOR_BODY} for seq in range(4)
+    ]
+    with _client(company_quotas="A=2") as client:
+        acks = client.post("/records/batch", json=messages).json()["acks"]
+        with client.websocket_connect("/ws/records") as websocket:
+            websocket.receive_json()
+            websocket.send_json(messages[0])
+            (ack,) = websocket.receive_json()["acks"]
+
+    assert [ack["status_code"] for ack in acks] == [201, 201, 429, 429]
+    assert acks[2]["detail"] == AppEnum.RATE_LIMITED_MSSG
+    assert 0 < acks[2]["retry_after"] <= 0.5
+    assert ack["status_code"] == 429
@@ -0,0 +1,240 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.settings import Settings
+from app.utils.forwarding import ForwardingSink
+
+VENDOR_BODY = {
+    "company": "A",
+    "vendorName": "Mock Vendor Name",
+    "country": "FR",
+    "bank": "Mock Bank",
+}
+
+
+class StubIngestionServer:
+    """Local ingestion API answering with the given status codes, then accepting"""
+
+    def __init__(self):
+        self.responses: list[tuple[int, dict]] = []
+        self.batches: list[list[dict]] = []
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                stub.requests += 1
+                status, headers = stub.responses.pop(0) if stub.responses else (200, {})
+                if status == 200:
+                    stub.batches.append(json.loads(body))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/ingest"
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.01,), daemon=True
+        ).start()
+
+    @property
+    def records(self) -> list[dict]:
+        return [record for batch in self.batches for record in batch]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    stub = StubIngestionServer()
+    yield stub
+    stub.close()
+
+
+def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def _sink(stub, tmp_path, **options) -> ForwardingSink:
+    return ForwardingSink(
+        [stub.url],
+        str(tmp_path / "queue"),
+        batch_interval=0.02,
+        backoff_base=0.01,
+        **options,
+    )
+
+
+def _append(sink, start: int, count: int):
+    for seq in range(start, start + count):
+        sink.append("A", "vendor", {"vendorName": f"Vendor {seq}"})
+
+
+def test_forward_batches(stub, tmp_path):
+    """Test that the records are delivered in batches, with their latency"""
+    sink = _sink(stub, tmp_path, batch_size=3)
+    sink.start()
+    try:
+        _append(sink, 0, 7)
+        _wait_for(lambda: len(stub.records) == 7)
+    finally:
+        sink.close()
+
+    assert stub.records[0] == {
+        "company": "A",
+        "record_type": "vendor",
+        "data": {"vendorName": "Vendor 0"},
+    }
+    assert [len(batch) for batch in stub.batches] == [3, 3, 1]
+    (stats,) = sink.stats()["destinations"]
+    assert stats["url"] == stub.url
+    assert stats["delivered_records"] == 7
+    assert stats["delivered_batches"] == 3
+    assert stats["pending_records"] == stats["backlog_records"] == 0
+    assert 0 <= stats["delivery_latency"]["mean"] <= stats["delivery_latency"]["max"]
+
+
+def test_forward_retry_queue(stub, tmp_path):
+    """Test that the batches of a failing destination are queued on disk and retried in
+    order, new records being queued behind them"""
+    stub.responses = [(503, {}), (503, {}), (429, {"Retry-After": "0.1"})]
+    sink = _sink(stub, tmp_path, batch_size=2)
+    sink.start()
+    try:
+        _append(sink, 0, 2)
+        _wait_for(lambda: stub.requests >= 1)
+        _append(sink, 2, 3)
+        _wait_for(lambda: len(stub.records) == 5)
+    finally:
+        sink.close()
+
+    assert [record["data"]["vendorName"] for record in stub.records] == [
+        f"Vendor {seq}" for seq in range(5)
+    ]
+    (stats,) = sink.stats()["destinations"]
+    assert stats["failed_attempts"] == 3
+    assert stats["backlog_batches"] == 0
+    assert [name for name in os.listdir(sink.destinations[0].queue_dir)] == ["rejected"]
+
+
+def test_forward_queue_survives_restart(stub, tmp_path):
+    """Test that the records not delivered are kept on disk until the next start"""
+    sink = _sink(stub, tmp_path)
+    _append(sink, 0, 3)
+    sink.close()
+    assert sink.stats()["destinations"][0]["backlog_records"] == 3
+    assert stub.requests == 0
+
+    sink = _sink(stub, tmp_path)
+    assert sink.stats()["destinations"][0]["backlog_records"] == 3
+    sink.start()
+    try:
+        _append(sink, 3, 1)
+        _wait_for(lambda: len(stub.records) == 4)
+    finally:
+        sink.close()
+    assert [record["data"]["vendorName"] for record in stub.records] == [
+        f"Vendor {seq}" for seq in range(4)
+    ]
+
+
+def test_forward_rejected(stub, tmp_path):
+    """Test that the batches rejected by the destination are kept aside, not retried"""
+    stub.responses = [(400, {}), (503, {}), (422, {})]
+    sink = _sink(stub, tmp_path, batch_size=1)
+    sink.start()
+    try:
+        _append(sink, 0, 1)
+        _wait_for(lambda: stub.requests == 1)
+        _append(sink, 1, 2)
+        _wait_for(lambda: len(stub.records) == 1)
+    finally:
+        sink.close()
+
+    assert stub.records[0]["data"]["vendorName"] == "Vendor 2"
+    (stats,) = sink.stats()["destinations"]
+    assert stats["rejected_batches"] == 2
+    rejected = sorted(os.listdir(sink.destinations[0].rejected_dir))
+    assert len(rejected) == 2
+    with open(os.path.join(sink.destinations[0].rejected_dir, rejected[1])) as f:
+        [[_, record]] = json.load(f)
+    assert record["data"]["vendorName"] == "Vendor 1"
+
+
+def test_forward_destination_down(tmp_path):
+    """Test that the records are queued on disk while a destination is unreachable"""
+    stub = StubIngestionServer()
+    stub.close()
+    sink = _sink(stub, tmp_path, batch_size=1, timeout=0.5)
+    sink.start()
+    try:
+        start = time.perf_counter()
+        _append(sink, 0, 50)
+        # Queuing the records never waits for the destination
+        assert time.perf_counter() - start < 0.5
+        _wait_for(lambda: sink.stats()["destinations"][0]["failed_attempts"] >= 1)
+    finally:
+        sink.close()
+    (stats,) = sink.stats()["destinations"]
+    assert stats["backlog_records"] == 50
+    assert stats["delivered_records"] == 0
+
+
+def test_forwarding_service(stub, tmp_path):
+    """Test that the records written by the service are forwarded"""
+    settings = Settings(
+        output_backend="memory",
+        forward_urls=f" {stub.url}, ",
+        forward_queue_dir=str(tmp_path / "queue"),
+        forward_batch_interval=0.02,
+    )
+    with TestClient(create_app(settings)) as client:
+        client.post("/vendor-record", json=VENDOR_BODY)
+        client.post(
+            "/invoice-record",
+            json={
+                "company": "B",
+                "invoiceId": "INV1",
+                "invoiceDate": "2025-03-15",
+                "lines": [{"description": "Tobacco", "amount": 10.0}],
+            },
+        )
+        # Delivered once the destination has answered
+        _wait_for(
+            lambda: client.get("/stats/forwarding").json()["destinations"][0][
+                "delivered_records"
+            ]
+            == 2
+        )
+
+    assert [record["record_type"] for record in stub.records] == ["vendor", "invoice"]
+
+    with TestClient(create_app(Settings(output_backend="memory"))) as client:
+        assert client.get("/stats/forwarding").json() == {"destinations": []}
+
+
+def test_record_service_imports_forwarding_lazily():
+    """Test that the record service only loads the HTTP client to forward records"""
+    code = "import sys, app.services.records; assert 'httpx' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,183 @@
+import json
+import os
+
+import pytest
+
+from app.utils.file_writer import append_output_to_jsonl
+from app.utils.invoice_stats import InvoiceAggregates, to_cents
+
+
+def _append_invoice(output_file, company, account, invoice_date, amounts):
+    append_output_to_jsonl(
+        company,
+        "invoice",
+        {
+            "invoiceId": "INV1001",
+            "invoiceDate": invoice_date,
+            "account": account,
+            "lines": [
+                {"description": "Mock Line", "amount": amount} for amount in amounts
+            ],
+        },
+        output_file=output_file,
+    )
+
+
+@pytest.fixture
+def output_file(tmp_path):
+    return str(tmp_path / "output.jsonl")
+
+
+def test_to_cents_is_exact():
+    """Test that amounts are rounded to the closest hundredth, avoiding float artifacts"""
+    assert to_cents(0.1) + to_cents(0.2) == to_cents(0.3)
+    assert to_cents(150.005) in (15000, 15001)
+
+
+def test_refresh_aggregates_per_company_account_month(output_file):
+    """Test that each invoice is counted once in its (company, account, month) aggregate"""
+    aggregates = InvoiceAggregates(output_file)
+
+    _append_invoice(output_file, "A", "ALC-001", "2025-03-15", [150.0, 200.0])
+    _append_invoice(output_file, "A", "ALC-001", "2025-03-20", [0.1, 0.2])
+    append_output_to_jsonl("A", "vendor", {"vendorName": "Mock"}, output_file)
+    aggregates.refresh()
+    _append_invoice(output_file, "A", "ALC-001", "2025-04-01", [10.0])
+    _append_invoice(output_file, "B", "STD-B", "2025-03-15", [10.0])
+    aggregates.refresh()
+    aggregates.refresh()
+
+    assert aggregates.query(company="A", month="2025-03") == [
+        {
+            "company": "A",
+            "account": "ALC-001",
+            "month": "2025-03",
+            "count": 2,
+            "totalAmount": 350.3,
+            "minAmount": 0.3,
+            "maxAmount": 350.0,
+        }
+    ]
+    assert len(aggregates.query(company="A")) == 2
+    assert len(aggregates.query(account="STD-B")) == 1
+    assert len(aggregates.query()) == 3
+
+
+def test_refresh_normalizes_invoice_dates(output_file):
+    """Test that the month of a non-ISO date is normalized, and unparsable ones skipped"""
+    aggregates = InvoiceAggregates(output_file)
+    _append_invoice(output_file, "A", "STD-001", "2025-03-15", [100.0])
+    _append_invoice(output_file, "A", "STD-001", "20250316", [10.0])
+    _append_invoice(output_file, "A", "STD-001", "2025-03-17T10:00:00", [1.0])
+    _append_invoice(output_file, "A", "STD-001", "15/03/2025", [1000.0])
+    aggregates.refresh()
+    aggregates.checkpoint()
+
+    [aggregate] = aggregates.query()
+    assert (aggregate["month"], aggregate["count"]) == ("2025-03", 3)
+    assert aggregate["totalAmount"] == 111.0
+    assert aggregates.skipped == 1
+
+    restored = InvoiceAggregates(output_file)
+    restored.load_checkpoint()
+    assert restored.skipped == 1
+
+
+def test_checkpoint_restores_without_rescanning(output_file):
+    """Test that a restart resumes from the checkpointed offset"""
+    aggregates = InvoiceAggregates(output_file)
+    _append_invoice(output_file, "A", "STD-001", "2025-03-15", [100.0])
+    aggregates.refresh()
+    aggregates.checkpoint()
+
+    _append_invoice(output_file, "A", "STD-001", "2025-03-16", [50.0])
+
+    restored = InvoiceAggregates(output_file)
+    restored.load_checkpoint()
+    assert restored.offset == aggregates.offset
+    assert restored.query()[0]["count"] == 1
+
+    # Only the record appended after the checkpoint is applied
+    restored.refresh()
+    assert restored.query()[0]["count"] == 2
+    assert restored.query()[0]["totalAmount"] == 150.0
+
+
+def test_checkpoint_every_applied_invoices(output_file):
+    """Test that the aggregates are checkpointed once enough invoices are applied"""
+    aggregates = InvoiceAggregates(output_file, checkpoint_every=2)
+
+    _append_invoice(output_file, "A", "STD-001", "2025-03-15", [100.0])
+    aggregates.refresh()
+    with pytest.raises(FileNotFoundError):
+        open(aggregates.checkpoint_file)
+
+    _append_invoice(output_file, "A", "STD-001", "2025-03-15", [100.0])
+    aggregates.refresh()
+    with open(aggregates.checkpoint_file) as f:
+        assert json.load(f)["offset"] == aggregates.offset
+
+
+def test_load_checkpoint_ignores_truncated_output(output_file):
+    """Test that a checkpoint beyond the end of the output file is discarded"""
+    aggregates = InvoiceAggregates(output_file)
+    _append_invoice(output_file, "A", "STD-001", "2025-03-15", [100.0])
+    aggregates.refresh()
+    aggregates.checkpoint()
+
+    open(output_file, "w").close()
+
+    restored = InvoiceAggregates(output_file)
+    restored.load_checkpoint()
+    assert restored.offset == 0
+    assert restored.query() == []
+
+
+def test_load_checkpoint_ignores_rewritten_output(output_file):
+    """Test that a checkpoint of an output file rewritten since is discarded"""
+    aggregates = InvoiceAggregates(output_file)
+    _append_invoice(output_file, "A", "STD-001", "2025-03-15", [100.0])
+    aggregates.refresh()
+    aggregates.checkpoint()
+
+    # Rewritten in place with another record of the same size
+    with open(output_file, "r+") as f:
+        content = f.read()
+        f.seek(0)
+        f.write(content.replace("2025-03-15", "2025-04-15"))
+
+    restored = InvoiceAggregates(output_file)
+    restored.load_checkpoint()
+    assert restored.offset == 0
+    restored.refresh()
+    assert [aggregate["month"] for aggregate in restored.query()] == ["2025-04"]
+
+
+def test_load_checkpoint_ignores_replaced_output(output_file):
+    """Test that a checkpoint of another file with the same start is discarded"""
+    aggregates = InvoiceAggregates(output_file)
+    _append_invoice(output_file, "A", "STD-001", "2025-03-15", [100.0])
+    aggregates.refresh()
+    aggregates.checkpoint()
+
+    # Replaced by a copy, e.g. restored from a backup
+    with open(output_file) as f:
+        content = f.read()
+    with open(f"{output_file}.new", "w") as f:
+        f.write(content)
+    os.replace(f"{output_file}.new", output_file)
+
+    restored = InvoiceAggregates(output_file)
+    restored.load_checkpoint()
+    assert restored.offset == 0
+
+
+def test_load_checkpoint_missing(output_file):
+    """Test that a missing checkpoint or output file starts from scratch"""
+    aggregates = InvoiceAggregates(output_file)
+    aggregates.load_checkpoint()
+    aggregates.checkpoint()
+
+    restored = InvoiceAggregates(output_file)
+    restored.load_checkpoint()
+    assert restored.offset == 0
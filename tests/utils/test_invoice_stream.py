@@ -0,0 +1,156 @@
+import json
+
+import msgpack
+import pytest
+
+from app.utils.invoice_stream import (
+    InvoiceBodyParser,
+    JsonArrayParser,
+    MsgpackInvoiceParser,
+)
+
+
+def parse(body: bytes, chunk_size: int) -> tuple[InvoiceBodyParser, list]:
+    parser = InvoiceBodyParser()
+    lines = []
+    for i in range(0, len(body), chunk_size):
+        lines.extend(parser.feed(body[i : i + chunk_size]))
+    lines.extend(parser.close())
+    return parser, lines
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 10_000])
+def test_parser_fields_and_lines(chunk_size):
+    """Test that the fields and lines are parsed whatever the chunk boundaries"""
+    invoice = {
+        "company": "B",
+        "lines": [
+            {"description": 'Café "crème"', "amount": 12345.5},
+            {"description": "Tobacco", "amount": 7, "extra": [1, {"a": None}]},
+        ],
+        "invoiceId": "INV1",
+        "other_details": {"vendorName": "Vendor", "tags": [True, False]},
+        "total": 123456789,
+    }
+    body = json.dumps(invoice, indent=2, ensure_ascii=False).encode()
+
+    parser, lines = parse(body, chunk_size)
+
+    assert parser.has_lines
+    assert lines == invoice.pop("lines")
+    assert parser.fields == invoice
+
+
+def test_parser_empty_and_invalid_lines():
+    """Test that an empty object, empty lines and other lines values are parsed"""
+    parser, lines = parse(b" {} ", 1)
+    assert (parser.fields, parser.has_lines, lines) == ({}, False, [])
+
+    parser, lines = parse(b'{"lines": []}', 1)
+    assert (parser.fields, parser.has_lines, lines) == ({}, True, [])
+
+    parser, lines = parse(b'{"lines": null}', 1)
+    assert (parser.fields, parser.has_lines, lines) == ({"lines": None}, False, [])
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"[]",
+        b'{"company" "A"}',
+        b'{"lines": [1 2]}',
+        b"{} {}",
+        b'{"a": tru}',
+        b'{"a": ',
+    ],
+)
+def test_parser_invalid_json(body):
+    """Test that invalid and incomplete bodies raise a ValueError"""
+    with pytest.raises(ValueError):
+        parse(body, 2)
+
+
+@pytest.mark.parametrize("parser_class", [InvoiceBodyParser, JsonArrayParser])
+def test_parser_large_value_decoded_few_times(parser_class):
+    """Test that an incomplete value isn't decoded again on every chunk"""
+
+    class CountingDecoder(json.JSONDecoder):
+        calls = 0
+
+        def raw_decode(self, s, idx=0):
+            CountingDecoder.calls += 1
+            return super().raw_decode(s, idx)
+
+    notes = "x" * 1_000_000
+    body = json.dumps({"notes": notes, "lines": [{"amount": 1}]}).encode()
+    parser = parser_class()
+    parser._decoder = CountingDecoder()
+    items = []
+    for i in range(0, len(body), 1000):
+        items.extend(parser.feed(body[i : i + 1000]))
+    items.extend(parser.close())
+
+    # Decoded at doubling sizes, rather than on each of the 1000 chunks
+    assert CountingDecoder.calls < 30
+    if parser_class is InvoiceBodyParser:
+        assert parser.fields["notes"] == notes and items == [{"amount": 1}]
+    else:
+        assert items == [{"notes": notes, "lines": [{"amount": 1}]}]
+
+
+def test_parser_items_before_error():
+    """Test that the items completed before invalid JSON are returned first"""
+    parser = JsonArrayParser()
+    assert parser.feed(b'[1, {"a": 2}, mock') == [1, {"a": 2}]
+    items = parser.parse(b', {"b": 3}]', final=True)
+    with pytest.raises(ValueError):
+        next(items)
+
+
+@pytest.mark.parametrize(
+    "body, items",
+    [
+        ('[{"a": "é"}, 2, [3, {"b": []}], "]"]', [{"a": "é"}, 2, [3, {"b": []}], "]"]),
+        (" [ ] ", []),
+        ('{"a": [1]}', [{"a": [1]}]),
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 3, 10_000])
+def test_json_array_parser(body, items, chunk_size):
+    """Test that the items of an array are returned whatever the chunk boundaries"""
+    body = body.encode()
+    parser = JsonArrayParser()
+    parsed = []
+    for i in range(0, len(body), chunk_size):
+        parsed.extend(parser.feed(body[i : i + chunk_size]))
+    parsed.extend(parser.close())
+
+    assert parsed == items
+
+
+@pytest.mark.parametrize("body", [b"[1 2]", b"[1,", b"[1] 2", b"[,]", b""])
+def test_json_array_parser_invalid(body):
+    parser = JsonArrayParser()
+    with pytest.raises(ValueError):
+        parser.feed(body)
+        parser.close()
+
+
+def test_msgpack_parser():
+    """Test that a MessagePack body is decoded into its fields and lines when complete"""
+    lines = [{"description": "Tobacco", "amount": 1.5}]
+    body = msgpack.packb({"company": "B", "lines": lines, "invoiceId": "INV1"})
+
+    parser = MsgpackInvoiceParser()
+    assert parser.feed(body[:5]) == parser.feed(body[5:]) == []
+    assert parser.close() == lines
+    assert parser.has_lines
+    assert parser.fields == {"company": "B", "invoiceId": "INV1"}
+
+    parser = MsgpackInvoiceParser()
+    parser.feed(msgpack.packb({"lines": "mock"}))
+    assert (parser.close(), parser.has_lines, parser.fields) == (
+        [],
+        False,
+        {"lines": "mock"},
+    )
@@ -0,0 +1,51 @@
+import os
+import tracemalloc
+
+import jsonlines
+import pytest
+
+from app.settings import MIDDLEWARE_SERVICE_DIR
+from app.utils.memory_profile import MemoryProfiler, module_name
+
+
+def test_module_name():
+    """Test grouping the allocation sites by module"""
+    assert (
+        module_name(
+            os.path.join(MIDDLEWARE_SERVICE_DIR, "app", "services", "vendor.py")
+        )
+        == "app.services.vendor"
+    )
+    assert (
+        module_name(os.path.join(MIDDLEWARE_SERVICE_DIR, "app", "utils", "__init__.py"))
+        == "app.utils"
+    )
+    assert module_name(jsonlines.__file__) == "jsonlines"
+    assert module_name(os.__file__) == "<python>"
+    assert module_name("<frozen importlib._bootstrap>") == "<python>"
+
+
+def test_snapshots_kept():
+    """Test that only the last snapshots are kept, and that tracing is only stopped by
+    the profiler that started it"""
+    profiler = MemoryProfiler(max_snapshots=2)
+    profiler.start()
+    try:
+        other = MemoryProfiler()
+        other.start()
+        other.stop()
+        assert tracemalloc.is_tracing()
+
+        ids = [profiler.take_snapshot()["id"] for _ in range(3)]
+        assert profiler.take_snapshot()["snapshots"] == [ids[2], ids[2] + 1]
+        with pytest.raises(KeyError):
+            profiler.diff(ids[0])
+        assert profiler.diff(ids[2] + 1, base_id=ids[2])["base"] == ids[2]
+    finally:
+        profiler.stop()
+    assert not tracemalloc.is_tracing()
+
+
+def test_should_sample():
+    assert not MemoryProfiler(sample_rate=0).should_sample()
+    assert MemoryProfiler(sample_rate=1).should_sample()
@@ -0,0 +1,140 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.main import create_app
+from app.settings import Settings
+from app.utils.micro_batcher import MicroBatcher
+
+
+class Processor:
+    """Batch processing recording its batches, failing on negative items"""
+
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, items: list) -> list:
+        self.batches.append(items)
+        await asyncio.sleep(0)
+        return [ValueError(item) if item < 0 else item * 10 for item in items]
+
+
+def _submit_all(batcher: MicroBatcher, items: list) -> list:
+    async def run():
+        return await asyncio.gather(
+            *(batcher.submit(item) for item in items), return_exceptions=True
+        )
+
+    return asyncio.run(run())
+
+
+def test_concurrent_items_batched():
+    """Test that the items submitted together are processed in one batch"""
+    process = Processor()
+    batcher = MicroBatcher(process, max_size=10)
+    results = _submit_all(batcher, [1, 2, -3, 4])
+
+    assert process.batches == [[1, 2, -3, 4]]
+    assert results[:2] == [10, 20] and results[3] == 40
+    # The error of an item is raised to its caller only
+    assert isinstance(results[2], ValueError)
+    assert batcher.stats()["max_batch_size"] == 4
+
+
+def test_max_size():
+    process = Processor()
+    batcher = MicroBatcher(process, max_size=2)
+    assert _submit_all(batcher, list(range(5))) == [0, 10, 20, 30, 40]
+    assert process.batches == [[0, 1], [2, 3], [4]]
+    assert batcher.stats()["batches"] == 3
+
+
+def test_adaptive_window():
+    """Test that the window grows with the batches under load, and shrinks back to 0"""
+    process = Processor()
+    batcher = MicroBatcher(process, max_size=10, max_window=0.001)
+    assert batcher.stats()["mean_batch_size"] is None
+    for _ in range(10):
+        _submit_all(batcher, list(range(10)))
+    assert 0 < batcher.window <= 0.001
+
+    for _ in range(20):
+        _submit_all(batcher, [1])
+    assert batcher.window == 0
+    assert process.batches[-1] == [1]
+
+
+def test_process_error():
+    """Test that the items of a failed batch are processed again on their own"""
+    batches = []
+
+    async def process(items):
+        batches.append(items)
+        if any(item < 0 for item in items):
+            raise RuntimeError("Mocked Batch Error")
+        return [item * 10 for item in items]
+
+    results = _submit_all(MicroBatcher(process), [1, -2, 3])
+    assert results[0::2] == [10, 30]
+    assert str(results[1]) == "Mocked Batch Error"
+    assert batches == [[1, -2, 3], [1], [-2], [3]]
+
+
+def test_cancelled_item():
+    """Test that an item whose caller is gone before its batch starts is dropped"""
+    process = Processor()
+    batcher = MicroBatcher(process)
+
+    async def run():
+        cancelled = asyncio.ensure_future(batcher.submit(1))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await batcher.submit(2)
+
+    assert asyncio.run(run()) == 20
+    assert process.batches == [[2]]
+
+
+@pytest.mark.parametrize("path", ["/vendor-record", "/invoice-record"])
+def test_concurrent_requests(path):
+    """Test that concurrent single-record requests are batched, each getting its own result"""
+    app = create_app(Settings(output_backend="memory"))
+
+    def body(seq: int) -> dict:
+        if path == "/vendor-record":
+            return {
+                "company": "AB"[seq % 2],
+                "vendorName": f"Vendor {seq}",
+                "country": "FR",
+                "bank": "Bank",
+            }
+        return {
+            "company": "AB"[seq % 2],
+            "invoiceId": f"INV{seq}",
+            "invoiceDate": "2025-03-15",
+            "lines": [{"description": "Office supplies", "amount": 1.0}],
+            # Vendor names that aren't strings are ignored
+            "other_details": {"vendorName": [seq] if seq % 3 else f"Vendor {seq}"},
+        }
+
+    async def run():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            responses = await asyncio.gather(
+                *(client.post(path, json=body(seq)) for seq in range(20))
+            )
+            stats = (await client.get("/stats/micro-batching")).json()
+        return responses, stats
+
+    responses, stats = asyncio.run(run())
+    assert [response.status_code for response in responses] == [201] * 20
+    key = "vendorName" if path == "/vendor-record" else "invoiceId"
+    assert [response.json()["data"][key] for response in responses] == [
+        body(seq)[key] for seq in range(20)
+    ]
+    assert len(app.state.records.output.records) == 20
+    record_type = "vendor" if path == "/vendor-record" else "invoice"
+    assert stats[record_type]["items"] == 20
+    assert stats[record_type]["max_batch_size"] > 1
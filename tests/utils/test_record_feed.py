@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+import pytest
+
+from app.enums import AppEnum
+from app.utils.file_writer import append_output_to_jsonl
+from app.utils.output_reader import complete_lines_end, is_line_start
+from app.utils.record_feed import RecordFeed, format_error_event, format_event
+
+
+def _append_vendor(output_file, vendor_name):
+    append_output_to_jsonl("A", "vendor", {"vendorName": vendor_name}, output_file)
+
+
+def _decode(event):
+    event = json.loads(event)
+    return event["offset"], event["record"]["data"]["vendorName"]
+
+
+@pytest.fixture
+def output_file(tmp_path):
+    output_file = str(tmp_path / "output.jsonl")
+    _append_vendor(output_file, "V1")
+    _append_vendor(output_file, "V2")
+    return output_file
+
+
+def test_record_feed_replays_then_streams(output_file):
+    """Test that a consumer gets the existing records, then the ones published afterwards"""
+    feed = RecordFeed(output_file)
+    first_end = len(open(output_file, "rb").readline())
+
+    async def consume():
+        stream = feed.stream(since=first_end)
+        events = [await anext(stream)]
+        _append_vendor(output_file, "V3")
+        feed.refresh()
+        events.append(await anext(stream))
+        feed.close()
+        events.extend([event async for event in stream])
+        return events
+
+    events = [_decode(event) for event in asyncio.run(consume())]
+
+    # Each event carries the offset to resume from after it
+    line_lengths = [len(line) for line in open(output_file, "rb")]
+    assert events == [
+        (sum(line_lengths[:2]), "V2"),
+        (sum(line_lengths), "V3"),
+    ]
+    assert len(feed) == 0
+
+
+def test_record_feed_disconnects_slow_consumer(output_file):
+    """Test that a consumer whose buffer fills up gets an error event and is disconnected"""
+    feed = RecordFeed(output_file, buffer_size=1)
+
+    async def consume():
+        stream = feed.stream(since=feed.offset, stream_format="sse")
+        first_event = asyncio.ensure_future(anext(stream))
+        # Let the consumer subscribe before publishing
+        while not len(feed):
+            await asyncio.sleep(0)
+
+        for vendor_name in ("V3", "V4", "V5"):
+            _append_vendor(output_file, vendor_name)
+        feed.refresh()
+        return [await first_event] + [event async for event in stream]
+
+    events = asyncio.run(consume())
+
+    assert len(events) == 2
+    assert events[0].startswith(b"id: ")
+    assert b'"vendorName": "V3"' in events[0]
+    offset = int(events[0].split(b"\n")[0][4:])
+    assert (
+        events[1]
+        == b"event: error\ndata: %s\n\n"
+        % json.dumps(
+            {"error": AppEnum.STREAM_BUFFER_OVERFLOW_MSSG.value, "offset": offset}
+        ).encode()
+    )
+    assert len(feed) == 0
+
+
+def test_record_feed_starts_after_complete_lines(output_file):
+    """Test that the feed doesn't publish the records already written, nor partial lines"""
+    end = complete_lines_end(output_file)
+    with open(output_file, "ab") as f:
+        f.write(b'{"company": "A"')
+
+    assert complete_lines_end(output_file, chunk_size=4) == end
+    assert RecordFeed(output_file).offset == end
+    assert complete_lines_end(str(output_file) + ".missing") == 0
+
+    with open(output_file, "wb") as f:
+        f.write(b'{"company": "A"')
+    assert complete_lines_end(output_file) == 0
+
+
+def test_is_line_start(output_file):
+    """Test that only the offsets where a record starts are valid resume points"""
+    end = complete_lines_end(output_file)
+
+    assert is_line_start(output_file, 0)
+    assert is_line_start(output_file, end)
+    assert not is_line_start(output_file, 1)
+    assert not is_line_start(output_file, -1)
+    assert not is_line_start(output_file, end + 1)
+    assert not is_line_start(str(output_file) + ".missing", 1)
+
+
+def test_format_events():
+    """Test the NDJSON and SSE framing of the records and errors"""
+    line = b'{"company": "A"}\n'
+
+    assert (
+        format_event(line, 17, "ndjson")
+        == b'{"offset": 17, "record": {"company": "A"}}\n'
+    )
+    assert format_event(line, 17, "sse") == b'id: 17\ndata: {"company": "A"}\n\n'
+    assert format_error_event("Mock error", 17, "ndjson") == (
+        b'{"error": "Mock error", "offset": 17}\n'
+    )
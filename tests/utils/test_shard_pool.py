@@ -0,0 +1,30 @@
+from app.utils.shard_pool import ShardPool, shard_key
+
+VENDOR_MESSAGE = {
+    "record_type": "vendor",
+    "data": {"company": "A", "vendorName": "Mock Vendor"},
+}
+INVOICE_MESSAGE = {
+    "record_type": "invoice",
+    "data": {"company": "B", "invoiceId": "INV1001"},
+}
+
+
+def test_shard_key():
+    """Test that messages are partitioned on their company or record key"""
+    assert shard_key(VENDOR_MESSAGE) == "Mock Vendor"
+    assert shard_key(INVOICE_MESSAGE) == "INV1001"
+    assert shard_key(INVOICE_MESSAGE, "company") == "B"
+    assert shard_key({"record_type": "mock_type", "data": {}}) is None
+    assert shard_key({"record_type": "vendor", "data": []}) is None
+
+
+def test_shard_pool_same_key_same_shard():
+    """Test that the messages of a key always go to the same worker"""
+    pool = ShardPool(4, "company")
+
+    assert len(pool) == 4
+    assert pool.shard(VENDOR_MESSAGE) == pool.shard(
+        {"record_type": "invoice", "data": {"company": "A", "invoiceId": "INV1"}}
+    )
+    pool.close()
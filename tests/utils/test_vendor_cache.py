@@ -0,0 +1,81 @@
+from app.enums import VendorEnum
+from app.utils.file_writer import append_output_to_jsonl
+from app.utils.vendor_cache import VendorCache
+
+
+def _vendor(name, country="US", vendor_status=None):
+    return {
+        "vendorName": name,
+        "country": country,
+        "bank": "Mock Bank",
+        "vendorStatus": vendor_status,
+    }
+
+
+def test_vendor_cache_get_and_stats():
+    """Test that lookups return the vendor details and are counted as hits or misses"""
+    cache = VendorCache(max_entries=10)
+    cache.put("B", _vendor("Mock Vendor", vendor_status=VendorEnum.STATUS_VERIFIED))
+
+    assert cache.get("B", "Mock Vendor") == {
+        "country": "US",
+        "vendorStatus": VendorEnum.STATUS_VERIFIED,
+    }
+    # Same vendor name for another company is a different vendor
+    assert cache.get("A", "Mock Vendor") is None
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["memory_bytes"] > 0
+
+
+def test_vendor_cache_empty_stats():
+    """Test that the hit rate of an unused cache is zero"""
+    stats = VendorCache().stats()
+    assert stats["hit_rate"] == 0.0
+    assert stats["memory_bytes"] == 0
+
+
+def test_vendor_cache_refresh_keeps_memory_accounting():
+    """Test that processing a vendor again replaces its entry"""
+    cache = VendorCache(max_entries=10)
+    cache.put("A", _vendor("Mock Vendor", country="FR"))
+    memory_bytes = cache.stats()["memory_bytes"]
+
+    cache.put("A", _vendor("Mock Vendor", country="US"))
+
+    assert cache.get("A", "Mock Vendor")["country"] == "US"
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["memory_bytes"] == memory_bytes
+
+
+def test_vendor_cache_evicts_least_recently_used():
+    """Test that the cache stays bounded, evicting the least recently used vendor"""
+    cache = VendorCache(max_entries=2)
+    cache.put("A", _vendor("Vendor 1"))
+    cache.put("A", _vendor("Vendor 2"))
+
+    # Use vendor 1 so vendor 2 becomes the least recently used
+    cache.get("A", "Vendor 1")
+    cache.put("A", _vendor("Vendor 3"))
+
+    assert cache.get("A", "Vendor 2") is None
+    assert cache.get("A", "Vendor 1") is not None
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_vendor_cache_warm_load(tmp_path):
+    """Test that the cache is filled from the vendors of the output file"""
+    output_file = str(tmp_path / "output.jsonl")
+    append_output_to_jsonl("A", "vendor", _vendor("Mock Vendor"), output_file)
+    append_output_to_jsonl("A", "invoice", {"invoiceId": "INV1001"}, output_file)
+
+    cache = VendorCache()
+    cache.warm_load(output_file)
+
+    assert cache.stats()["entries"] == 1
+    assert cache.get("A", "Mock Vendor")["country"] == "US"
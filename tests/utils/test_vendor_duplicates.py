@@ -0,0 +1,66 @@
+import pytest
+
+from app.utils.file_writer import append_output_to_jsonl
+from app.utils.vendor_duplicates import VendorDuplicateIndex, normalize_vendor_name
+
+
+@pytest.mark.parametrize(
+    "vendor_name, normalized_name",
+    [
+        ("Global Supplies Ltd.", "global supplies"),
+        ("GLOBAL SUPPLIES LTD", "global supplies"),
+        ("Global Supplies Limited", "global supplies"),
+        ("Société Générale S.A.", "societe generale"),
+        ("O'Brien & Sons, Inc.", "obrien sons"),
+        ("Ltd", "ltd"),
+    ],
+)
+def test_normalize_vendor_name(vendor_name, normalized_name):
+    """Test that case, accents, punctuation and legal suffixes are normalized away"""
+    assert normalize_vendor_name(vendor_name) == normalized_name
+
+
+def test_vendor_duplicates_find():
+    """Test that likely duplicates of the same company are found, best first"""
+    index = VendorDuplicateIndex(threshold=0.6)
+    index.add("A", "Global Supplies Ltd.")
+    index.add("A", "Global Supplies Ltd.")
+    index.add("A", "GLOBAL SUPPLIES LIMITED")
+    index.add("A", "Global Supplies Inc")
+    index.add("A", "Global Supplies Inc")
+    index.add("A", "Kazawe Palzeter Trading")
+    # Same distinctive words, only compared on their full names
+    index.add("A", "Kazawe Palzeter")
+    index.add("A", "Kazawe Palzeter International Holdings")
+    index.add("A", "Northwind Traders")
+    index.add("B", "Global Supplies Ltd.")
+
+    assert len(index) == 8
+    assert index.find("A", "Global Supplies Ltd.") == [
+        {"vendorName": "GLOBAL SUPPLIES LIMITED", "score": 1.0},
+        {"vendorName": "Global Supplies Inc", "score": 1.0},
+    ]
+    assert len(index.find("A", "Global Supplies Limited")) == 3
+
+    # The other vendors with the same distinctive words are less similar
+    [duplicate] = index.find("A", "Kazawe Palzetter Trading Co")
+    assert duplicate["vendorName"] == "Kazawe Palzeter Trading"
+    assert 0.6 <= duplicate["score"] < 1.0
+
+    assert index.find("A", "Acme Corp") == []
+    assert index.find("C", "Global Supplies Ltd.") == []
+
+
+def test_vendor_duplicates_warm_load(tmp_path):
+    """Test that the vendors already in the output file are indexed"""
+    output_file = str(tmp_path / "output.jsonl")
+    append_output_to_jsonl(
+        "A", "vendor", {"vendorName": "Global Supplies Ltd."}, output_file
+    )
+    append_output_to_jsonl("A", "invoice", {"invoiceId": "INV1001"}, output_file)
+
+    index = VendorDuplicateIndex()
+    index.warm_load(output_file)
+
+    assert len(index) == 1
+    assert index.find("A", "Global Supplies")[0]["vendorName"] == "Global Supplies Ltd."